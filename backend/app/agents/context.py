@@ -0,0 +1,201 @@
+# app/agents/context.py
+#
+# Retrieved context, kept out of the graph state.
+# - the state only carries ContextRef records: vector id, chunk row id,
+#   document, page and char offsets (plus the distance and a token estimate
+#   of the text, so the context size is known without building the blocks)
+# - the texts live in a per-run ContextStore passed to the nodes through
+#   config["configurable"]["context"], so LangGraph never copies or merges
+#   them between nodes
+# - refs the store doesn't have (e.g. a node run on its own) are read back
+#   from SQL by vector id
+# - prompt blocks are numbered; the answer's [n] markers map back to refs
+#   through citation_index, which is what ChatResponse.citations returns
+# - a follow-up question can reuse the previous answer's citations (sent back
+#   by the client): reload_refs keeps only those the user can still read
+
+from typing import Any, Dict, Iterable, List, Optional, TypedDict
+
+from app.core.chunks import estimate_tokens
+from app.core.db import SessionLocal
+from app.core.workspaces import member_workspace_ids, visible_to
+from app.models.db_models import Chunk, DocumentSummary
+
+
+class ContextRef(TypedDict, total=False):
+    id: str  # Chroma vector id
+    kind: str  # chunk | summary
+    chunk_id: Optional[int]  # chunks.id (chunk refs)
+    document_id: Optional[int]
+    page: Optional[int]
+    page_end: Optional[int]  # summaries: last page covered
+    char_start: Optional[int]
+    char_end: Optional[int]
+    distance: Optional[float]
+    tokens: Optional[int]  # estimate for the text, set by put_text
+
+
+class ContextStore:
+    """Texts of the refs retrieved during one graph run."""
+
+    def __init__(self):
+        self._texts: Dict[str, str] = {}
+
+    def put(self, ref_id: str, text: str) -> None:
+        self._texts[ref_id] = text
+
+    def get(self, ref_id: str) -> Optional[str]:
+        return self._texts.get(ref_id)
+
+    def nbytes(self) -> int:
+        return sum(len(t.encode("utf-8")) for t in self._texts.values())
+
+
+def put_text(store: ContextStore, ref: ContextRef, text: str) -> None:
+    """Keep ref's text in store and its token estimate on the ref."""
+    store.put(ref["id"], text)
+    ref["tokens"] = estimate_tokens(text)
+
+
+def context_tokens(refs: Iterable[ContextRef]) -> int:
+    """Estimated size of the refs' texts, from the estimates put_text left on them."""
+    return sum(ref.get("tokens") or 0 for ref in refs)
+
+
+def store_from_config(config: Optional[Dict[str, Any]]) -> ContextStore:
+    store = ((config or {}).get("configurable") or {}).get("context")
+    return store if store is not None else ContextStore()
+
+
+def load_texts(refs: Iterable[ContextRef]) -> Dict[str, str]:
+    """Texts of refs by vector id, from the chunk / summary rows."""
+    chunk_ids = [r["id"] for r in refs if r.get("kind", "chunk") == "chunk"]
+    summary_ids = [r["id"] for r in refs if r.get("kind") == "summary"]
+    texts: Dict[str, str] = {}
+    db = SessionLocal()
+    try:
+        if chunk_ids:
+            texts.update(db.query(Chunk.vector_id, Chunk.content).filter(Chunk.vector_id.in_(chunk_ids)))
+        if summary_ids:
+            texts.update(
+                db.query(DocumentSummary.vector_id, DocumentSummary.content)
+                .filter(DocumentSummary.vector_id.in_(summary_ids))
+            )
+    finally:
+        db.close()
+    return texts
+
+
+def chunk_positions(vector_ids: List[str]) -> Dict[str, tuple]:
+    """vector id → (chunk row id, char_start, char_end) for retrieved chunks."""
+    if not vector_ids:
+        return {}
+    db = SessionLocal()
+    try:
+        return {
+            vid: (cid, start, end)
+            for vid, cid, start, end in db.query(
+                Chunk.vector_id, Chunk.id, Chunk.char_start, Chunk.char_end
+            ).filter(Chunk.vector_id.in_(vector_ids))
+        }
+    finally:
+        db.close()
+
+
+def _or_unknown(value: Any) -> Any:
+    return "unknown" if value is None else value
+
+
+def reload_refs(refs: Iterable[ContextRef], user_id: Optional[int], store: ContextStore) -> List[ContextRef]:
+    """
+    🔒 Refs from outside this run (a previous answer's citations, sent back by
+    the client), rebuilt from their rows. Refs the user can no longer read
+    are dropped. Texts go into store. Order and distances are kept.
+    """
+    refs = list(refs)
+    chunk_ids = [r["id"] for r in refs if r.get("kind", "chunk") == "chunk"]
+    summary_ids = [r["id"] for r in refs if r.get("kind") == "summary"]
+    rows: Dict[str, tuple] = {}
+    db = SessionLocal()
+    try:
+        workspace_ids = member_workspace_ids(db, user_id)
+        if chunk_ids:
+            for c in db.query(Chunk).filter(
+                Chunk.vector_id.in_(chunk_ids),
+                visible_to(Chunk.user_id, Chunk.workspace_id, user_id, workspace_ids),  # 🔒 USER ISOLATION
+            ):
+                rows[c.vector_id] = ({
+                    "id": c.vector_id,
+                    "kind": "chunk",
+                    "chunk_id": c.id,
+                    "document_id": c.document_id,
+                    "page": c.page,
+                    "char_start": c.char_start,
+                    "char_end": c.char_end,
+                }, c.content)
+        if summary_ids:
+            for row in db.query(DocumentSummary).filter(
+                DocumentSummary.vector_id.in_(summary_ids),
+                visible_to(DocumentSummary.user_id, DocumentSummary.workspace_id, user_id, workspace_ids),  # 🔒
+            ):
+                rows[row.vector_id] = ({
+                    "id": row.vector_id,
+                    "kind": "summary",
+                    "document_id": row.document_id,
+                    "page": row.page_start,
+                    "page_end": row.page_end,
+                }, row.content)
+    finally:
+        db.close()
+
+    reloaded: List[ContextRef] = []
+    for ref in refs:
+        if ref["id"] not in rows:
+            continue
+        fresh, text = rows.pop(ref["id"])  # pop: a repeated id is kept once
+        fresh["distance"] = ref.get("distance")
+        put_text(store, fresh, text)
+        reloaded.append(fresh)
+    return reloaded
+
+
+def format_block(ref: ContextRef, text: str, marker: Optional[int] = None) -> str:
+    """Prompt block for one ref, e.g. "[1] [Document 3 | Page 2] ..."."""
+    if ref.get("kind") == "summary":
+        where = (
+            f"Summary pages {ref['page']}-{ref['page_end']}"
+            if ref.get("page") is not None else "Summary"
+        )
+    else:
+        where = f"Page {_or_unknown(ref.get('page'))}"
+    block = f"[Document {_or_unknown(ref.get('document_id'))} | {where}] {text}"
+    return f"[{marker}] {block}" if marker is not None else block
+
+
+def with_texts(refs: List[ContextRef], store: ContextStore) -> List[ContextRef]:
+    """The refs whose text is available, in order; texts missing from the store come from SQL."""
+    missing = [r for r in refs if store.get(r["id"]) is None]
+    if missing:
+        for ref_id, text in load_texts(missing).items():
+            store.put(ref_id, text)
+    return [ref for ref in refs if store.get(ref["id"]) is not None]
+
+
+def context_blocks(refs: List[ContextRef], store: ContextStore) -> List[str]:
+    """Numbered prompt blocks for refs; [n] is the ref's position in with_texts(refs)."""
+    return [
+        format_block(ref, store.get(ref["id"]), marker)
+        for marker, ref in enumerate(with_texts(refs, store), start=1)
+    ]
+
+
+def citation_index(refs: List[ContextRef], answer: str) -> List[Dict[str, Any]]:
+    """
+    One entry per prompt block: its [n] marker, whether the answer cites it,
+    and the ref (chunk id, document, page, offsets, distance).
+    refs must be the with_texts() list the blocks were built from.
+    """
+    return [
+        {"marker": marker, "cited": f"[{marker}]" in answer, **ref}
+        for marker, ref in enumerate(refs, start=1)
+    ]
@@ -1,21 +1,75 @@
 # app/agents/graph.py
-from typing import TypedDict, List, Optional, Literal, Dict, Any
-
-from langgraph.graph import StateGraph, END
-
-from app.core.llm_client import LLMClient
-from app.core.rag import search
+#
+# State is kept compact: nodes return only the keys they change, `trace` and
+# `conversation` are append-only channels (each node adds its own entries),
+# and retrieved context travels as ContextRef records while the texts stay in
+# the run's ContextStore (see app/agents/context.py).
+import operator
+import threading
+from typing import TYPE_CHECKING, Annotated, TypedDict, List, Optional, Literal, Dict, Any, Tuple
+
+from app.agents.context import (
+    ContextRef,
+    ContextStore,
+    chunk_positions,
+    citation_index,
+    context_blocks as build_context_blocks,
+    context_tokens as estimate_context_tokens,
+    put_text,
+    reload_refs,
+    store_from_config,
+    with_texts,
+)
+from app.core.llm_backends import LLMBackend, create_llm_client
+from app.core.prompts import get_template, with_context
+from app.core.rag import search, search_hierarchical
+from app.core.chunks import (
+    normalize_sources,
+    resolve_document_hints,
+    scope_document_ids,
+)
 from app.core.db import SessionLocal
+from app.core.summaries import unsummarized_document_ids
+from app.core.workspaces import member_workspace_ids
+from app.config import settings
+from app.core import ticket_index
+from app.core.tickets import (
+    count_tickets,
+    list_tickets_page,
+    sync_ticket_index,
+    update_tickets,
+)
 from app.models.db_models import Ticket
 
-llm_client = LLMClient()
+if TYPE_CHECKING:  # langgraph / langchain stay out of the import path until the graph is built
+    from langchain_core.runnables import RunnableConfig
+
+# Created on first use / by the app's startup hook, not at import time
+_llm_client: Optional[LLMBackend] = None
+_compiled_graph = None
+_init_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMBackend:
+    global _llm_client
+    if _llm_client is None:
+        with _init_lock:
+            if _llm_client is None:
+                _llm_client = create_llm_client()
+    return _llm_client
 
 
 class GraphState(TypedDict, total=False):
     # Input
     user_message: str
-    conversation: List[Dict[str, str]]  # chat history: [{role, content}, ...]
+    # chat history: [{role, content}, ...]; nodes return only the turns they add
+    conversation: Annotated[List[Dict[str, str]], operator.add]
     user_id: Optional[int]  # 🔒 USER ID FOR MULTI-TENANCY
+    # Explicit retrieval scope from the request:
+    # {document_ids?, sources?, uploaded_after?, uploaded_before?}
+    scope: Dict[str, Any]
+    # The previous answer's citations (sent back by the client), reused by follow-ups
+    previous_refs: List[ContextRef]
 
     # Planner output
     plan_intent: Literal[
@@ -30,66 +84,123 @@ class GraphState(TypedDict, total=False):
     ticket_title: Optional[str]
     ticket_description: Optional[str]
     severity: Optional[str]
+    # Clarifying / follow-up question: answer from the previous turn's passages
+    follow_up: bool
 
     # For update_ticket intent
     target_ticket_id: Optional[int]
+    target_ticket_ids: Optional[List[int]]  # multi-ticket commands, e.g. "close 4, 7 and 12"
     new_status: Optional[str]
     new_severity: Optional[str]
 
-    # RAG
-    context_blocks: List[str]
+    # For list_tickets intent (server-side filters)
+    filter_status: Optional[List[str]]
+    filter_severity: Optional[List[str]]
+
+    # Retrieval scope inferred by the planner ("in the onboarding guide…")
+    scope_documents: Optional[List[str]]
+    scope_sources: Optional[List[str]]
 
-    # Answer
+    # RAG: references to the retrieved chunks / summaries (texts in the ContextStore)
+    context_refs: List[ContextRef]
+
+    # Answer, plus the numbered passages it was given ([n] marker, cited?, ref)
     answer: str
+    citations: List[Dict[str, Any]]
 
     # Ticket (result of create/update)
     ticket_id: Optional[int]
+    ticket_merged: bool  # True if the report was merged into an existing ticket
+    similar_tickets: List[Dict[str, Any]]
 
-    # per-turn trace of what each node did
-    trace: List[Dict[str, Any]]
+    # per-turn trace of what each node did; nodes return only their own steps
+    trace: Annotated[List[Dict[str, Any]], operator.add]
 
 
-# Trace helper function
+# Trace helper function: adds a step to a node's partial update
 def _append_trace(
-    state: GraphState,
+    update: Dict[str, Any],
     node: str,
     description: str,
     extra: Dict[str, Any] | None = None,
 ) -> None:
-    trace = list(state.get("trace") or [])
     entry: Dict[str, Any] = {"node": node, "description": description}
     if extra:
         entry.update(extra)
-    trace.append(entry)
-    state["trace"] = trace
+    update.setdefault("trace", []).append(entry)
+
+
+def _usage_extra(usage: Dict[str, int]) -> Dict[str, Any]:
+    """Trace fields for one LLM call; cached prompt tokens are the per-request saving."""
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "cached_tokens": usage.get("cached_tokens", 0),
+    }
+
+
+def _usage_note(usage: Dict[str, int]) -> str:
+    if not usage:
+        return ""
+    note = f" (~{usage.get('prompt_tokens')} prompt tokens"
+    if usage.get("cached_tokens"):
+        note += f", {usage['cached_tokens']} from cache"
+    return note + ")"
 
 
 # ---------- TOOLS ----------
 
 
-def build_ticket_list_answer(user_message: str, user_id: int) -> str:
+def _as_filter_list(value: Any) -> Optional[List[str]]:
+    """Planner may return a string, a list, or null for a filter."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    values = [str(v) for v in value if v]
+    return values or None
+
+
+def build_ticket_list_answer(
+    user_message: str,
+    user_id: int,
+    status: Optional[List[str]] = None,
+    severity: Optional[List[str]] = None,
+) -> str:
     """
     🔒 Tool-style function: reads tickets from DB (USER-SCOPED) and returns a text summary.
+    Filters run in SQL through the same query path as GET /api/tickets.
     """
     db = SessionLocal()
     try:
-        tickets = (
-            db.query(Ticket)
-            .filter(Ticket.user_id == user_id)  # 🔒 USER ISOLATION
-            .order_by(Ticket.created_at.desc())
-            .limit(20)
-            .all()
+        tickets, _ = list_tickets_page(
+            db,
+            user_id,  # 🔒 USER ISOLATION
+            status=status,
+            severity=severity,
+            limit=20,
         )
+        total = count_tickets(db, user_id, status=status, severity=severity)
     finally:
         db.close()
 
+    filter_parts = []
+    if status:
+        filter_parts.append("status " + "/".join(s.upper() for s in status))
+    if severity:
+        filter_parts.append("severity " + "/".join(s.upper() for s in severity))
+    filter_text = f" matching {' and '.join(filter_parts)}" if filter_parts else ""
+
     if not tickets:
+        if filter_parts:
+            return f"You have no tickets{filter_text}."
         return (
             "You have no tickets in the system. "
             "You can create one by describing an issue or request."
         )
 
-    lines = ["Here are your latest tickets:\n"]
+    lines = [f"Here are your latest tickets{filter_text} ({len(tickets)} of {total}):\n"]
     for t in tickets:
         lines.append(
             f"- #{t.id} | {t.status.upper()} | {t.severity.upper()} | {t.title}"
@@ -98,107 +209,104 @@ def build_ticket_list_answer(user_message: str, user_id: int) -> str:
     lines.append(
         "\nYou can ask me things like:\n"
         "- 'Show only open tickets'\n"
-        "- 'Show critical tickets'\n"
+        "- 'Show open critical tickets'\n"
         "- 'Close ticket #3'\n"
-        "- 'Reopen ticket 2 as medium severity'\n"
-        "(Filters and advanced updates can be added later.)"
+        "- 'Reopen ticket 2 as medium severity'"
     )
 
     return "\n".join(lines)
 
 
-def update_ticket_tool(state: GraphState) -> str:
+def _as_id_list(value: Any) -> List[int]:
+    """Planner may return a number, a list of numbers, or null for ticket ids."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    ids: List[int] = []
+    for v in value:
+        try:
+            tid = int(v)
+        except (TypeError, ValueError):
+            continue
+        if tid not in ids:
+            ids.append(tid)
+    return ids
+
+
+def update_ticket_tool(state: GraphState, update: Dict[str, Any]) -> str:
     """
-    🔒 Tool-style function: update a ticket's status/severity (USER-SCOPED).
+    🔒 Tool-style function: update one or many tickets' status/severity (USER-SCOPED).
+    Multi-ticket commands are applied as ONE batched update (one query, one commit).
+    The ticket ids are written to `update`.
     """
-    ticket_id = state.get("target_ticket_id")
+    ticket_ids = list(state.get("target_ticket_ids") or [])
+    if not ticket_ids and state.get("target_ticket_id") is not None:
+        ticket_ids = [state["target_ticket_id"]]
     new_status = (state.get("new_status") or "").lower() or None
     new_severity = (state.get("new_severity") or "").lower() or None
     user_id = state.get("user_id")
 
-    if ticket_id is None:
+    if not ticket_ids:
         return (
             "I couldn't determine which ticket to update. "
             "Please specify the ticket number, e.g. 'Close ticket #3'."
         )
 
+    if not (new_status or new_severity):
+        return (
+            f"I found {'ticket' if len(ticket_ids) == 1 else 'tickets'} "
+            f"{', '.join(f'#{tid}' for tid in ticket_ids)}, but no new status or "
+            "severity was provided to update."
+        )
+
     db = SessionLocal()
     try:
-        # 🔒 Only allow updating user's own tickets
-        ticket = (
-            db.query(Ticket)
-            .filter(Ticket.id == ticket_id, Ticket.user_id == user_id)
-            .first()
+        # 🔒 update_tickets only touches the user's own tickets
+        results = update_tickets(
+            db,
+            user_id,
+            [
+                {"id": tid, "status": new_status, "severity": new_severity}
+                for tid in ticket_ids
+            ],
         )
-        
-        if not ticket:
-            return f"Ticket #{ticket_id} was not found or does not belong to you."
-
-        changes = []
-        if new_status:
-            ticket.status = new_status
-            changes.append(f"status → {new_status.upper()}")
-        if new_severity:
-            ticket.severity = new_severity
-            changes.append(f"severity → {new_severity.upper()}")
-
-        if not changes:
-            return (
-                f"I found ticket #{ticket_id}, but no new status or severity was "
-                "provided to update."
-            )
 
-        db.add(ticket)
-        db.commit()
-        db.refresh(ticket)
-        state["ticket_id"] = ticket.id
-
-        changes_str = ", ".join(changes)
-        return (
-            f"Updated ticket #{ticket.id}: {changes_str}.\n"
-            f"Title: {ticket.title}"
-        )
+        lines = []
+        updated_ids = []
+        for r in results:
+            if not r["ok"]:
+                lines.append(f"Ticket #{r['id']}: {r['error']}")
+                continue
+            ticket = r["ticket"]
+            updated_ids.append(ticket.id)
+            changes = []
+            if new_status:
+                changes.append(f"status → {ticket.status.upper()}")
+            if new_severity:
+                changes.append(f"severity → {ticket.severity.upper()}")
+            lines.append(
+                f"Updated ticket #{ticket.id}: {', '.join(changes)}.\n"
+                f"Title: {ticket.title}"
+            )
     finally:
         db.close()
 
+    if updated_ids:
+        update["ticket_id"] = updated_ids[0]
+    update["target_ticket_ids"] = ticket_ids
+
+    return "\n".join(lines)
+
 
 # ---------- NODES ----------
 
 
-def planner_node(state: GraphState) -> GraphState:
+def planner_node(state: GraphState) -> Dict[str, Any]:
     """Decide intent + ticket info using LLM (planner)."""
     user_message = state["user_message"]
 
-    system_prompt = (
-        "You are the Planner for OpsCopilot, a generic operations assistant used by any organization.\n"
-        "Your job is to classify the user's message into an intent and decide what actions to take.\n\n"
-        "INTENTS:\n"
-        "- 'knowledge_query': The user is asking a question about policies, procedures, documents, or how to do something.\n"
-        "- 'create_ticket': The user is reporting an issue, request, complaint, bug, incident, or task that should be tracked.\n"
-        "- 'list_tickets': The user is asking to see existing tickets (e.g., 'show my open issues', 'list all tickets').\n"
-        "- 'update_ticket': The user wants to change a ticket's status or severity (e.g., 'close ticket 3', 'mark ticket 2 critical').\n"
-        "- 'chitchat': The user is just greeting or chatting casually.\n\n"
-        "Decide also:\n"
-        "- whether to use RAG (document search) for this message.\n"
-        "- if a ticket should be created, suggest a title, description, and severity.\n"
-        "- for update_ticket, identify:\n"
-        "    - 'ticket_id': the numeric ticket id from the message (if any),\n"
-        "    - 'new_status': the new status (e.g. 'open', 'closed', 'in_progress'),\n"
-        "    - 'new_severity': the new severity ('low', 'medium', 'high', 'critical').\n\n"
-        "Return ONLY a valid JSON object with the following keys:\n"
-        "{\n"
-        '  "intent": "knowledge_query" | "create_ticket" | "list_tickets" | "update_ticket" | "chitchat",\n'
-        '  "use_rag": true or false,\n'
-        '  "create_ticket": true or false,\n'
-        '  "ticket_title": string or null,\n'
-        '  "ticket_description": string or null,\n'
-        '  "severity": "low" | "medium" | "high" | "critical",\n'
-        '  "ticket_id": number or null,\n'
-        '  "new_status": string or null,\n'
-        '  "new_severity": string or null\n'
-        "}\n"
-        "Do not include any explanation, only JSON."
-    )
+    system_prompt = get_template("planner").text
 
     # Build messages with memory
     messages = [{"role": "system", "content": system_prompt}]
@@ -206,7 +314,9 @@ def planner_node(state: GraphState) -> GraphState:
         messages.append(msg)
     messages.append({"role": "user", "content": user_message})
 
-    raw = llm_client.chat(messages)
+    llm = get_llm_client()
+    raw = llm.chat(messages)
+    usage = llm.last_usage()
 
     import json
 
@@ -228,6 +338,12 @@ def planner_node(state: GraphState) -> GraphState:
         target_ticket_id = data.get("ticket_id")
         new_status = data.get("new_status")
         new_severity = data.get("new_severity")
+        target_ticket_ids = _as_id_list(data.get("ticket_ids"))
+        filter_status = _as_filter_list(data.get("filter_status"))
+        filter_severity = _as_filter_list(data.get("filter_severity"))
+        scope_documents = _as_filter_list(data.get("scope_documents"))
+        scope_sources = _as_filter_list(data.get("scope_sources"))
+        follow_up = bool(data.get("follow_up", False))
 
         # Ensure ticket_id is int if present
         if target_ticket_id is not None:
@@ -235,6 +351,8 @@ def planner_node(state: GraphState) -> GraphState:
                 target_ticket_id = int(target_ticket_id)
             except Exception:
                 target_ticket_id = None
+        if target_ticket_id is not None and target_ticket_id not in target_ticket_ids:
+            target_ticket_ids.insert(0, target_ticket_id)
     except Exception:
         intent = "knowledge_query"
         use_rag = True
@@ -243,22 +361,32 @@ def planner_node(state: GraphState) -> GraphState:
         ticket_description = None
         severity = "medium"
         target_ticket_id = None
+        target_ticket_ids = []
         new_status = None
         new_severity = None
-
-    state.update(
-        {
-            "plan_intent": intent,
-            "use_rag": use_rag,
-            "create_ticket": create_ticket,
-            "ticket_title": ticket_title,
-            "ticket_description": ticket_description,
-            "severity": severity,
-            "target_ticket_id": target_ticket_id,
-            "new_status": new_status,
-            "new_severity": new_severity,
-        }
-    )
+        filter_status = None
+        filter_severity = None
+        scope_documents = None
+        scope_sources = None
+        follow_up = False
+
+    update: Dict[str, Any] = {
+        "plan_intent": intent,
+        "use_rag": use_rag,
+        "create_ticket": create_ticket,
+        "ticket_title": ticket_title,
+        "ticket_description": ticket_description,
+        "severity": severity,
+        "target_ticket_id": target_ticket_id,
+        "target_ticket_ids": target_ticket_ids,
+        "new_status": new_status,
+        "new_severity": new_severity,
+        "filter_status": filter_status,
+        "filter_severity": filter_severity,
+        "scope_documents": scope_documents,
+        "scope_sources": scope_sources,
+        "follow_up": follow_up,
+    }
 
     # Log planner decision
     ticket_action = None
@@ -270,73 +398,213 @@ def planner_node(state: GraphState) -> GraphState:
         ticket_action = "list"
 
     _append_trace(
-        state,
+        update,
         "planner",
-        f"Intent={intent}, use_rag={use_rag}, ticket_action={ticket_action or 'none'}",
+        f"Intent={intent}, use_rag={use_rag}, ticket_action={ticket_action or 'none'}"
+        + (", follow_up=True" if follow_up else "")
+        + _usage_note(usage),
+        _usage_extra(usage),
     )
     
-    return state
+    return update
+
+
+def _resolve_retrieval_scope(
+    state: GraphState,
+) -> Tuple[Optional[List[int]], List[str], Optional[Dict[str, Any]], List[int]]:
+    """
+    🔒 Turn the request scope (or, failing that, the planner's inferred scope)
+    into (document_ids, sources, trace_info, workspace_ids) via SQL prefilters.
+    document_ids is None when the whole corpus is in scope; workspace_ids are
+    the user's workspaces, whose shared documents are searched too.
+    """
+    user_id = state.get("user_id")
+    explicit = state.get("scope") or {}
+    hints = state.get("scope_documents") or []
+
+    sources = normalize_sources(explicit.get("sources") or state.get("scope_sources"))
+    document_ids = explicit.get("document_ids")
+    inferred_documents: List[int] = []
+
+    db = SessionLocal()
+    try:
+        # 🔒 Membership is checked here, per request
+        workspace_ids = member_workspace_ids(db, user_id) if user_id is not None else []
+        if explicit.get("sources") and not sources:
+            # Explicit sources that are all unknown match nothing (the API
+            # rejects them); never widen them to the whole corpus
+            return [], [], {"document_ids": [], "inferred": False, "sources": explicit["sources"]}, workspace_ids
+        if not document_ids and hints:
+            inferred_documents = resolve_document_hints(db, user_id, hints, workspace_ids)
+            document_ids = inferred_documents or None
+        scoped = scope_document_ids(
+            db,
+            user_id,  # 🔒 USER ISOLATION
+            document_ids=document_ids,
+            sources=sources,
+            uploaded_after=explicit.get("uploaded_after"),
+            uploaded_before=explicit.get("uploaded_before"),
+            workspace_ids=workspace_ids,
+        )
+    finally:
+        db.close()
 
+    if scoped is None:
+        return None, [], None, workspace_ids
 
-def rag_node(state: GraphState) -> GraphState:
+    if not scoped and not explicit:
+        # An inferred scope that matches nothing is a bad guess, not a reason
+        # to answer from no documents: fall back to the whole corpus.
+        return None, [], {"inferred": True, "fallback": "no matching documents"}, workspace_ids
+
+    info: Dict[str, Any] = {"document_ids": scoped, "inferred": not explicit}
+    if sources:
+        info["sources"] = sources
+    if inferred_documents:
+        info["document_hints"] = hints
+    return scoped, sources, info, workspace_ids
+
+
+def rag_node(state: GraphState, config: "Optional[RunnableConfig]" = None) -> Dict[str, Any]:
     """🔒 Retrieve relevant document chunks if use_rag is True (USER-SCOPED)."""
     intent = state.get("plan_intent")
     user_id = state.get("user_id")
+    update: Dict[str, Any] = {"context_refs": []}
 
     # For list_tickets and update_ticket, we do NOT need RAG at all.
     if intent in ("list_tickets", "update_ticket"):
-        state["context_blocks"] = []
         _append_trace(
-            state,
+            update,
             "rag",
             "Skipped RAG: intent does not require document search.",
         )
-        return state
+        return update
+
+    store = store_from_config(config)
+
+    # Follow-up: answer from the previous answer's passages instead of searching again
+    if settings.CHAT_FOLLOW_UP_REUSE and state.get("follow_up") and state.get("previous_refs"):
+        refs = reload_refs(state["previous_refs"], user_id, store)  # 🔒 only what the user can still read
+        if refs:
+            update["context_refs"] = refs
+            context_tokens = estimate_context_tokens(refs)
+            _append_trace(
+                update,
+                "rag",
+                f"Follow-up: reused {len(refs)} passages from the previous answer, "
+                f"no new search (~{context_tokens} tokens)",
+                {
+                    "doc_ids": sorted({r["document_id"] for r in refs if r.get("document_id") is not None}) or None,
+                    "chunk_ids": [r["chunk_id"] for r in refs if r.get("chunk_id") is not None] or None,
+                    "context_tokens": context_tokens,
+                },
+            )
+            return update
 
     if not state.get("use_rag", True):
-        state["context_blocks"] = []
         _append_trace(
-            state,
+            update,
             "rag",
             "Skipped RAG: planner decided not to use document search.",
         )
-        return state
+        return update
 
     query = state["user_message"]
+    document_ids, sources, scope_info, workspace_ids = _resolve_retrieval_scope(state)
 
     # --- DEBUG: see what RAG is actually returning ---
     print("\n===== RAG DEBUG =====")
     print("Query:", repr(query))
     print(f"User ID: {user_id}")
-
-    # 🔒 Pass user_id to search for isolation
-    rag_results = search(query, user_id=user_id)
-    context_blocks: List[str] = []
+    if scope_info:
+        print(f"Scope: {scope_info}")
+
+    # 🔒 Pass user_id to search for isolation; the scope was resolved in SQL
+    # and is pushed down as a `document_id $in` / `source $in` filter
+    refs: List[ContextRef] = []
+    sections = None
+    if settings.RETRIEVAL_MODE == "hierarchical":
+        # Summaries pick the sections, chunks come only from inside them;
+        # documents without summaries yet are searched flat alongside
+        db = SessionLocal()
+        try:
+            unsummarized = unsummarized_document_ids(db, user_id, document_ids, sources or None, workspace_ids)
+        finally:
+            db.close()
+        rag_results = search_hierarchical(
+            query,
+            user_id=user_id,
+            document_ids=document_ids,
+            sources=sources or None,
+            n_sections=settings.RETRIEVAL_TOP_SECTIONS,
+            n_results=settings.RETRIEVAL_CHUNKS,
+            workspace_ids=workspace_ids,
+            unsummarized_document_ids=unsummarized,
+        )
+        if rag_results.get("sections"):
+            sections = len(rag_results["sections"])
+        for hit in rag_results.get("summaries", [])[: settings.RETRIEVAL_SUMMARY_BLOCKS]:
+            meta = hit["metadata"]
+            ref: ContextRef = {
+                "id": hit["id"],
+                "kind": "summary",
+                "document_id": meta.get("document_id"),
+                "page": meta.get("page_start"),
+                "page_end": meta.get("page_end"),
+                "distance": hit["distance"],
+            }
+            put_text(store, ref, hit["content"])
+            refs.append(ref)
+    else:
+        rag_results = search(
+            query,
+            user_id=user_id,
+            document_ids=document_ids,
+            sources=sources or None,
+            workspace_ids=workspace_ids,
+        )
 
     if rag_results and rag_results.get("documents"):
-        docs_list = rag_results["documents"]
-        metas_list = rag_results["metadatas"]
+        groups = zip(
+            rag_results["ids"],
+            rag_results["documents"],
+            rag_results["metadatas"],
+            rag_results["distances"],
+        )
 
-        print("Num result groups:", len(docs_list))
+        print("Num result groups:", len(rag_results["documents"]))
 
-        for group_idx, (docs, metas) in enumerate(zip(docs_list, metas_list)):
+        for group_idx, (ids, docs, metas, dists) in enumerate(groups):
             print(f"  Group {group_idx}: {len(docs)} docs")
-            for text, info in zip(docs, metas):
+            for vector_id, text, info, dist in zip(ids, docs, metas, dists):
                 page = info.get("page", "unknown")
                 doc_id = info.get("document_id", "unknown")
                 snippet = (text or "").replace("\n", " ")[:200]
                 print(f"    [doc_id={doc_id}, page={page}] snippet: {snippet!r}")
 
-                context_blocks.append(f"[Document {doc_id} | Page {page}] {text}")
+                ref = {
+                    "id": vector_id,
+                    "kind": "chunk",
+                    "document_id": info.get("document_id"),
+                    "page": info.get("page"),
+                    "distance": dist,
+                }
+                put_text(store, ref, text or "")
+                refs.append(ref)
     else:
         print("RAG returned no documents")
 
     print("===== END RAG DEBUG =====\n")
 
-    state["context_blocks"] = context_blocks
-    
+    # Chunk row ids + char offsets, so the refs point into the source text
+    positions = chunk_positions([r["id"] for r in refs if r["kind"] == "chunk"])
+    for ref in refs:
+        if ref["id"] in positions:
+            ref["chunk_id"], ref["char_start"], ref["char_end"] = positions[ref["id"]]
+    update["context_refs"] = refs
+
     # Log retrieved chunks
-    num_chunks = len(context_blocks)
+    num_chunks = len(rag_results["documents"][0]) if rag_results and rag_results.get("documents") else 0
     doc_ids: set[Any] = set()
     if rag_results and rag_results.get("metadatas"):
         for metas in rag_results["metadatas"]:
@@ -348,17 +616,37 @@ def rag_node(state: GraphState) -> GraphState:
                     except (ValueError, TypeError):
                         pass
 
+    context_tokens = estimate_context_tokens(refs)
+    description = f"Retrieved {num_chunks} chunks from {len(doc_ids)} documents (~{context_tokens} tokens)"
+    if sections:
+        description += f" inside {sections} sections"
+    if document_ids is not None:
+        description += f", scoped to {len(document_ids)} documents"
     _append_trace(
-        state,
+        update,
         "rag",
-        f"Retrieved {num_chunks} chunks from {len(doc_ids)} documents",
-        {"doc_ids": list(doc_ids) or None},
+        description,
+        {
+            "doc_ids": list(doc_ids) or None,
+            "chunk_ids": [r["chunk_id"] for r in refs if r.get("chunk_id") is not None] or None,
+            "scope": scope_info,
+            "context_tokens": context_tokens,
+            "sections": sections,
+        },
     )
 
-    return state
+    return update
+
+
+def _new_turns(query: str, answer: str) -> List[Dict[str, str]]:
+    """This turn's messages, appended to the conversation channel."""
+    return [
+        {"role": "user", "content": query},
+        {"role": "assistant", "content": answer},
+    ]
 
 
-def answer_node(state: GraphState) -> GraphState:
+def answer_node(state: GraphState, config: "Optional[RunnableConfig]" = None) -> Dict[str, Any]:
     """
     Generate the main assistant answer.
     - For list_tickets: use the ticket list tool, no LLM.
@@ -369,99 +657,92 @@ def answer_node(state: GraphState) -> GraphState:
     intent = state.get("plan_intent", "knowledge_query")
     query = state["user_message"]
     user_id = state.get("user_id")
+    update: Dict[str, Any] = {}
 
     # list_tickets → tool only
     if intent == "list_tickets":
-        answer = build_ticket_list_answer(query, user_id)
-        state["answer"] = answer
-
-        _append_trace(state, "tickets", "Listed tickets for the user.")
+        answer = build_ticket_list_answer(
+            query,
+            user_id,
+            status=state.get("filter_status"),
+            severity=state.get("filter_severity"),
+        )
+        update["answer"] = answer
 
-        conversation = state.get("conversation", []).copy()
-        conversation.append({"role": "user", "content": query})
-        conversation.append({"role": "assistant", "content": answer})
-        state["conversation"] = conversation
+        _append_trace(
+            update,
+            "tickets",
+            "Listed tickets for the user "
+            f"(status={state.get('filter_status') or 'any'}, "
+            f"severity={state.get('filter_severity') or 'any'}).",
+        )
 
-        return state
+        update["conversation"] = _new_turns(query, answer)
+        return update
 
     # update_ticket → tool only
     if intent == "update_ticket":
-        answer = update_ticket_tool(state)
-        state["answer"] = answer
+        answer = update_ticket_tool(state, update)
+        update["answer"] = answer
 
+        target_ids = update.get("target_ticket_ids") or []
         _append_trace(
-            state,
+            update,
             "tickets",
-            f"Updated ticket: {state.get('ticket_id') or state.get('target_ticket_id')}",
+            "Batch-updated tickets: " + ", ".join(f"#{tid}" for tid in target_ids)
+            if len(target_ids) > 1
+            else f"Updated ticket: {update.get('ticket_id') or state.get('target_ticket_id')}",
         )
 
-        conversation = state.get("conversation", []).copy()
-        conversation.append({"role": "user", "content": query})
-        conversation.append({"role": "assistant", "content": answer})
-        state["conversation"] = conversation
-
-        return state
+        update["conversation"] = _new_turns(query, answer)
+        return update
 
     # Normal path: knowledge_query / create_ticket / chitchat
-    context_blocks = state.get("context_blocks") or []
+    store = store_from_config(config)
+    refs = with_texts(state.get("context_refs") or [], store)
+    context_blocks = build_context_blocks(refs, store)
 
+    # Static instruction first (cacheable prefix); per-request context rides in the user turn
     if context_blocks:
-        context_text = "\n\n".join(context_blocks)
-        system_prompt = (
-            "You are OpsCopilot, a generic operations assistant. "
-            "You are given document context from internal company documents. "
-            "Your job is to read this context and answer the user's question by "
-            "summarizing and combining any relevant information you find.\n\n"
-            "RULES:\n"
-            "- Assume the document context is relevant to the question.\n"
-            "- If the context contains anything related to the question, you MUST "
-            "use it to construct the best possible answer.\n"
-            "- Base your answer ONLY on the document context; do not invent facts.\n"
-            "- Do NOT say 'I don't know based on the uploaded documents'.\n"
-            "- Only if there is truly no related information at all, say: "
-            "'The uploaded documents do not mention this topic.'\n\n"
-            "=== DOCUMENT CONTEXT ===\n"
-            f"{context_text}\n"
-            "=== END CONTEXT ==="
-        )
+        system_prompt = get_template("answer_with_context").text
+        user_turn = with_context(query, context_blocks)
     else:
-        system_prompt = (
-            "You are OpsCopilot, a generic operations assistant for any organization. "
-            "There is no document context, so answer based on general best practices. "
-            "Be helpful, but if you genuinely don't know, say so honestly."
-        )
+        system_prompt = get_template("answer_without_context").text
+        user_turn = query
 
     messages = [{"role": "system", "content": system_prompt}]
     for msg in state.get("conversation", []):
         messages.append(msg)
-    messages.append({"role": "user", "content": query})
+    messages.append({"role": "user", "content": user_turn})
 
-    answer = llm_client.chat(messages)
-    state["answer"] = answer
+    llm = get_llm_client()
+    answer = llm.chat(messages)
+    usage = llm.last_usage()
+    update["answer"] = answer
+    update["citations"] = citation_index(refs, answer)
 
     _append_trace(
-        state,
+        update,
         "answer",
-        "Answered using RAG context" if context_blocks else "Answered without RAG context",
+        ("Answered using RAG context" if context_blocks else "Answered without RAG context")
+        + _usage_note(usage),
+        _usage_extra(usage),
     )
 
-    # Update conversation memory
-    conversation = state.get("conversation", []).copy()
-    conversation.append({"role": "user", "content": query})
-    conversation.append({"role": "assistant", "content": answer})
-    state["conversation"] = conversation
-
-    return state
+    # Update conversation memory (the raw question, not the context-stuffed turn)
+    update["conversation"] = _new_turns(query, answer)
+    return update
 
 
-def ticket_node(state: GraphState) -> GraphState:
+def ticket_node(state: GraphState) -> Dict[str, Any]:
     """🔒 Create a ticket in DB if plan says so (USER-SCOPED)."""
     if not (state.get("plan_intent") == "create_ticket" and state.get("create_ticket")):
-        return state
+        return {}
 
     user_message = state["user_message"]
     answer = state.get("answer", "")
     user_id = state.get("user_id")
+    update: Dict[str, Any] = {}
 
     title = state.get("ticket_title") or f"Issue: {user_message[:60]}"
     description = state.get("ticket_description") or (
@@ -469,34 +750,91 @@ def ticket_node(state: GraphState) -> GraphState:
     )
     severity = state.get("severity") or "medium"
 
+    # 🔒 Duplicate check against the user's own open tickets
+    try:
+        similar, elapsed_ms = ticket_index.find_similar_tickets(user_id, title, description)
+    except Exception as e:
+        print(f"Ticket similarity lookup failed: {e}")
+        similar, elapsed_ms = [], 0.0
+
+    over_budget = not ticket_index.within_budget(elapsed_ms)
+    if over_budget:
+        print(
+            f"⚠️ Ticket similarity lookup took {elapsed_ms:.0f}ms "
+            f"(budget {settings.TICKET_DEDUP_BUDGET_MS:.0f}ms)"
+        )
+
+    update["similar_tickets"] = similar
+    _append_trace(
+        update,
+        "tickets",
+        f"Found {len(similar)} similar open tickets in {elapsed_ms:.0f}ms"
+        + (" (over latency budget)" if over_budget else ""),
+        {"similar_tickets": similar or None},
+    )
+
+    merge_target = None
+    if (
+        settings.TICKET_DEDUP_MERGE
+        and similar
+        and similar[0]["distance"] <= settings.TICKET_MERGE_MAX_DISTANCE
+    ):
+        merge_target = similar[0]["ticket_id"]
+
     db = SessionLocal()
     ticket_id = None
     try:
-        # 🔒 Create ticket with user_id
-        ticket = Ticket(
-            title=title,
-            description=description,
-            status="open",
-            severity=severity,
-            user_id=user_id  # 🔒 USER ISOLATION
-        )
-        db.add(ticket)
-        db.commit()
-        db.refresh(ticket)
+        ticket = None
+        if merge_target is not None:
+            # 🔒 Only merge into the user's own ticket
+            ticket = (
+                db.query(Ticket)
+                .filter(Ticket.id == merge_target, Ticket.user_id == user_id)
+                .first()
+            )
+
+        if ticket is not None:
+            ticket.description = (
+                f"{ticket.description}\n\n--- Duplicate report ---\n{description}"
+            )
+            db.commit()
+            db.refresh(ticket)
+            update["ticket_merged"] = True
+            sync_ticket_index([ticket], created=True)  # description changed: re-embed
+        else:
+            # 🔒 Create ticket with user_id
+            ticket = Ticket(
+                title=title,
+                description=description,
+                status="open",
+                severity=severity,
+                user_id=user_id  # 🔒 USER ISOLATION
+            )
+            db.add(ticket)
+            db.commit()
+            db.refresh(ticket)
+            update["ticket_merged"] = False
+            sync_ticket_index([ticket], created=True)
+
         ticket_id = ticket.id
-        state["ticket_id"] = ticket_id
+        update["ticket_id"] = ticket_id
     finally:
         db.close()
 
-    _append_trace(state, "tickets", f"Created new ticket #{ticket_id}")
+    if update.get("ticket_merged"):
+        _append_trace(update, "tickets", f"Merged report into existing ticket #{ticket_id}")
+    else:
+        _append_trace(update, "tickets", f"Created new ticket #{ticket_id}")
 
-    return state
+    return update
 
 
 # ---------- GRAPH DEFINITION ----------
 
 
 def build_graph():
+    from langgraph.graph import StateGraph, END
+
     g = StateGraph(GraphState)
 
     g.add_node("planner", planner_node)
@@ -513,12 +851,22 @@ def build_graph():
     return g.compile()
 
 
-compiled_graph = build_graph()
+def get_compiled_graph():
+    global _compiled_graph
+    if _compiled_graph is None:
+        with _init_lock:
+            if _compiled_graph is None:
+                _compiled_graph = build_graph()
+    return _compiled_graph
 
 
-def run_ops_graph(initial_state: GraphState) -> GraphState:
-    """Run the graph and return final state (including updated conversation)."""
-    # Initialize trace list in initial state before running
+def run_ops_graph(initial_state: GraphState, context: Optional[ContextStore] = None) -> GraphState:
+    """
+    Run the graph and return final state (including updated conversation).
+    `context` receives the texts of the retrieved refs (a fresh store if omitted).
+    """
+    # The trace is per turn: start empty, each node appends its own steps
     initial_state["trace"] = []
-    final_state = compiled_graph.invoke(initial_state)
+    config = {"configurable": {"context": context if context is not None else ContextStore()}}
+    final_state = get_compiled_graph().invoke(initial_state, config=config)
     return final_state
\ No newline at end of file
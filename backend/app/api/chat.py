@@ -1,53 +1,137 @@
 # app/api/chat.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from app.agents.graph import run_ops_graph
-from app.models.schemas import ChatResponse, TraceStep
+from app.config import settings
+from app.core.chunks import KNOWN_SOURCES, SOURCE_ALIASES, unknown_sources
+from app.core.coalesce import SingleFlight, request_key
+from app.core.llm_scheduler import set_llm_flow
+from app.core.rate_limit import rate_limited
+from app.models.schemas import ChatResponse, ChatScope, Citation, TraceStep
 from app.models.user import User
 from app.core.security import get_current_user
 
 router = APIRouter(tags=["chat"])
 
+_chat_flights = SingleFlight("chat")
+
 
 class ChatRequest(BaseModel):
     message: str
     # Previous conversation from frontend; list of {role, content}
     conversation: List[Dict[str, str]] = []
+    # Restrict document search (documents / sources / upload date)
+    scope: Optional[ChatScope] = None
+    # Citations of the previous answer; a follow-up question reuses them
+    citations: List[Citation] = []
 
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(
     payload: ChatRequest,
-    current_user: User = Depends(get_current_user)  # 🔒 USER AUTHENTICATION
+    current_user: User = Depends(rate_limited("chat"))  # 🔒 USER AUTHENTICATION + per-user budget
 ):
+    # An explicit scope is never widened: unknown sources are an error, not "everything"
+    unknown = unknown_sources(payload.scope.sources if payload.scope else None)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown sources {unknown}; expected any of {sorted(KNOWN_SOURCES | set(SOURCE_ALIASES))}",
+        )
+
+    # Chat LLM calls go ahead of background ingestion in the fair queue
+    set_llm_flow("interactive", current_user.id)
+
     # 🔒 Pass user_id into graph for multi-tenant isolation
     initial_state = {
         "user_message": payload.message,
         "conversation": payload.conversation,
-        "user_id": current_user.id  # 🔒 USER ISOLATION
+        "user_id": current_user.id,  # 🔒 USER ISOLATION
+        "scope": payload.scope.model_dump(exclude_none=True) if payload.scope else {},
+        # 🔒 Only ids are trusted from the client; the graph reloads them user-scoped
+        "previous_refs": [
+            c.model_dump(exclude_none=True, exclude={"marker", "cited"}) for c in payload.citations
+        ],
     }
 
-    final_state = run_ops_graph(initial_state)
+    async def compute():
+        return await run_in_threadpool(run_ops_graph, initial_state)
+
+    if settings.CHAT_COALESCE:
+        # 🔒 Same user + same normalized question + same conversation/scope only
+        key = request_key(
+            current_user.id,
+            payload.message,
+            {
+                "conversation": payload.conversation,
+                "scope": initial_state["scope"],
+                "citations": [c.id for c in payload.citations],
+            },
+        )
+        final_state, shared = await _chat_flights.do(
+            key, compute, settings.CHAT_COALESCE_WAIT_SECONDS
+        )
+    else:
+        final_state, shared = await compute(), False
 
     reply_text = final_state.get("answer", "")
 
     # If a ticket was created, append info
     ticket_id = final_state.get("ticket_id")
-    if ticket_id is not None:
-        reply_text += (
-            f"\n\n📌 I have created a ticket for this issue.\n"
-            f"Ticket ID: {ticket_id}"
-        )
+    if ticket_id is not None and final_state.get("plan_intent") == "create_ticket":
+        if final_state.get("ticket_merged"):
+            reply_text += (
+                f"\n\n📌 This looks like an existing open ticket, so I added your report to it.\n"
+                f"Ticket ID: {ticket_id}"
+            )
+        else:
+            reply_text += (
+                f"\n\n📌 I have created a ticket for this issue.\n"
+                f"Ticket ID: {ticket_id}"
+            )
+            similar = [
+                f"#{t['ticket_id']}"
+                for t in final_state.get("similar_tickets") or []
+                if t["ticket_id"] != ticket_id
+            ]
+            if similar:
+                reply_text += f"\nPossibly related open tickets: {', '.join(similar)}"
 
     updated_conversation = final_state.get("conversation", [])
     
     # Get the trace from the final state
     trace_data = final_state.get("trace", [])
 
+    if shared:
+        # Shared result: echo this request's own wording, don't touch the leader's state
+        updated_conversation = list(payload.conversation) + [
+            {"role": "user", "content": payload.message},
+            {"role": "assistant", "content": final_state.get("answer", "")},
+        ]
+        trace_data = [
+            {"node": "coalesce", "description": "Reused the result of an identical in-flight request"},
+            *trace_data,
+        ]
+
     return ChatResponse(
         reply=reply_text,
         conversation=updated_conversation,
         trace=trace_data,
-    )
\ No newline at end of file
+        citations=final_state.get("citations") or [],
+    )
+
+
+@router.get("/chat/metrics")
+def chat_metrics(current_user: User = Depends(get_current_user)):
+    """Process-wide coalescing and LLM queue counters (this worker only)."""
+    from app.agents.graph import get_llm_client
+
+    llm = get_llm_client()
+    queue = getattr(llm, "queue", None)
+    return {
+        "coalescing": _chat_flights.stats(),
+        "llm_queue": queue.stats() if queue is not None else None,
+    }
@@ -1,23 +1,37 @@
 # app/api/documents.py
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import os
-from pypdf import PdfReader
+import shutil
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
-import pandas as pd
-from docx import Document as DocxDocument
-import openpyxl
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from app.config import settings
 from app.core.db import get_db
 from app.models.db_models import Document, Chunk
 from app.models.user import User
 from app.core.rag import add_chunks
-from app.core.llm_client import LLMClient
+from app.core.chunks import build_chunk, chunk_extras
+from app.core.maintenance import delete_document, delete_document_chunks
+from app.core.pdf_extraction import extract_pdf_pages
+from app.core.ocr import image_mime_type, ocr_images, ocr_pdf_pages
+from app.core.llm_scheduler import set_llm_flow
+from app.core.summaries import schedule_summaries
+from app.core.workspaces import (
+    can_modify,
+    find_shared_copy,
+    member_workspace_ids,
+    require_member,
+    visible_documents,
+)
+from app.core.rate_limit import enforce, rate_limited
 from app.core.security import get_current_user
 
 router = APIRouter(tags=["documents"])
 
-UPLOAD_DIR = "./uploaded_docs"
+UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
@@ -58,51 +72,51 @@ def is_word_file(filename: str, content_type: str) -> bool:
     return ext in word_extensions or content_type in word_content_types
 
 
+def is_csv_file(filename: str, content_type: str) -> bool:
+    """Check if file is CSV"""
+    ext = os.path.splitext(filename.lower())[1]
+    return ext == ".csv" or content_type == "text/csv"
+
+
 def is_text_file(filename: str, content_type: str) -> bool:
-    """Check if file is text or CSV"""
-    text_extensions = {".txt", ".csv"}
-    text_content_types = {"text/plain", "text/csv"}
+    """Check if file is plain text"""
+    text_extensions = {".txt"}
+    text_content_types = {"text/plain"}
     ext = os.path.splitext(filename.lower())[1]
     return ext in text_extensions or content_type in text_content_types
 
 
 # ==================== EXTRACTORS ====================
+# Parser libraries (pypdf, openpyxl/pandas, python-docx) are imported inside
+# each extractor so they only load when that format is actually uploaded.
+# PDFs go through app.core.pdf_extraction (process pool + per-page cache).
 
-def extract_pdf_text(path: str) -> List[str]:
-    """Extract text from PDF, page by page"""
-    reader = PdfReader(path)
-    pages = []
-    for page in reader.pages:
-        pages.append(page.extract_text() or "")
-    return pages
+def extract_excel_chunks(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream row-group chunks from Excel (workbook parsed once, header repeated per chunk)"""
+    from app.core.spreadsheet_extraction import iter_excel_chunks
 
-
-def extract_excel_text(path: str) -> List[str]:
-    """Extract text from Excel, sheet by sheet"""
     try:
-        # Read all sheets
-        xl_file = pd.ExcelFile(path)
-        chunks = []
-        
-        for sheet_name in xl_file.sheet_names:
-            df = pd.read_excel(path, sheet_name=sheet_name)
-            
-            # Convert dataframe to readable text
-            text_lines = [f"Sheet: {sheet_name}\n"]
-            text_lines.append(df.to_string(index=False))
-            
-            chunk_text = "\n".join(text_lines)
-            if chunk_text.strip():
-                chunks.append(chunk_text)
-        
-        return chunks
+        yield from iter_excel_chunks(path)
     except Exception as e:
         print(f"Error extracting Excel: {e}")
-        return [f"Error reading Excel file: {str(e)}"]
+        yield f"Error reading Excel file: {str(e)}", {}
+
+
+def extract_csv_chunks(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream row-group chunks from CSV through the same path as spreadsheets"""
+    from app.core.spreadsheet_extraction import iter_csv_chunks
+
+    try:
+        yield from iter_csv_chunks(path)
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        yield f"Error reading file: {str(e)}", {}
 
 
 def extract_word_text(path: str) -> List[str]:
     """Extract text from Word document, paragraph by paragraph"""
+    from docx import Document as DocxDocument
+
     try:
         doc = DocxDocument(path)
         
@@ -119,7 +133,7 @@ def extract_word_text(path: str) -> List[str]:
 
 
 def extract_text_file(path: str) -> List[str]:
-    """Extract text from TXT or CSV"""
+    """Extract text from TXT"""
     try:
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
@@ -132,12 +146,152 @@ def extract_text_file(path: str) -> List[str]:
         return [f"Error reading file: {str(e)}"]
 
 
+# ==================== INGESTION ====================
+
+# Chunks are written to Chroma + SQL in batches of this size, so a huge
+# spreadsheet never has all of its chunks in memory at once.
+INGEST_BATCH_SIZE = 64
+
+
+def ingest_chunks(
+    db: Session,
+    doc: Document,
+    user_id: int,
+    source: str,
+    filename: str,
+    chunks: Iterable[Tuple[str, Dict[str, Any]]],
+) -> int:
+    """
+    🔒 Index a stream of (text, extra_meta) chunks for one document (USER-SCOPED).
+    Returns the number of chunks stored.
+    """
+    texts: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    total = 0
+    char_offset = 0
+
+    def flush() -> None:
+        nonlocal char_offset
+        if not texts:
+            return
+        vector_ids = add_chunks(texts, metadatas)
+
+        # Store chunk rows in SQLite (typed columns + vector id, so deletes can find them)
+        for text, meta, vector_id in zip(texts, metadatas, vector_ids):
+            db.add(build_chunk(text, meta, char_offset, vector_id))
+            char_offset += len(text)
+        db.commit()
+        texts.clear()
+        metadatas.clear()
+
+    for text, extra in chunks:
+        if not text.strip():
+            continue
+        meta = {
+            "document_id": doc.id,
+            "page": total,
+            "source": source,
+            "filename": filename,
+            "user_id": user_id,
+        }
+        if doc.workspace_id is not None:
+            meta["workspace_id"] = doc.workspace_id  # 🔒 visible to the workspace's members
+        meta.update(extra)
+        texts.append(text)
+        metadatas.append(meta)
+        total += 1
+
+        if len(texts) >= INGEST_BATCH_SIZE:
+            flush()
+
+    flush()
+    return total
+
+
+def _pdf_chunks(
+    pages: List[Dict[str, Any]],
+    ocr_texts: Dict[int, str],
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """One chunk per page (real page number); scanned pages use their OCR text, failed pages are skipped."""
+    for p in pages:
+        if p["error"]:
+            continue
+        if not p["needs_ocr"]:
+            yield p["text"], {"page": p["page"]}
+        elif ocr_texts.get(p["page"]):
+            yield ocr_texts[p["page"]], {"page": p["page"], "ocr": True}
+
+
+def _single_page(texts: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Adapt list-returning extractors to the chunk stream; all chunks are page 0."""
+    for text in texts:
+        yield text, {"page": 0}
+
+
 # ==================== UPLOAD ENDPOINT ====================
 
+def _save_upload(file: UploadFile) -> str:
+    """Save file locally (streamed to disk, not read into memory)"""
+    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, length=1024 * 1024)
+    return file_path
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _create_document(
+    db: Session,
+    filename: str,
+    file_path: str,
+    user_id: int,
+    workspace_id: Optional[int] = None,
+    content_hash: Optional[str] = None,
+) -> Document:
+    # 🔒 Insert into documents table with user_id (+ the workspace it is shared into)
+    doc = Document(
+        name=filename,
+        path=file_path,
+        user_id=user_id,
+        workspace_id=workspace_id,
+        content_hash=content_hash,
+    )
+    db.add(doc)
+    db.commit()
+    db.refresh(doc)
+    return doc
+
+
+def _shared_copy_response(db: Session, doc: Document) -> Dict[str, Any]:
+    """The workspace already has this file: reuse its chunks and vectors."""
+    num_chunks = db.query(func.count(Chunk.id)).filter(Chunk.document_id == doc.id).scalar()
+    return {
+        "message": "already in workspace",
+        "document_id": doc.id,
+        "workspace_id": doc.workspace_id,
+        "chunks": num_chunks,
+        "deduplicated": True,
+    }
+
+
+def _read_image(file_path: str, filename: str, content_type: str) -> Tuple[bytes, str]:
+    with open(file_path, "rb") as f:
+        data = f.read()
+    mime_type = content_type if content_type.startswith("image/") else image_mime_type(filename)
+    return data, mime_type
+
+
 @router.post("/documents/upload")
 async def upload_document(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    workspace_id: Optional[int] = Query(None, description="share with this workspace's members"),
+    current_user: User = Depends(rate_limited("upload")),  # 🔒 per-user budget
     db: Session = Depends(get_db)
 ):
     # Determine file type
@@ -145,128 +299,251 @@ async def upload_document(
     is_image = is_image_file(file.filename, file.content_type or "")
     is_excel = is_excel_file(file.filename, file.content_type or "")
     is_word = is_word_file(file.filename, file.content_type or "")
+    is_csv = is_csv_file(file.filename, file.content_type or "")
     is_text = is_text_file(file.filename, file.content_type or "")
     
     # Check if file type is supported
-    if not any([is_pdf, is_image, is_excel, is_word, is_text]):
+    if not any([is_pdf, is_image, is_excel, is_word, is_csv, is_text]):
         raise HTTPException(
             status_code=400,
             detail="Unsupported file type. Supported: PDF, DOCX, XLSX, XLS, CSV, TXT, PNG, JPG, JPEG"
         )
     
-    # Save file locally
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    if workspace_id is not None:
+        require_member(db, workspace_id, current_user.id)  # 🔒 before anything is stored
+    if is_image:
+        enforce("ocr", current_user.id)  # 🔒 before anything is stored
+    set_llm_flow("ingest", current_user.id)
+
+    file_path = _save_upload(file)
+    file_hash = _file_sha256(file_path)
+    if workspace_id is not None:
+        shared = find_shared_copy(db, workspace_id, file_hash)
+        if shared is not None:
+            return _shared_copy_response(db, shared)
+
+    # Extract based on file type → stream of (text, extra metadata)
+    ocr_pages: List[int] = []
+    failed_pages: List[int] = []
+    ocr_recovered = 0
+    if is_pdf:
+        source = "pdf"
+        # CPU-heavy and fans out to a process pool: keep it off the event loop
+        pdf_pages = await run_in_threadpool(extract_pdf_pages, file_path)
+        ocr_pages = [p["page"] for p in pdf_pages if p["needs_ocr"]]
+        failed_pages = [p["page"] for p in pdf_pages if p["error"]]
+        if failed_pages:
+            print(f"⚠️ {file.filename}: text extraction failed on pages {failed_pages}")
+
+        # Scanned pages: OCR their embedded images in one batched run
+        ocr_texts: Dict[int, str] = {}
+        if ocr_pages:
+            # No document row yet; the saved file is swept by compaction on 429
+            enforce("ocr", current_user.id, cost=len(ocr_pages))
+            ocr_texts = await run_in_threadpool(ocr_pdf_pages, file_path, ocr_pages)
+            ocr_recovered = len(ocr_texts)
+            print(
+                f"{file.filename}: {len(ocr_pages)} pages had no text layer, "
+                f"OCR recovered {ocr_recovered}"
+            )
+        chunks = _pdf_chunks(pdf_pages, ocr_texts)
 
-    # 🔒 Insert into documents table with user_id
-    doc = Document(
-        name=file.filename,
-        path=file_path,
-        user_id=current_user.id
-    )
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    elif is_excel:
+        source = "excel"
+        chunks = extract_excel_chunks(file_path)
 
-    chunk_texts = []
-    metadatas = []
+    elif is_csv:
+        source = "csv"
+        chunks = extract_csv_chunks(file_path)
 
-    # Extract based on file type
-    if is_pdf:
-        pages = extract_pdf_text(file_path)
-        chunk_texts = [page for page in pages if page.strip()]
-        metadatas = [
-            {
-                "document_id": doc.id,
-                "page": idx,
-                "source": "pdf",
-                "user_id": current_user.id
-            }
-            for idx in range(len(chunk_texts))
-        ]
-    
-    elif is_excel:
-        sheets = extract_excel_text(file_path)
-        chunk_texts = [sheet for sheet in sheets if sheet.strip()]
-        metadatas = [
-            {
-                "document_id": doc.id,
-                "page": idx,
-                "source": "excel",
-                "filename": file.filename,
-                "user_id": current_user.id
-            }
-            for idx in range(len(chunk_texts))
-        ]
-    
     elif is_word:
-        paragraphs = extract_word_text(file_path)
-        chunk_texts = [para for para in paragraphs if para.strip()]
-        metadatas = [
-            {
-                "document_id": doc.id,
-                "page": 0,
-                "source": "word",
-                "filename": file.filename,
-                "user_id": current_user.id
-            }
-        ]
-    
+        source = "word"
+        chunks = _single_page(extract_word_text(file_path))
+
     elif is_text:
-        content = extract_text_file(file_path)
-        chunk_texts = [c for c in content if c.strip()]
-        metadatas = [
-            {
-                "document_id": doc.id,
-                "page": 0,
-                "source": "text",
-                "filename": file.filename,
-                "user_id": current_user.id
-            }
-        ]
-    
-    elif is_image:
-        # Handle image files with Gemini Vision
-        llm_client = LLMClient()
-        text = llm_client.extract_image_text(file_path)
-        
-        if text.strip():
-            chunk_texts = [text]
-            metadatas = [
-                {
-                    "document_id": doc.id,
-                    "page": 0,
-                    "source": "image",
-                    "filename": file.filename,
-                    "user_id": current_user.id
-                }
-            ]
-
-    # Insert chunks into Chroma + SQLite
-    if chunk_texts:
-        add_chunks(chunk_texts, metadatas)
-
-        # Store chunk rows in SQLite
-        for idx, text in enumerate(chunk_texts):
-            meta_info = {"page": metadatas[idx].get("page", idx)}
-            meta_info["source"] = metadatas[idx].get("source", "unknown")
-            if "filename" in metadatas[idx]:
-                meta_info["filename"] = metadatas[idx]["filename"]
-            
-            chunk = Chunk(
-                document_id=doc.id,
-                content=text,
-                meta_json=str(meta_info),
-                user_id=current_user.id
-            )
-            db.add(chunk)
+        source = "text"
+        chunks = _single_page(extract_text_file(file_path))
 
-    db.commit()
-    
-    return {
+    else:  # is_image
+        # OCR through the configured backend (cached by content hash)
+        source = "image"
+        image = _read_image(file_path, file.filename, file.content_type or "")
+        texts = await run_in_threadpool(ocr_images, [image])
+        chunks = _single_page(texts)
+
+    doc = _create_document(db, file.filename, file_path, current_user.id, workspace_id, file_hash)
+
+    # Insert chunks into Chroma + SQLite, batch by batch
+    num_chunks = ingest_chunks(
+        db, doc, current_user.id, source, file.filename, chunks
+    )
+    if num_chunks:
+        schedule_summaries(doc.id, current_user.id)
+
+    response = {
         "message": "uploaded",
         "document_id": doc.id,
-        "chunks": len(chunk_texts),
-        "file_type": metadatas[0].get("source", "unknown") if metadatas else "unknown"
-    }
\ No newline at end of file
+        "workspace_id": workspace_id,
+        "chunks": num_chunks,
+        "file_type": source if num_chunks else "unknown"
+    }
+    if ocr_pages:
+        response["pages_needing_ocr"] = ocr_pages
+        response["pages_ocr_recovered"] = ocr_recovered
+    if failed_pages:
+        response["pages_failed"] = failed_pages
+    return response
+
+
+@router.post("/documents/upload-images")
+async def upload_images(
+    files: List[UploadFile] = File(...),
+    workspace_id: Optional[int] = Query(None, description="share with this workspace's members"),
+    current_user: User = Depends(rate_limited("upload")),  # 🔒 per-user budget
+    db: Session = Depends(get_db)
+):
+    """
+    Upload several images at once; they are OCR'd together in batched
+    backend calls instead of one request per image.
+    """
+    for f in files:
+        if not is_image_file(f.filename, f.content_type or ""):
+            raise HTTPException(
+                status_code=400,
+                detail=f"{f.filename}: only PNG, JPG and JPEG images are accepted here"
+            )
+    if workspace_id is not None:
+        require_member(db, workspace_id, current_user.id)  # 🔒
+    enforce("ocr", current_user.id, cost=len(files))
+    set_llm_flow("ingest", current_user.id)
+
+    results = []
+    new_files: List[UploadFile] = []
+    docs: List[Document] = []
+    images: List[Tuple[bytes, str]] = []
+    for f in files:
+        file_path = _save_upload(f)
+        file_hash = _file_sha256(file_path)
+        shared = find_shared_copy(db, workspace_id, file_hash) if workspace_id is not None else None
+        if shared is not None:
+            results.append({"filename": f.filename, **_shared_copy_response(db, shared)})
+            continue
+        new_files.append(f)
+        docs.append(_create_document(db, f.filename, file_path, current_user.id, workspace_id, file_hash))
+        images.append(_read_image(file_path, f.filename, f.content_type or ""))
+
+    texts = await run_in_threadpool(ocr_images, images) if images else []
+
+    for f, doc, text in zip(new_files, docs, texts):
+        num_chunks = ingest_chunks(
+            db, doc, current_user.id, "image", f.filename, _single_page([text])
+        )
+        if num_chunks:
+            schedule_summaries(doc.id, current_user.id)
+        results.append({
+            "document_id": doc.id,
+            "filename": f.filename,
+            "chunks": num_chunks,
+        })
+
+    return {"message": "uploaded", "documents": results}
+
+
+# ==================== LISTING / DELETION ====================
+
+def _get_user_document(db: Session, document_id: int, user_id: int, modify: bool = False) -> Document:
+    """🔒 A document the user can read (own or shared with them); modify=True also requires can_modify."""
+    doc = (
+        visible_documents(db, user_id)  # 🔒 USER ISOLATION + workspace membership
+        .filter(Document.id == document_id)
+        .first()
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if modify and not can_modify(db, doc, user_id):
+        raise HTTPException(status_code=403, detail="Only the uploader or a workspace owner can change this document")
+    return doc
+
+
+@router.get("/documents")
+def list_documents(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 The user's documents and those shared into their workspaces, with chunk counts."""
+    workspace_ids = member_workspace_ids(db, current_user.id)
+    rows = (
+        visible_documents(db, current_user.id, workspace_ids)  # 🔒 USER ISOLATION
+        .add_columns(func.count(Chunk.id))
+        .outerjoin(Chunk, Chunk.document_id == Document.id)
+        .group_by(Document.id)
+        .order_by(Document.id.desc())
+        .all()
+    )
+    return [
+        {
+            "id": doc.id,
+            "name": doc.name,
+            "uploaded_at": doc.uploaded_at,
+            "chunks": num_chunks,
+            "workspace_id": doc.workspace_id,
+            "owned": doc.user_id == current_user.id,
+        }
+        for doc, num_chunks in rows
+    ]
+
+
+@router.get("/documents/{document_id}/chunks")
+def list_document_chunks(
+    document_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 Chunks of one document (id + short preview), e.g. to pick some to delete."""
+    doc = _get_user_document(db, document_id, current_user.id)
+    chunks = (
+        db.query(Chunk)
+        .filter(Chunk.document_id == doc.id)
+        .order_by(Chunk.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": c.id,
+            "page": c.page,
+            "source": c.source,
+            "char_start": c.char_start,
+            "char_end": c.char_end,
+            "token_count": c.token_count,
+            "meta": chunk_extras(c),
+            "preview": c.content[:200],
+        }
+        for c in chunks
+    ]
+
+
+@router.delete("/documents/{document_id}")
+def delete_document_endpoint(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 Delete a document with its chunks, vectors and uploaded file."""
+    doc = _get_user_document(db, document_id, current_user.id, modify=True)
+    return delete_document(db, doc)
+
+
+@router.delete("/documents/{document_id}/chunks")
+def delete_document_chunks_endpoint(
+    document_id: int,
+    chunk_ids: List[int] = Query(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 Delete selected chunks (rows + vectors) of a document."""
+    doc = _get_user_document(db, document_id, current_user.id, modify=True)
+    return delete_document_chunks(db, doc, chunk_ids)
@@ -1,11 +1,35 @@
 # app/api/tickets.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from app.core.db import get_db
+from app.core.tickets import (
+    DEFAULT_PAGE_SIZE,
+    MAX_BULK_ITEMS,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    close_tickets,
+    count_tickets,
+    create_tickets,
+    list_tickets_page,
+    sync_ticket_index,
+    update_tickets,
+)
 from app.models.db_models import Ticket
-from app.models.schemas import TicketCreate, TicketOut
+from app.models.schemas import (
+    TicketCreate,
+    TicketOut,
+    TicketPage,
+    TicketCount,
+    TicketUpdate,
+    TicketBulkCreate,
+    TicketBulkUpdate,
+    TicketBulkClose,
+    BulkItemResult,
+    BulkResult,
+)
 from app.models.user import User
 from app.core.security import get_current_user
 
@@ -29,19 +53,146 @@ def create_ticket(
     db.add(ticket)
     db.commit()
     db.refresh(ticket)
+    sync_ticket_index([ticket], created=True)
     return ticket
 
 
-@router.get("/tickets", response_model=List[TicketOut])
+@router.get("/tickets", response_model=TicketPage)
 def list_tickets(
+    status: Optional[List[str]] = Query(None, description="Repeatable, e.g. ?status=open&status=in_progress"),
+    severity: Optional[List[str]] = Query(None, description="Repeatable, e.g. ?severity=critical"),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # 🔒 Only return tickets belonging to current user
-    tickets = (
-        db.query(Ticket)
-        .filter(Ticket.user_id == current_user.id)  # 🔒 USER ISOLATION
-        .order_by(Ticket.created_at.desc())
-        .all()
+    try:
+        tickets, next_cursor = list_tickets_page(
+            db,
+            current_user.id,  # 🔒 USER ISOLATION
+            status=status,
+            severity=severity,
+            created_after=created_after,
+            created_before=created_before,
+            cursor=cursor,
+            limit=limit,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return TicketPage(
+        items=[TicketOut.model_validate(t) for t in tickets],
+        next_cursor=next_cursor,
     )
-    return tickets
\ No newline at end of file
+
+
+@router.get("/tickets/count", response_model=TicketCount)
+def tickets_count(
+    status: Optional[List[str]] = Query(None),
+    severity: Optional[List[str]] = Query(None),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    count = count_tickets(
+        db,
+        current_user.id,  # 🔒 USER ISOLATION
+        status=status,
+        severity=severity,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    return TicketCount(count=count)
+
+
+# ---------- BULK OPERATIONS ----------
+# Declared before /tickets/{ticket_id} so "bulk" is never parsed as an id.
+
+
+def _check_batch_size(n: int) -> None:
+    if n == 0:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if n > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {n} items (max {MAX_BULK_ITEMS})",
+        )
+
+
+def _bulk_response(results: list) -> BulkResult:
+    items = [
+        BulkItemResult(
+            index=r["index"],
+            id=r.get("id"),
+            ok=r["ok"],
+            error=r.get("error"),
+            ticket=TicketOut.model_validate(r["ticket"]) if r.get("ticket") is not None else None,
+        )
+        for r in results
+    ]
+    succeeded = sum(1 for r in items if r.ok)
+    return BulkResult(succeeded=succeeded, failed=len(items) - succeeded, results=items)
+
+
+@router.post("/tickets/bulk", response_model=BulkResult)
+def bulk_create_tickets(
+    payload: TicketBulkCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _check_batch_size(len(payload.items))
+    results = create_tickets(
+        db,
+        current_user.id,  # 🔒 USER ISOLATION
+        [item.model_dump() for item in payload.items],
+    )
+    return _bulk_response(results)
+
+
+@router.patch("/tickets/bulk", response_model=BulkResult)
+def bulk_update_tickets(
+    payload: TicketBulkUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _check_batch_size(len(payload.items))
+    results = update_tickets(
+        db,
+        current_user.id,  # 🔒 USER ISOLATION
+        [item.model_dump() for item in payload.items],
+        all_or_nothing=payload.all_or_nothing,
+    )
+    return _bulk_response(results)
+
+
+@router.post("/tickets/bulk/close", response_model=BulkResult)
+def bulk_close_tickets(
+    payload: TicketBulkClose,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _check_batch_size(len(payload.ids))
+    results = close_tickets(db, current_user.id, payload.ids)  # 🔒 USER ISOLATION
+    return _bulk_response(results)
+
+
+@router.patch("/tickets/{ticket_id}", response_model=TicketOut)
+def update_ticket(
+    ticket_id: int,
+    payload: TicketUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    result = update_tickets(
+        db,
+        current_user.id,  # 🔒 USER ISOLATION
+        [{"id": ticket_id, **payload.model_dump()}],
+    )[0]
+    if not result["ok"]:
+        status_code = 404 if result.get("not_found") else 400
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    return result["ticket"]
@@ -0,0 +1,150 @@
+# app/api/workspaces.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.db import get_db
+from app.core.security import get_current_user
+from app.core.workspaces import ROLES, get_membership, require_member
+from app.models.db_models import Document, Workspace, WorkspaceMember
+from app.models.schemas import WorkspaceCreate, WorkspaceMemberAdd
+from app.models.user import User
+
+router = APIRouter(tags=["workspaces"])
+
+
+@router.post("/workspaces")
+def create_workspace(
+    payload: WorkspaceCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create a workspace; the creator is its first owner."""
+    name = payload.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Workspace name is required")
+    workspace = Workspace(name=name, created_by=current_user.id)
+    db.add(workspace)
+    db.flush()
+    db.add(WorkspaceMember(workspace_id=workspace.id, user_id=current_user.id, role="owner"))
+    db.commit()
+    return {"id": workspace.id, "name": workspace.name, "role": "owner"}
+
+
+@router.get("/workspaces")
+def list_workspaces(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 Workspaces the user belongs to, with member and document counts."""
+    rows = (
+        db.query(Workspace, WorkspaceMember.role)
+        .join(WorkspaceMember, WorkspaceMember.workspace_id == Workspace.id)
+        .filter(WorkspaceMember.user_id == current_user.id)  # 🔒 USER ISOLATION
+        .order_by(Workspace.id)
+        .all()
+    )
+    ids = [w.id for w, _ in rows]
+    members = dict(
+        db.query(WorkspaceMember.workspace_id, func.count(WorkspaceMember.id))
+        .filter(WorkspaceMember.workspace_id.in_(ids))
+        .group_by(WorkspaceMember.workspace_id)
+    ) if ids else {}
+    documents = dict(
+        db.query(Document.workspace_id, func.count(Document.id))
+        .filter(Document.workspace_id.in_(ids))
+        .group_by(Document.workspace_id)
+    ) if ids else {}
+    return [
+        {
+            "id": w.id,
+            "name": w.name,
+            "role": role,
+            "members": members.get(w.id, 0),
+            "documents": documents.get(w.id, 0),
+        }
+        for w, role in rows
+    ]
+
+
+@router.get("/workspaces/{workspace_id}/members")
+def list_members(
+    workspace_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 Members of a workspace (members only)."""
+    require_member(db, workspace_id, current_user.id)
+    rows = (
+        db.query(WorkspaceMember, User.email)
+        .join(User, User.id == WorkspaceMember.user_id)
+        .filter(WorkspaceMember.workspace_id == workspace_id)
+        .order_by(WorkspaceMember.id)
+        .all()
+    )
+    return [
+        {"user_id": m.user_id, "email": email, "role": m.role, "joined_at": m.created_at}
+        for m, email in rows
+    ]
+
+
+@router.post("/workspaces/{workspace_id}/members")
+def add_member(
+    workspace_id: int,
+    payload: WorkspaceMemberAdd,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """🔒 Add a user by email, or change their role (owners only)."""
+    require_member(db, workspace_id, current_user.id, role="owner")
+    if payload.role not in ROLES:
+        raise HTTPException(status_code=400, detail=f"role must be one of {list(ROLES)}")
+    user = db.query(User).filter(User.email == payload.email).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    membership = get_membership(db, workspace_id, user.id)
+    if membership is None:
+        membership = WorkspaceMember(workspace_id=workspace_id, user_id=user.id, role=payload.role)
+        db.add(membership)
+    else:
+        _check_keeps_owner(db, workspace_id, membership, payload.role)
+        membership.role = payload.role
+    db.commit()
+    return {"workspace_id": workspace_id, "user_id": user.id, "role": membership.role}
+
+
+@router.delete("/workspaces/{workspace_id}/members/{user_id}")
+def remove_member(
+    workspace_id: int,
+    user_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    🔒 Remove a member (owners), or leave (anyone, with their own user id).
+    Access ends immediately; documents the member uploaded stay shared.
+    """
+    own = require_member(db, workspace_id, current_user.id)
+    if user_id != current_user.id and own.role != "owner":
+        raise HTTPException(status_code=403, detail="Requires workspace role 'owner'")
+    membership = get_membership(db, workspace_id, user_id)
+    if membership is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    _check_keeps_owner(db, workspace_id, membership, None)
+    db.delete(membership)
+    db.commit()
+    return {"workspace_id": workspace_id, "user_id": user_id, "removed": True}
+
+
+def _check_keeps_owner(db: Session, workspace_id: int, membership: WorkspaceMember, new_role) -> None:
+    """A workspace that has an owner keeps at least one."""
+    if membership.role != "owner" or new_role == "owner":
+        return
+    owners = (
+        db.query(func.count(WorkspaceMember.id))
+        .filter(WorkspaceMember.workspace_id == workspace_id, WorkspaceMember.role == "owner")
+        .scalar()
+    )
+    if owners <= 1:
+        raise HTTPException(status_code=400, detail="A workspace needs at least one owner")
@@ -0,0 +1,187 @@
+# app/core/chunks.py
+#
+# Chunk rows: typed columns + SQL prefilters for retrieval.
+# - page / source / char offsets / token count / content hash / vector id are
+#   real (indexed) columns on `chunks`; `meta_json` only holds the
+#   source-specific extras (sheet, row range, ocr flag) as JSON
+# - `scope_document_ids` answers "only these documents" / "only spreadsheets" /
+#   "uploaded last week" in SQL, so the Chroma query can be narrowed to a
+#   `document_id $in` filter
+# - "the user's documents" = their own plus those shared into their
+#   workspaces (app/core/workspaces.py)
+
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.workspaces import visible_to
+from app.models.db_models import Chunk, Document
+
+# Metadata keys that have their own column (everything else goes to meta_json)
+_COLUMN_KEYS = {"page", "source", "document_id", "user_id", "workspace_id", "filename"}
+
+# Source groups users (and the planner) can refer to
+SOURCE_ALIASES = {
+    "spreadsheet": ["excel", "csv"],
+    "spreadsheets": ["excel", "csv"],
+    "xlsx": ["excel"],
+    "docx": ["word"],
+    "txt": ["text"],
+}
+KNOWN_SOURCES = {"pdf", "excel", "csv", "word", "text", "image"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token), good enough for budgets/metrics."""
+    return (len(text) + 3) // 4
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_chunk(
+    text: str,
+    meta: Dict[str, Any],
+    char_start: int,
+    vector_id: Optional[str],
+) -> Chunk:
+    """Chunk row from the metadata dict sent to Chroma."""
+    extras = {k: v for k, v in meta.items() if k not in _COLUMN_KEYS}
+    return Chunk(
+        document_id=meta["document_id"],
+        user_id=meta["user_id"],
+        workspace_id=meta.get("workspace_id"),
+        content=text,
+        page=meta.get("page"),
+        source=meta.get("source"),
+        char_start=char_start,
+        char_end=char_start + len(text),
+        token_count=estimate_tokens(text),
+        content_hash=content_hash(text),
+        vector_id=vector_id,
+        meta_json=json.dumps(extras, separators=(",", ":")) if extras else None,
+    )
+
+
+def chunk_extras(chunk: Chunk) -> Dict[str, Any]:
+    if not chunk.meta_json:
+        return {}
+    try:
+        extras = json.loads(chunk.meta_json)
+    except ValueError:
+        return {}
+    return extras if isinstance(extras, dict) else {}
+
+
+def chunk_vector_metadata(chunk: Chunk, filename: Optional[str] = None) -> Dict[str, Any]:
+    """Rebuild the Chroma metadata of a chunk from its row."""
+    meta: Dict[str, Any] = {
+        k: v for k, v in chunk_extras(chunk).items()
+        if isinstance(v, (str, int, float, bool))
+    }
+    meta.update({
+        "document_id": chunk.document_id,
+        "user_id": chunk.user_id,
+        "page": chunk.page if chunk.page is not None else 0,
+    })
+    if chunk.source:
+        meta["source"] = chunk.source
+    if chunk.workspace_id is not None:
+        meta["workspace_id"] = chunk.workspace_id
+    if filename:
+        meta["filename"] = filename
+    return meta
+
+
+def normalize_sources(sources: Optional[Iterable[str]]) -> List[str]:
+    """Lower-case, expand aliases ("spreadsheet" → excel + csv), drop unknowns."""
+    result: List[str] = []
+    for s in sources or []:
+        s = str(s).strip().lower()
+        for name in SOURCE_ALIASES.get(s, [s]):
+            if name in KNOWN_SOURCES and name not in result:
+                result.append(name)
+    return result
+
+
+def unknown_sources(sources: Optional[Iterable[str]]) -> List[str]:
+    """The values normalize_sources would drop (neither a source nor an alias)."""
+    unknown: List[str] = []
+    for s in sources or []:
+        key = str(s).strip().lower()
+        if not any(name in KNOWN_SOURCES for name in SOURCE_ALIASES.get(key, [key])):
+            unknown.append(str(s))
+    return unknown
+
+
+def scope_document_ids(
+    db: Session,
+    user_id: int,
+    document_ids: Optional[Iterable[int]] = None,
+    sources: Optional[Iterable[str]] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    workspace_ids: Optional[List[int]] = None,
+) -> Optional[List[int]]:
+    """
+    🔒 SQL prefilter: the user's documents (own + shared into workspace_ids)
+    matching the scope.
+    Returns None when there is no scope (search everything), else the list of
+    document ids to pass to Chroma (possibly empty → nothing can match).
+    """
+    document_ids = list(document_ids or [])
+    sources = normalize_sources(sources)
+    if not (document_ids or sources or uploaded_after or uploaded_before):
+        return None
+
+    query = db.query(Chunk.document_id).filter(
+        visible_to(Chunk.user_id, Chunk.workspace_id, user_id, workspace_ids or [])  # 🔒 USER ISOLATION
+    )
+    if document_ids:
+        query = query.filter(Chunk.document_id.in_(document_ids))
+    if sources:
+        query = query.filter(Chunk.source.in_(sources))
+    if uploaded_after or uploaded_before:
+        query = query.join(Document, Document.id == Chunk.document_id)
+        if uploaded_after:
+            query = query.filter(Document.uploaded_at >= uploaded_after)
+        if uploaded_before:
+            query = query.filter(Document.uploaded_at < uploaded_before)
+    return [did for (did,) in query.distinct()]
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Words that describe "a document" rather than name one
+_HINT_STOPWORDS = {"the", "a", "an", "my", "our", "doc", "docs", "document", "documents", "file", "files"}
+
+
+def resolve_document_hints(
+    db: Session,
+    user_id: int,
+    hints: Iterable[str],
+    workspace_ids: Optional[List[int]] = None,
+) -> List[int]:
+    """
+    🔒 Map names the user mentioned ("the onboarding guide") to their documents
+    (own + shared into workspace_ids): a document matches a hint when its
+    name contains every word of the hint.
+    """
+    matched: List[int] = []
+    for hint in hints:
+        words = [w for w in _WORD_RE.findall(str(hint).lower()) if w not in _HINT_STOPWORDS]
+        if not words:
+            continue
+        query = db.query(Document.id).filter(
+            visible_to(Document.user_id, Document.workspace_id, user_id, workspace_ids or [])  # 🔒 USER ISOLATION
+        )
+        for word in words:
+            query = query.filter(Document.name.ilike(f"%{word}%"))
+        for (did,) in query.limit(50):
+            if did not in matched:
+                matched.append(did)
+    return matched
@@ -0,0 +1,98 @@
+# app/core/coalesce.py
+#
+# Single-flight request coalescing.
+# - Concurrent callers with the same key share ONE in-flight computation;
+#   the first caller (leader) runs it, the rest (followers) await its result
+# - Followers wait at most `wait_timeout` seconds, then run their own
+#   computation; if the leader fails or is cancelled they also run their own
+# - Nothing is cached after the leader finishes: only truly concurrent
+#   requests are merged
+# - Per process (one event loop per worker); workers do not share flights
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the question."""
+    return _WS_RE.sub(" ", message).strip().lower().rstrip("?!. ")
+
+
+def request_key(user_id: int, message: str, context: Any) -> str:
+    """🔒 Key is tenant-scoped; context = anything else that changes the answer."""
+    payload = json.dumps(
+        {"user_id": user_id, "message": normalize_message(message), "context": context},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Counters (process lifetime)
+        self.leaders = 0
+        self.coalesced = 0
+        self.wait_timeouts = 0
+        self.leader_failures = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        wait_timeout: float,
+    ) -> Tuple[Any, bool]:
+        """Returns (result, shared): shared is True when another request's result was reused."""
+        flight = self._inflight.get(key)
+        if flight is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight), wait_timeout)
+                self.coalesced += 1
+                return result, True
+            except asyncio.TimeoutError:
+                self.wait_timeouts += 1
+            except Exception:
+                self.leader_failures += 1
+            except asyncio.CancelledError:
+                # Leader cancelled (client went away); only re-raise if WE are being cancelled
+                if not flight.cancelled():
+                    raise
+                self.leader_failures += 1
+            return await fn(), False
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        self.leaders += 1
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(e)
+                flight.exception()  # mark retrieved; followers fall back to their own run
+            raise
+        else:
+            flight.set_result(result)
+            return result, False
+        finally:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        total = self.leaders + self.coalesced + self.wait_timeouts + self.leader_failures
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "wait_timeouts": self.wait_timeouts,
+            "leader_failures": self.leader_failures,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else None,
+        }
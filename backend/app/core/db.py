@@ -1,12 +1,99 @@
-from sqlalchemy import create_engine
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 
-DATABASE_URL = "sqlite:///./opscopilot.db"
+from app.config import settings
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+
+def normalize_database_url(url: str) -> str:
+    """Accept the `postgres://` form Heroku/Render hand out; SQLAlchemy 2 wants `postgresql://`."""
+    if url.startswith("postgres://"):
+        url = "postgresql+psycopg2://" + url[len("postgres://"):]
+    elif url.startswith("postgresql://"):
+        url = "postgresql+psycopg2://" + url[len("postgresql://"):]
+    return url
+
+
+DATABASE_URL = normalize_database_url(settings.DATABASE_URL)
+
+# SQLite tuning applied to every new DBAPI connection.
+# WAL lets readers keep going while a writer commits, NORMAL sync is safe in WAL
+# mode, and busy_timeout makes writers wait for the lock instead of failing.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms
+    "mmap_size": 256 * 1024 * 1024,  # 256 MB
+    "cache_size": -64 * 1024,  # negative = KiB, i.e. 64 MB per connection
+    "temp_store": "MEMORY",
+}
+
+# WAL allows many concurrent readers but still only one writer, so a small
+# pool is enough; extra connections would only queue on the write lock.
+SQLITE_POOL_SIZE = 8
+SQLITE_MAX_OVERFLOW = 8
+
+# Postgres handles real concurrency; size per worker process.
+# Total connections ≈ workers × (pool_size + max_overflow), keep it under max_connections.
+POSTGRES_POOL_SIZE = 10
+POSTGRES_MAX_OVERFLOW = 20
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _pool_setting(value, default):
+    return default if value is None else value
+
+
+def create_db_engine(url: str = DATABASE_URL, **kwargs):
+    """
+    Single engine factory for the whole app.
+    - SQLite: enables WAL + pragmas on connect and sizes the pool to match.
+    - Postgres: pooled connections with pre-ping and recycling.
+    Pool settings from config override the per-backend defaults.
+    """
+    url = normalize_database_url(url)
+    kwargs.setdefault("echo", settings.DB_ECHO)
+
+    if url.startswith("sqlite"):
+        connect_args = kwargs.pop("connect_args", {})
+        connect_args.setdefault("check_same_thread", False)
+        # sqlite3's own lock wait (seconds) – covers the window before pragmas run
+        connect_args.setdefault("timeout", SQLITE_PRAGMAS["busy_timeout"] / 1000)
+
+        if ":memory:" not in url:
+            kwargs.setdefault("pool_size", _pool_setting(settings.DB_POOL_SIZE, SQLITE_POOL_SIZE))
+            kwargs.setdefault("max_overflow", _pool_setting(settings.DB_MAX_OVERFLOW, SQLITE_MAX_OVERFLOW))
+            kwargs.setdefault("pool_timeout", settings.DB_POOL_TIMEOUT)
+
+        new_engine = create_engine(url, connect_args=connect_args, **kwargs)
+        event.listen(new_engine, "connect", _set_sqlite_pragmas)
+        return new_engine
+
+    if url.startswith("postgresql"):
+        kwargs.setdefault("pool_size", _pool_setting(settings.DB_POOL_SIZE, POSTGRES_POOL_SIZE))
+        kwargs.setdefault("max_overflow", _pool_setting(settings.DB_MAX_OVERFLOW, POSTGRES_MAX_OVERFLOW))
+        kwargs.setdefault("pool_timeout", settings.DB_POOL_TIMEOUT)
+        kwargs.setdefault("pool_recycle", settings.DB_POOL_RECYCLE)
+        # drop connections killed by the server / a proxy instead of erroring the request
+        kwargs.setdefault("pool_pre_ping", True)
+
+    return create_engine(url, **kwargs)
+
+
+engine = create_db_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -25,10 +112,77 @@ def get_db():
         db.close()
 
 
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def get_alembic_config(url: str = DATABASE_URL, configure_logger: bool = True):
+    """
+    Alembic config pointing at backend/migrations, usable from any cwd.
+    configure_logger=False keeps migrations/env.py from applying alembic.ini's
+    logging config (which would reset the app's logging on every startup).
+    """
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    cfg.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    cfg.attributes["configure_logger"] = configure_logger
+    return cfg
+
+
+# pg_advisory_lock key held while migrating (any constant shared by all workers)
+_MIGRATION_LOCK_KEY = 7_316_006
+
+
+@contextmanager
+def migration_lock(url: str = DATABASE_URL):
+    """
+    Cross-process lock around `alembic upgrade`: with `uvicorn --workers N`
+    every worker runs init_db() at startup, and the migrations (e.g. the
+    fold in 0006) must run once, not concurrently. The workers that wait
+    find the database at head and do nothing.
+    - Postgres: a session advisory lock, so it also covers several machines
+    - otherwise: an exclusive file lock in the temp dir, keyed by the URL
+      (one machine; without fcntl, i.e. on Windows, no lock is taken)
+    """
+    if url.startswith("postgresql"):
+        lock_engine = create_engine(url, poolclass=NullPool)
+        try:
+            with lock_engine.connect() as conn:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+                try:
+                    yield
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        finally:
+            lock_engine.dispose()
+        return
+
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    path = os.path.join(tempfile.gettempdir(), f"opscopilot-migrate-{digest}.lock")
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def init_db():
     # ✅ Import ACTUAL model files that exist
     import app.models.user
     import app.models.db_models
-    
 
-    Base.metadata.create_all(bind=engine)
+    # Schema is owned by Alembic migrations (backend/migrations).
+    # The initial revision is idempotent, so databases created by the old
+    # create_all() path are adopted instead of failing on existing tables.
+    from alembic import command
+
+    # One worker migrates at a time (see migration_lock)
+    with migration_lock():
+        command.upgrade(get_alembic_config(configure_logger=False), "head")
@@ -0,0 +1,174 @@
+# app/core/index_service.py
+#
+# Index service for multi-worker / multi-node deployments.
+# One process owns everything that must not be duplicated per API worker:
+# - the Chroma data directory, served by a `chroma run` child process
+#   (API workers connect with CHROMA_SERVER_URL → chromadb.HttpClient)
+# - the embedding model, served at POST /embed
+#   (API workers embed through RemoteEmbeddingFunction over a pooled
+#   HTTP client when INDEX_SERVICE_URL is set)
+# - background compaction (API workers skip it when INDEX_SERVICE_URL is set)
+#
+# Usage (from backend/):
+#   python -m app.core.index_service --port 8100 --chroma-port 8101
+#   CHROMA_SERVER_URL=http://localhost:8101 INDEX_SERVICE_URL=http://localhost:8100 \
+#       uvicorn app.main:app --workers 4
+
+import argparse
+import shutil
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+from app.config import settings
+
+# ---------- client side (API workers) ----------
+
+_http_client = None
+_http_lock = threading.Lock()
+
+
+def get_http_client():
+    """Process-wide pooled client for the index service (keep-alive connections)."""
+    global _http_client
+    if _http_client is None:
+        with _http_lock:
+            if _http_client is None:
+                import httpx
+
+                pool = settings.INDEX_SERVICE_POOL_SIZE
+                _http_client = httpx.Client(
+                    base_url=settings.INDEX_SERVICE_URL,
+                    timeout=settings.INDEX_SERVICE_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+                )
+    return _http_client
+
+
+class RemoteEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Vectors from the index service, which runs Chroma's default model.
+    Deliberately NOT a DefaultEmbeddingFunction subclass: Chroma's
+    Collection._embed ignores any DefaultEmbeddingFunction instance and embeds
+    with a local ONNX model. name() is still "default", so collections
+    created by either side stay interchangeable.
+    """
+
+    batch_size = 256
+
+    def __init__(self) -> None:
+        pass
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings: List[List[float]] = []
+        for start in range(0, len(input), self.batch_size):
+            res = get_http_client().post("/embed", json={"texts": list(input[start:start + self.batch_size])})
+            res.raise_for_status()
+            embeddings.extend(res.json()["embeddings"])
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "default"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "RemoteEmbeddingFunction":
+        return RemoteEmbeddingFunction()
+
+
+# ---------- service side ----------
+
+def create_app():
+    import numpy as np
+    from fastapi import FastAPI
+    from fastapi.concurrency import run_in_threadpool
+    from pydantic import BaseModel
+
+    service = FastAPI(title="OpsCopilot index service")
+    embedder = DefaultEmbeddingFunction()
+    stats = {"requests": 0, "texts": 0}
+
+    class EmbedRequest(BaseModel):
+        texts: List[str]
+
+    @service.post("/embed")
+    async def embed(payload: EmbedRequest):
+        vectors = await run_in_threadpool(embedder, payload.texts)
+        stats["requests"] += 1
+        stats["texts"] += len(payload.texts)
+        return {"embeddings": np.asarray(vectors, dtype=np.float32).tolist()}
+
+    @service.get("/health")
+    def health():
+        return {"status": "ok", **stats}
+
+    @service.on_event("startup")
+    def startup():
+        # Warm the model so the first worker request doesn't pay for loading it
+        embedder(["warmup"])
+        from app.core.maintenance import start_compaction
+
+        start_compaction()
+
+    @service.on_event("shutdown")
+    def shutdown():
+        from app.core.maintenance import stop_compaction
+
+        stop_compaction()
+
+    return service
+
+
+def _start_chroma(path: str, host: str, port: int) -> subprocess.Popen:
+    chroma = shutil.which("chroma")
+    if chroma is None:
+        raise SystemExit("`chroma` CLI not found; install chromadb or pass --no-chroma")
+    proc = subprocess.Popen([chroma, "run", "--path", path, "--host", host, "--port", str(port)])
+    time.sleep(1)
+    if proc.poll() is not None:
+        raise SystemExit(f"chroma server exited with code {proc.returncode}")
+    print(f"✅ Chroma server on {host}:{port} ({path})")
+    return proc
+
+
+def main() -> None:
+    from app.core import rag
+
+    parser = argparse.ArgumentParser(description="Shared embedding + Chroma index service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--chroma-port", type=int, default=8101)
+    parser.add_argument("--chroma-path", default=rag.CHROMA_DIR)
+    parser.add_argument("--no-chroma", action="store_true", help="Chroma server is run separately")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # This process reaches Chroma through the server too (never a second
+    # PersistentClient on the same directory) and embeds locally
+    if not settings.CHROMA_SERVER_URL:
+        settings.CHROMA_SERVER_URL = f"http://{args.host}:{args.chroma_port}"
+    settings.INDEX_SERVICE_URL = ""
+    rag.CHROMA_DIR = args.chroma_path
+
+    chroma = None if args.no_chroma else _start_chroma(args.chroma_path, args.host, args.chroma_port)
+    try:
+        uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+    finally:
+        if chroma is not None:
+            chroma.terminate()
+            try:
+                chroma.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                chroma.kill()
+
+
+if __name__ == "__main__":
+    main()
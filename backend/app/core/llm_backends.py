@@ -0,0 +1,303 @@
+# app/core/llm_backends.py
+#
+# Pluggable LLM backends, selected with settings.LLM_BACKEND:
+# - "gemini": the real client (app.core.llm_client.LLMClient)
+# - "fake":   deterministic, no network; configurable latency so load tests
+#             see realistic request times without spending money
+# - "record": wraps Gemini and appends every request/response to a JSONL file
+# - "replay": serves responses from such a file, keyed by request content
+#
+# Every backend implements the LLMClient surface used by the app:
+#   chat(messages) -> str   ("system" messages become the system instruction)
+#   extract_images_text([(bytes, mime_type), ...]) -> [str, ...]
+#   last_usage() -> {"prompt_tokens", "cached_tokens", "output_tokens"} of the
+#                   calling thread's last chat() call
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core.chunks import estimate_tokens
+
+Image = Tuple[bytes, str]
+
+
+def split_system(messages: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+    """(system instruction, conversation turns) from an OpenAI-style message list."""
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    return system, [m for m in messages if m["role"] != "system"]
+
+
+class LLMBackend(ABC):
+    """Interface shared by all backends."""
+
+    name = "base"
+    _usage = threading.local()
+
+    @abstractmethod
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        ...
+
+    @abstractmethod
+    def extract_images_text(self, images: List[Image]) -> List[str]:
+        ...
+
+    def last_usage(self) -> Dict[str, int]:
+        return dict(getattr(self._usage, "value", None) or {})
+
+    def _set_usage(self, prompt_tokens: int, cached_tokens: int = 0, output_tokens: int = 0) -> None:
+        self._usage.value = {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "output_tokens": output_tokens,
+        }
+
+
+# ---------- fake ----------
+
+_TICKET_IDS_RE = re.compile(r"#?(\d+)")
+_PROBLEM_WORDS = ("broken", "down", "not working", "error", "fails", "failing", "issue", "outage", "can't", "cannot")
+_FOLLOW_UP_PREFIXES = ("what do you mean", "can you clarify", "clarify", "tell me more", "more detail", "why is that", "and what about")
+
+
+class FakeLLMClient(LLMBackend):
+    """
+    Deterministic stand-in: keyword routing for the planner, answers that
+    quote the first context block, extractive summaries for the summarizer.
+    latency_ms (+ jitter) is slept per call.
+    Usage mimics a provider prefix cache: a system instruction seen before
+    in this process counts as cached.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = settings.LLM_FAKE_LATENCY_MS,
+        jitter_ms: float = settings.LLM_FAKE_JITTER_MS,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._seen_systems: set = set()
+
+    def _sleep(self) -> None:
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            return
+        with self._rng_lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    @staticmethod
+    def _plan(message: str) -> Dict[str, Any]:
+        text = message.lower()
+        ids = [int(n) for n in _TICKET_IDS_RE.findall(text)]
+        plan: Dict[str, Any] = {
+            "intent": "knowledge_query",
+            "use_rag": True,
+            "create_ticket": False,
+            "severity": "medium",
+        }
+        if "ticket" in text and any(w in text for w in ("list", "show", "my tickets")):
+            plan.update(intent="list_tickets", use_rag=False)
+            if "open" in text:
+                plan["filter_status"] = ["open"]
+        elif "ticket" in text and ids and any(w in text for w in ("close", "reopen", "mark", "set")):
+            plan.update(
+                intent="update_ticket",
+                use_rag=False,
+                ticket_ids=ids,
+                new_status="closed" if "close" in text else ("open" if "reopen" in text else None),
+                new_severity=next(
+                    (s for s in ("critical", "high", "medium", "low") if s in text), None
+                ),
+            )
+        elif any(w in text for w in _PROBLEM_WORDS):
+            plan.update(
+                intent="create_ticket",
+                create_ticket=True,
+                ticket_title=message[:60],
+                ticket_description=message,
+                severity="high" if "down" in text or "outage" in text else "medium",
+            )
+        elif text.startswith(_FOLLOW_UP_PREFIXES):
+            plan["follow_up"] = True
+        elif len(text.split()) <= 3 and any(w in text for w in ("hi", "hello", "thanks")):
+            plan.update(intent="chitchat", use_rag=False)
+        return plan
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        self._sleep()
+        system, turns = split_system(messages)
+        user_message = turns[-1]["content"] if turns else ""
+        system_tokens = estimate_tokens(system)
+        cached = system_tokens if system in self._seen_systems else 0
+        self._seen_systems.add(system)
+
+        if "Planner" in system:
+            answer = json.dumps(self._plan(user_message))
+        elif "Summarizer" in system:
+            # Extractive: the first line of each paragraph
+            excerpt = user_message.split("\n\n", 1)[-1]
+            answer = " ".join(p.strip().split("\n", 1)[0] for p in excerpt.split("\n\n") if p.strip())[:600]
+        else:
+            marker = "=== DOCUMENT CONTEXT ==="
+            answer = "No document context."
+            for text in (user_message, system):
+                if marker in text:
+                    context = text.split(marker, 1)[1].strip()
+                    answer = context.split("\n", 1)[0][:300]
+                    break
+        self._set_usage(
+            system_tokens + sum(estimate_tokens(m["content"]) for m in turns),
+            cached,
+            estimate_tokens(answer),
+        )
+        return answer
+
+    def extract_images_text(self, images: List[Image]) -> List[str]:
+        self._sleep()
+        return [""] * len(images)
+
+
+# ---------- record / replay ----------
+
+def request_key(method: str, payload: Any) -> str:
+    """Stable key for a request: sha256 of its canonical JSON (image bytes hashed)."""
+    if method == "extract_images_text":
+        payload = [[hashlib.sha256(data).hexdigest(), mime] for data, mime in payload]
+    canonical = json.dumps({"method": method, "payload": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RecordingLLMClient(LLMBackend):
+    """Pass-through to a real backend that appends each exchange to a JSONL file."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, path: str = settings.LLM_RECORD_PATH):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _record(self, method: str, payload: Any, response: Any, elapsed_ms: float) -> None:
+        entry = {
+            "key": request_key(method, payload),
+            "method": method,
+            "response": response,
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+        if method == "chat":
+            entry["messages"] = payload
+            entry["usage"] = self.inner.last_usage()
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        start = time.perf_counter()
+        response = self.inner.chat(messages)
+        self._record("chat", messages, response, (time.perf_counter() - start) * 1000)
+        self._usage.value = self.inner.last_usage()
+        return response
+
+    def extract_images_text(self, images: List[Image]) -> List[str]:
+        start = time.perf_counter()
+        texts = self.inner.extract_images_text(images)
+        self._record("extract_images_text", images, texts, (time.perf_counter() - start) * 1000)
+        return texts
+
+
+class ReplayMiss(KeyError):
+    """A request that is not in the recording (strict replay only)."""
+
+
+class ReplayLLMClient(LLMBackend):
+    """
+    Serves recorded responses. Misses raise ReplayMiss when strict, otherwise
+    fall back to the fake backend. With replay_latency the recorded latency
+    is slept too, so load tests keep the real timing profile.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        path: str = settings.LLM_RECORD_PATH,
+        strict: bool = settings.LLM_REPLAY_STRICT,
+        replay_latency: bool = settings.LLM_REPLAY_LATENCY,
+    ):
+        self.strict = strict
+        self.replay_latency = replay_latency
+        self.fallback = FakeLLMClient(latency_ms=0, jitter_ms=0)
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry  # last recording wins
+
+    def _lookup(self, method: str, payload: Any) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(request_key(method, payload))
+        if entry is None:
+            self.misses += 1
+            if self.strict:
+                raise ReplayMiss(f"No recorded response for this {method} request")
+            return None
+        self.hits += 1
+        if self.replay_latency:
+            time.sleep(entry.get("elapsed_ms", 0) / 1000)
+        return entry
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        entry = self._lookup("chat", messages)
+        if entry is None:
+            response = self.fallback.chat(messages)
+            self._usage.value = self.fallback.last_usage()
+            return response
+        self._usage.value = entry.get("usage") or {}
+        return entry["response"]
+
+    def extract_images_text(self, images: List[Image]) -> List[str]:
+        entry = self._lookup("extract_images_text", images)
+        return self.fallback.extract_images_text(images) if entry is None else entry["response"]
+
+
+# ---------- factory ----------
+
+def _create_backend(backend: str) -> LLMBackend:
+    if backend == "gemini":
+        from app.core.llm_client import LLMClient
+
+        return LLMClient()
+    if backend == "fake":
+        return FakeLLMClient()
+    if backend == "record":
+        from app.core.llm_client import LLMClient
+
+        return RecordingLLMClient(LLMClient())
+    if backend == "replay":
+        return ReplayLLMClient()
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r}; expected gemini, fake, record or replay")
+
+
+def create_llm_client(backend: Optional[str] = None) -> LLMBackend:
+    """Configured backend behind the fair queue (LLM_MAX_CONCURRENCY=0 disables it)."""
+    client = _create_backend((backend or settings.LLM_BACKEND).lower())
+    if settings.LLM_MAX_CONCURRENCY > 0:
+        from app.core.llm_scheduler import ScheduledLLMClient, build_queue
+
+        client = ScheduledLLMClient(client, build_queue())
+    return client
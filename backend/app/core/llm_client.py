@@ -1,54 +1,126 @@
 # app/core/llm_client.py
-from typing import List, Dict
-from google import genai
-from google.genai import types
-import pathlib
+from typing import Any, List, Dict, Optional, Tuple
 import os
+import re
+import threading
 
+from app.core.chunks import estimate_tokens
+from app.core.llm_backends import LLMBackend, split_system
+
+
+class LLMClient(LLMBackend):
+    name = "gemini"
 
-class LLMClient:
     def __init__(self):
+        # google-genai is heavy; import it only when a client is actually built
+        from google import genai
+
         # Get API key from environment
         api_key = os.getenv("GEMINI_API_KEY", "")
         self.client = genai.Client(api_key=api_key)
         self.model_name = "gemini-2.5-flash-lite"
+        # Prepared request configs per system instruction
+        self._configs: Dict[str, Any] = {}
+        self._config_lock = threading.Lock()
 
     def chat(self, messages: List[Dict[str, str]]) -> str:
-        full_prompt = "\n".join(
-            f"{m['role'].upper()}: {m['content']}"
-            for m in messages
-        )
+        """
+        Role-structured request: "system" messages become the system
+        instruction (an identical prefix on every call, so the provider's
+        implicit prefix caching applies), the rest are user/model turns.
+        """
+        from google.genai import types
+
+        system, turns = split_system(messages)
+        contents = [
+            types.Content(
+                role="model" if m["role"] == "assistant" else "user",
+                parts=[types.Part.from_text(text=m["content"])],
+            )
+            for m in turns
+        ]
 
         response = self.client.models.generate_content(
             model=self.model_name,
-            contents=full_prompt,
+            contents=contents,
+            config=self._config_for(system),
+        )
+
+        text = (response.text or "").strip()
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and usage.prompt_token_count is not None:
+            self._set_usage(
+                usage.prompt_token_count,
+                usage.cached_content_token_count or 0,
+                usage.candidates_token_count or 0,
+            )
+        else:
+            self._set_usage(
+                estimate_tokens(system) + sum(estimate_tokens(m["content"]) for m in turns),
+                0,
+                estimate_tokens(text),
+            )
+        return text
+
+    def _config_for(self, system: str) -> Optional[Any]:
+        """GenerateContentConfig per system instruction, built once per process."""
+        if not system:
+            return None
+
+        with self._config_lock:
+            config = self._configs.get(system)
+            if config is None:
+                from google.genai import types
+
+                config = types.GenerateContentConfig(system_instruction=system)
+                self._configs[system] = config
+            return config
+
+    def extract_images_text(self, images: List[Tuple[bytes, str]]) -> List[str]:
+        """
+        Batched OCR: send several images as inline parts in ONE request
+        (no per-image files.upload) and split the answer per image.
+        images: [(image_bytes, mime_type), ...] → one text per image, in order.
+        """
+        from google.genai import types
+
+        if not images:
+            return []
+
+        prompt = (
+            "You are an OCR + summarization helper for an operations assistant. "
+            f"You are given {len(images)} images. For EACH image, in order, extract any text, "
+            "and also summarize any key policy or process information in clear sentences. "
+            "Return only plain text, no markdown, no bullet formatting. "
+            "Start the output for image N with a line containing exactly '=====IMAGE N=====' "
+            "(N starting at 1)."
         )
 
-        return (response.text or "").strip()
+        contents: list = []
+        for idx, (data, mime_type) in enumerate(images, start=1):
+            contents.append(f"Image {idx}:")
+            contents.append(types.Part.from_bytes(data=data, mime_type=mime_type))
+        contents.append(prompt)
 
-    def extract_image_text(self, image_path: str) -> str:
         try:
-            prompt = (
-                "You are an OCR + summarization helper for an operations assistant. "
-                "Extract any text from this image, and also summarize any key policy or process information in clear sentences. "
-                "Return only plain text, no markdown, no bullet formatting."
-            )
-            
-            uploaded_file = self.client.files.upload(path=image_path)
-            
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[
-                    types.Part.from_uri(
-                        file_uri=uploaded_file.uri,
-                        mime_type=uploaded_file.mime_type
-                    ),
-                    prompt
-                ]
+                contents=contents,
             )
-            
-            return (response.text or "").strip()
-            
         except Exception as e:
-            print(f"Error extracting text from image: {e}")
-            return ""
\ No newline at end of file
+            print(f"Error extracting text from images: {e}")
+            return [""] * len(images)
+
+        raw = (response.text or "").strip()
+        sections = re.split(r"^=====IMAGE (\d+)=====\s*$", raw, flags=re.MULTILINE)
+
+        # sections = [preamble, "1", text1, "2", text2, ...]
+        texts = [""] * len(images)
+        for num, text in zip(sections[1::2], sections[2::2]):
+            idx = int(num) - 1
+            if 0 <= idx < len(images):
+                texts[idx] = text.strip()
+
+        if len(images) == 1 and not texts[0]:
+            texts[0] = raw
+        return texts
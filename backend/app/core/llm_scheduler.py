@@ -0,0 +1,137 @@
+# app/core/llm_scheduler.py
+#
+# Weighted fair queue in front of the shared LLM client.
+# - At most LLM_MAX_CONCURRENCY calls run at once; the rest wait in a queue
+# - Each (priority, user_id) pair is a flow. A call's virtual finish tag is
+#   max(virtual time, flow's previous tag) + cost / weight, and the smallest
+#   tag runs next (start-time fair queuing). So:
+#     * "interactive" (chat, weight LLM_WEIGHT_INTERACTIVE) overtakes
+#       "ingest" (OCR, weight LLM_WEIGHT_INGEST) under contention
+#     * one user's 500-image upload cannot starve another user's upload
+# - The flow comes from a context variable set by the endpoint
+#   (llm_flow / set_llm_flow); it follows run_in_threadpool into the worker thread
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core.llm_backends import Image, LLMBackend
+
+Flow = Tuple[str, Optional[int]]
+
+_current_flow: ContextVar[Flow] = ContextVar("llm_flow", default=("ingest", None))
+
+
+def set_llm_flow(priority: str, user_id: Optional[int]) -> None:
+    """Tag LLM calls made from this request (and its threadpool work)."""
+    _current_flow.set((priority, user_id))
+
+
+@contextmanager
+def llm_flow(priority: str, user_id: Optional[int]):
+    token = _current_flow.set((priority, user_id))
+    try:
+        yield
+    finally:
+        _current_flow.reset(token)
+
+
+class FairQueue:
+    def __init__(self, max_concurrency: int, weights: Dict[str, float]):
+        self.max_concurrency = max_concurrency
+        self.weights = weights
+        self._cond = threading.Condition()
+        self._heap: List[list] = []
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Flow, float] = {}
+        self._seq = itertools.count()
+        # priority → [calls, total wait ms, max wait ms]
+        self._waits: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def slot(self, flow: Flow, cost: float = 1.0):
+        priority = flow[0]
+        weight = self.weights.get(priority, 1.0)
+        enqueued = time.perf_counter()
+        with self._cond:
+            start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+            finish = start + cost / weight
+            self._last_finish[flow] = finish
+            entry = [finish, next(self._seq), start]
+            heapq.heappush(self._heap, entry)
+            while self._active >= self.max_concurrency or self._heap[0] is not entry:
+                self._cond.wait()
+            heapq.heappop(self._heap)
+            self._active += 1
+            self._virtual_time = max(self._virtual_time, start)
+            waited_ms = (time.perf_counter() - enqueued) * 1000
+            stats = self._waits.setdefault(priority, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += waited_ms
+            stats[2] = max(stats[2], waited_ms)
+            # The new head may be runnable too if slots remain
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                if len(self._last_finish) > 1000:
+                    # Flows whose last tag is behind virtual time start fresh anyway
+                    self._last_finish = {
+                        f: t for f, t in self._last_finish.items() if t > self._virtual_time
+                    }
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": len(self._heap),
+                "max_concurrency": self.max_concurrency,
+                "wait_ms": {
+                    priority: {
+                        "calls": int(calls),
+                        "mean": round(total / calls, 1) if calls else 0.0,
+                        "max": round(worst, 1),
+                    }
+                    for priority, (calls, total, worst) in self._waits.items()
+                },
+            }
+
+
+class ScheduledLLMClient(LLMBackend):
+    """Runs every call of the wrapped backend through a FairQueue slot."""
+
+    def __init__(self, inner: LLMBackend, queue: FairQueue):
+        self.inner = inner
+        self.queue = queue
+        self.name = inner.name
+
+    def chat(self, messages):
+        with self.queue.slot(_current_flow.get()):
+            return self.inner.chat(messages)
+
+    def extract_images_text(self, images: List[Image]) -> List[str]:
+        # One batched request, but it costs like len(images) calls of work
+        with self.queue.slot(_current_flow.get(), cost=max(1, len(images))):
+            return self.inner.extract_images_text(images)
+
+    def last_usage(self):
+        return self.inner.last_usage()
+
+
+def build_queue() -> FairQueue:
+    return FairQueue(
+        settings.LLM_MAX_CONCURRENCY,
+        {
+            "interactive": settings.LLM_WEIGHT_INTERACTIVE,
+            "ingest": settings.LLM_WEIGHT_INGEST,
+        },
+    )
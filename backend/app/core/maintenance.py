@@ -0,0 +1,440 @@
+# app/core/maintenance.py
+#
+# Document deletion + garbage collection for the vector store and uploads.
+# - `delete_document` / `delete_document_chunks`: SQL rows go first, then the
+#   vectors; if the vector delete fails the leftovers are orphans that the
+#   next compaction removes; document summaries are deleted with the
+#   document and rebuilt after a chunk delete
+# - `check_consistency`: reconciles the chunks table against the Chroma
+#   collection (orphan vectors, chunks whose vector is gone, legacy chunks
+#   without a recorded vector id, vectors whose workspace differs from their
+#   chunk row) and the summaries table against the summary collection; with
+#   repair=True it fixes what it finds
+# - `compact`: check_consistency(repair=True) + removal of uploaded files no
+#   document references, reporting the reclaimed space, + reconciling every
+#   user's ticket similarity index with the tickets table
+#
+# Run by hand from backend/:
+#   python -m app.core.maintenance check [--repair]
+#   python -m app.core.maintenance compact [--dry-run]
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.chunks import chunk_vector_metadata
+from app.core.rag import (
+    CHROMA_DIR,
+    delete_summary_vectors,
+    delete_vectors,
+    get_collection,
+    get_summary_collection,
+    iter_vectors,
+    update_chunk_metadata,
+    upsert_chunks,
+)
+from app.core import ticket_index
+from app.core.summaries import schedule_summaries
+from app.models.db_models import Chunk, Document, DocumentSummary
+
+# Vectors/files this young may belong to an upload that is still being
+# ingested (vectors are written before their chunk rows commit), so GC skips them.
+GRACE_PERIOD = timedelta(minutes=10)
+
+_BATCH = 500
+
+
+# ==================== DELETION ====================
+
+def _remove_upload(db: Session, path: str) -> int:
+    """Delete an uploaded file unless another document still points at it. Returns bytes freed."""
+    if db.query(Document.id).filter(Document.path == path).first():
+        return 0
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def delete_document(db: Session, doc: Document) -> Dict[str, Any]:
+    """Delete a document with its chunk rows, vectors and uploaded file."""
+    doc_id = doc.id
+    path = doc.path
+    vector_ids = [
+        vid for (vid,) in db.query(Chunk.vector_id)
+        .filter(Chunk.document_id == doc_id, Chunk.vector_id.isnot(None))
+    ]
+
+    deleted_chunks = (
+        db.query(Chunk)
+        .filter(Chunk.document_id == doc_id)
+        .delete(synchronize_session=False)
+    )
+    db.query(DocumentSummary).filter(DocumentSummary.document_id == doc_id).delete(synchronize_session=False)
+    db.delete(doc)
+    db.commit()
+
+    try:
+        # by id, plus by document_id for chunks ingested before ids were recorded
+        delete_vectors(ids=vector_ids, document_id=doc_id)
+        delete_summary_vectors(document_id=doc_id)
+    except Exception as e:
+        print(f"Vector delete for document {doc_id} failed, left for compaction: {e}")
+
+    return {
+        "document_id": doc_id,
+        "chunks_deleted": deleted_chunks,
+        "file_bytes_reclaimed": _remove_upload(db, path),
+    }
+
+
+def delete_document_chunks(db: Session, doc: Document, chunk_ids: List[int]) -> Dict[str, Any]:
+    """Delete some chunks of a document (rows + vectors)."""
+    chunks = (
+        db.query(Chunk)
+        .filter(Chunk.document_id == doc.id, Chunk.id.in_(chunk_ids))
+        .all()
+    )
+    found = {c.id for c in chunks}
+    vector_ids = [c.vector_id for c in chunks if c.vector_id]
+    # Legacy chunks have no recorded vector id; their vectors become orphans
+    # and are removed by the next compaction.
+    pending_gc = sum(1 for c in chunks if not c.vector_id)
+
+    for c in chunks:
+        db.delete(c)
+    db.commit()
+
+    if vector_ids:
+        try:
+            delete_vectors(ids=vector_ids)
+        except Exception as e:
+            print(f"Vector delete for document {doc.id} failed, left for compaction: {e}")
+    if chunks:
+        # Summaries still describe the deleted chunks
+        schedule_summaries(doc.id, doc.user_id)
+
+    return {
+        "document_id": doc.id,
+        "chunks_deleted": len(chunks),
+        "not_found": [cid for cid in chunk_ids if cid not in found],
+        "vectors_pending_gc": pending_gc,
+    }
+
+
+# ==================== CONSISTENCY ====================
+
+def _recent_document_ids(db: Session, doc_ids: List[int]) -> set:
+    cutoff = datetime.utcnow() - GRACE_PERIOD
+    return {
+        did for (did,) in db.query(Document.id)
+        .filter(Document.id.in_(doc_ids), Document.uploaded_at > cutoff)
+    }
+
+
+def _classify_unknown_vectors(
+    db: Session,
+    unknown: List[Tuple[str, Dict[str, Any], str]],
+    repair: bool,
+    report: Dict[str, Any],
+    orphans: List[str],
+) -> None:
+    """Vectors no chunk row points at: adopt them (legacy rows) or mark them orphaned."""
+    doc_ids = list({
+        int(meta["document_id"]) for _, meta, _ in unknown
+        if meta and meta.get("document_id") is not None
+    })
+    existing = {did for (did,) in db.query(Document.id).filter(Document.id.in_(doc_ids))} if doc_ids else set()
+    recent = _recent_document_ids(db, list(existing)) if existing else set()
+
+    # Legacy chunks (vector_id NULL) of those documents, matched by content
+    unlinked: Dict[Tuple[int, str], List[Chunk]] = {}
+    if existing:
+        for chunk in db.query(Chunk).filter(
+            Chunk.document_id.in_(existing), Chunk.vector_id.is_(None)
+        ):
+            unlinked.setdefault((chunk.document_id, chunk.content), []).append(chunk)
+
+    for vector_id, meta, content in unknown:
+        doc_id = meta.get("document_id") if meta else None
+        doc_id = int(doc_id) if doc_id is not None else None
+
+        candidates = unlinked.get((doc_id, content)) if doc_id in existing else None
+        if candidates:
+            chunk = candidates.pop()
+            report["adopted_vectors"] += 1
+            if repair:
+                chunk.vector_id = vector_id
+        elif doc_id in recent:
+            report["in_flight_vectors"] += 1
+        else:
+            orphans.append(vector_id)
+
+
+def _restamp_workspace(
+    db: Session,
+    ids: List[str],
+    metas: List[Dict[str, Any]],
+    repair: bool,
+    report: Dict[str, Any],
+) -> None:
+    """Known vectors whose workspace_id no longer matches their chunk row (e.g. folded duplicates)."""
+    rows = {
+        c.vector_id: c for c in db.query(Chunk).filter(Chunk.vector_id.in_(ids))
+    }
+    stale = [
+        rows[vid] for vid, meta in zip(ids, metas)
+        if vid in rows and (meta or {}).get("workspace_id") != rows[vid].workspace_id
+    ]
+    report["stale_workspace_vectors"] += len(stale)
+    if repair and stale:
+        # Same ids and order, so updating in place doesn't disturb the paging
+        names = dict(
+            db.query(Document.id, Document.name)
+            .filter(Document.id.in_({c.document_id for c in stale}))
+        )
+        update_chunk_metadata(
+            [c.vector_id for c in stale],
+            [chunk_vector_metadata(c, names.get(c.document_id)) for c in stale],
+        )
+
+
+def _check_summary_vectors(db: Session, repair: bool, report: Dict[str, Any]) -> None:
+    """Summary vectors no summary row points at (deleted or folded documents)."""
+    collection = get_summary_collection()
+    orphans: List[str] = []
+    for ids, metas, _ in iter_vectors(collection=collection):
+        known = {
+            vid for (vid,) in db.query(DocumentSummary.vector_id).filter(DocumentSummary.vector_id.in_(ids))
+        }
+        unknown = [(vid, meta or {}) for vid, meta in zip(ids, metas) if vid not in known]
+        doc_ids = list({int(m["document_id"]) for _, m in unknown if m.get("document_id") is not None})
+        # A build in progress writes vectors before its rows commit
+        recent = _recent_document_ids(db, doc_ids) if doc_ids else set()
+        orphans += [
+            vid for vid, meta in unknown
+            if meta.get("document_id") is None or int(meta["document_id"]) not in recent
+        ]
+    report["orphan_summary_vectors"] = len(orphans)
+    if repair:
+        for start in range(0, len(orphans), _BATCH):
+            delete_vectors(ids=orphans[start:start + _BATCH])
+
+
+def check_consistency(db: Session, repair: bool = False) -> Dict[str, Any]:
+    """
+    Reconcile SQLite chunks with the Chroma collection.
+
+    - orphan_vectors: vectors whose document or chunk row no longer exists
+    - adopted_vectors: vectors matched to a legacy chunk row (vector_id NULL)
+    - missing_vectors: chunk rows whose recorded vector is not in the collection
+    - unlinked_chunks: chunk rows still without a vector id afterwards
+    - stale_workspace_vectors: vectors whose workspace_id differs from their chunk row
+    - orphan_summary_vectors: summary vectors without a summary row
+
+    With repair=True orphans are deleted, adopted ids are stored, missing
+    vectors are re-added from the chunk rows and stale metadata is rewritten.
+    """
+    report: Dict[str, Any] = {
+        "vectors": 0,
+        "chunks": db.query(Chunk).count(),
+        "orphan_vectors": 0,
+        "adopted_vectors": 0,
+        "in_flight_vectors": 0,
+        "missing_vectors": 0,
+        "unlinked_chunks": 0,
+        "stale_workspace_vectors": 0,
+        "orphan_summary_vectors": 0,
+        "repaired": repair,
+    }
+    collection = get_collection()
+
+    # 1) collection → SQL. Orphans are only deleted after the scan, since
+    #    deleting while paging by offset would skip entries.
+    orphans: List[str] = []
+    for ids, metas, documents in iter_vectors():
+        report["vectors"] += len(ids)
+        known = {
+            vid for (vid,) in db.query(Chunk.vector_id).filter(Chunk.vector_id.in_(ids))
+        }
+        unknown = [
+            (vid, meta or {}, content)
+            for vid, meta, content in zip(ids, metas, documents)
+            if vid not in known
+        ]
+        if unknown:
+            _classify_unknown_vectors(db, unknown, repair, report, orphans)
+        _restamp_workspace(db, ids, metas, repair, report)
+    report["orphan_vectors"] = len(orphans)
+
+    if repair:
+        db.commit()
+        for start in range(0, len(orphans), _BATCH):
+            collection.delete(ids=orphans[start:start + _BATCH])
+
+    # 2) SQL → collection: recorded vector ids that are gone
+    last_id = 0
+    while True:
+        batch = (
+            db.query(Chunk)
+            .filter(Chunk.id > last_id, Chunk.vector_id.isnot(None))
+            .order_by(Chunk.id)
+            .limit(_BATCH)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        present = set(collection.get(ids=[c.vector_id for c in batch], include=[])["ids"])
+        missing = [c for c in batch if c.vector_id not in present]
+        report["missing_vectors"] += len(missing)
+        if repair and missing:
+            names = dict(
+                db.query(Document.id, Document.name)
+                .filter(Document.id.in_({c.document_id for c in missing}))
+            )
+            upsert_chunks(
+                [c.vector_id for c in missing],
+                [c.content for c in missing],
+                [chunk_vector_metadata(c, names.get(c.document_id)) for c in missing],
+            )
+
+    report["unlinked_chunks"] = db.query(Chunk).filter(Chunk.vector_id.is_(None)).count()
+    _check_summary_vectors(db, repair, report)
+    return report
+
+
+# ==================== COMPACTION ====================
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _unreferenced_uploads(db: Session) -> List[Tuple[str, int]]:
+    if not os.path.isdir(settings.UPLOAD_DIR):
+        return []
+    referenced = {os.path.abspath(p) for (p,) in db.query(Document.path)}
+    cutoff = (datetime.now() - GRACE_PERIOD).timestamp()
+
+    found = []
+    for entry in os.scandir(settings.UPLOAD_DIR):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        if stat.st_mtime > cutoff:
+            continue  # may be an upload whose document row is not committed yet
+        if os.path.abspath(entry.path) not in referenced:
+            found.append((entry.path, stat.st_size))
+    return found
+
+
+def compact(db: Session, dry_run: bool = False) -> Dict[str, Any]:
+    """Remove orphaned vectors and unreferenced uploads, sync ticket indexes; report reclaimed space."""
+    chroma_before = _dir_size(CHROMA_DIR)
+    consistency = check_consistency(db, repair=not dry_run)
+
+    files = _unreferenced_uploads(db)
+    if not dry_run:
+        for path, _size in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    tickets = None
+    if not dry_run:
+        try:
+            tickets = ticket_index.sync_all_indexes(db)
+        except Exception as e:
+            print(f"⚠️ Ticket index sync failed: {e}")
+
+    return {
+        "dry_run": dry_run,
+        "vectors_deleted": 0 if dry_run else consistency["orphan_vectors"],
+        "files_deleted": len(files),
+        "file_bytes_reclaimed": sum(size for _, size in files),
+        "chroma_bytes_before": chroma_before,
+        # Chroma reuses freed space rather than shrinking its files right away
+        "chroma_bytes_after": _dir_size(CHROMA_DIR),
+        "consistency": consistency,
+        "ticket_index": tickets,
+    }
+
+
+_stop_event = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _compaction_loop(interval: int) -> None:
+    from app.core.db import SessionLocal
+
+    while not _stop_event.wait(interval):
+        db = SessionLocal()
+        try:
+            result = compact(db)
+            print(
+                f"🧹 Compaction: {result['vectors_deleted']} vectors, "
+                f"{result['files_deleted']} files ({result['file_bytes_reclaimed']} bytes) reclaimed"
+            )
+        except Exception as e:
+            print(f"Compaction failed: {e}")
+        finally:
+            db.close()
+
+
+def start_compaction(interval: Optional[int] = None) -> None:
+    """Run `compact` every `interval` seconds in a daemon thread (0 disables it)."""
+    global _thread
+    interval = settings.COMPACTION_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0 or (_thread is not None and _thread.is_alive()):
+        return
+    _stop_event.clear()
+    _thread = threading.Thread(target=_compaction_loop, args=(interval,), daemon=True, name="compaction")
+    _thread.start()
+
+
+def stop_compaction() -> None:
+    _stop_event.set()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector store / upload maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="reconcile SQLite chunks against the Chroma collection")
+    check.add_argument("--repair", action="store_true", help="fix what is found")
+    comp = sub.add_parser("compact", help="delete orphaned vectors and unreferenced uploads")
+    comp.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    args = parser.parse_args()
+
+    from app.core.db import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "check":
+            result = check_consistency(db, repair=args.repair)
+        else:
+            result = compact(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
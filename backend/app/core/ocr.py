@@ -0,0 +1,213 @@
+# app/core/ocr.py
+#
+# Pluggable OCR for image uploads and scanned PDF pages.
+# - backends: "gemini" (batched multi-image requests through the shared
+#   LLMClient), "tesseract" (local, offline; needs pytesseract + the
+#   tesseract binary) and "none" (no OCR, returns empty text)
+# - selected per deployment with settings.OCR_BACKEND
+# - results are cached on disk by content hash, so re-uploading the same
+#   image (or re-ingesting the same scanned PDF) costs nothing
+
+import hashlib
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# (image_bytes, mime_type)
+Image = Tuple[bytes, str]
+
+
+class OCRBackend(ABC):
+    """Interface: turn a batch of images into one text per image."""
+
+    name = "base"
+    # How many images to send per extract_texts() call
+    max_batch = 1
+    # Empty text is a real answer for local engines, but usually a failed
+    # request for remote ones — those are retried instead of cached.
+    cache_empty_results = True
+
+    @abstractmethod
+    def extract_texts(self, images: List[Image]) -> List[str]:
+        ...
+
+
+class GeminiOCRBackend(OCRBackend):
+    """Several images per generate_content call, via the process-wide LLMClient."""
+
+    name = "gemini"
+    cache_empty_results = False
+
+    def __init__(self, batch_size: int = settings.OCR_BATCH_SIZE):
+        self.max_batch = max(1, batch_size)
+
+    def extract_texts(self, images: List[Image]) -> List[str]:
+        from app.agents.graph import get_llm_client
+
+        return get_llm_client().extract_images_text(images)
+
+
+class TesseractOCRBackend(OCRBackend):
+    """Local OCR; works offline. Requires `pip install pytesseract` + tesseract."""
+
+    name = "tesseract"
+
+    def __init__(self, lang: str = settings.TESSERACT_LANG, batch_size: int = settings.OCR_BATCH_SIZE):
+        try:
+            import pytesseract  # noqa: F401
+            from PIL import Image as _PILImage  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError(
+                "OCR_BACKEND=tesseract needs the optional 'pytesseract' and 'pillow' packages"
+            ) from e
+        self.lang = lang
+        self.max_batch = max(1, batch_size)
+
+    def extract_texts(self, images: List[Image]) -> List[str]:
+        import pytesseract
+        from PIL import Image as PILImage
+
+        texts = []
+        for data, _mime_type in images:
+            try:
+                with PILImage.open(io.BytesIO(data)) as img:
+                    texts.append(pytesseract.image_to_string(img, lang=self.lang).strip())
+            except Exception as e:
+                print(f"Tesseract OCR failed: {e}")
+                texts.append("")
+        return texts
+
+
+class NullOCRBackend(OCRBackend):
+    """OCR disabled: images produce no text (offline deployments, tests)."""
+
+    name = "none"
+    max_batch = 64
+
+    def extract_texts(self, images: List[Image]) -> List[str]:
+        return [""] * len(images)
+
+
+_BACKENDS = {
+    "gemini": GeminiOCRBackend,
+    "tesseract": TesseractOCRBackend,
+    "none": NullOCRBackend,
+}
+
+_backend: Optional[OCRBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend() -> OCRBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = settings.OCR_BACKEND.lower()
+                if name not in _BACKENDS:
+                    raise ValueError(
+                        f"Unknown OCR_BACKEND {settings.OCR_BACKEND!r}; "
+                        f"expected one of {', '.join(_BACKENDS)}"
+                    )
+                _backend = _BACKENDS[name]()
+    return _backend
+
+
+def set_ocr_backend(backend: Optional[OCRBackend]) -> None:
+    """Override the configured backend (tests, benchmarks); None resets it."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# ---------- content-hash cache ----------
+
+
+def _cache_path(backend_name: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    return os.path.join(settings.OCR_CACHE_DIR, backend_name, digest[:2], f"{digest}.txt")
+
+
+def _cache_get(backend_name: str, data: bytes) -> Optional[str]:
+    path = _cache_path(backend_name, data)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _cache_put(backend_name: str, data: bytes, text: str) -> None:
+    path = _cache_path(backend_name, data)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# ---------- public helpers ----------
+
+
+def ocr_images(images: List[Image], backend: Optional[OCRBackend] = None) -> List[str]:
+    """
+    OCR many images: cache hits are free, misses go to the backend in batches.
+    Returns one text per image, in order.
+    """
+    backend = backend or get_ocr_backend()
+    texts: List[Optional[str]] = [_cache_get(backend.name, data) for data, _ in images]
+
+    missing = [i for i, t in enumerate(texts) if t is None]
+    for start in range(0, len(missing), backend.max_batch):
+        batch_idx = missing[start:start + backend.max_batch]
+        results = backend.extract_texts([images[i] for i in batch_idx])
+        for i, text in zip(batch_idx, results):
+            texts[i] = text
+            if text or backend.cache_empty_results:
+                _cache_put(backend.name, images[i][0], text)
+
+    return [t or "" for t in texts]
+
+
+def image_mime_type(name: str) -> str:
+    ext = os.path.splitext(name.lower())[1]
+    return {
+        ".png": "image/png",
+        ".jpg": "image/jpeg",
+        ".jpeg": "image/jpeg",
+        ".jp2": "image/jp2",
+        ".tif": "image/tiff",
+        ".tiff": "image/tiff",
+        ".gif": "image/gif",
+        ".bmp": "image/bmp",
+    }.get(ext, "image/png")
+
+
+def ocr_pdf_pages(path: str, page_numbers: List[int], backend: Optional[OCRBackend] = None) -> Dict[int, str]:
+    """
+    OCR scanned PDF pages (the ones pdf_extraction flagged needs_ocr) using the
+    images embedded in each page. All pages' images are OCR'd as one batched run.
+    Returns {page_number: text} for pages that produced any text.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    images: List[Image] = []
+    owners: List[int] = []
+    for page_no in page_numbers:
+        try:
+            for img in reader.pages[page_no].images:
+                images.append((img.data, image_mime_type(img.name)))
+                owners.append(page_no)
+        except Exception as e:
+            print(f"Could not read images from PDF page {page_no} of {path}: {e}")
+
+    page_texts: Dict[int, List[str]] = {}
+    for page_no, text in zip(owners, ocr_images(images, backend)):
+        if text.strip():
+            page_texts.setdefault(page_no, []).append(text.strip())
+
+    return {page_no: "\n\n".join(parts) for page_no, parts in page_texts.items()}
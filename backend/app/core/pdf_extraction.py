@@ -0,0 +1,161 @@
+# app/core/pdf_extraction.py
+#
+# Parallel, resumable PDF text extraction.
+# - pages are split into ranges and extracted in a process pool
+# - every extracted page is written to an on-disk cache keyed by the file's
+#   SHA-256 + page number as soon as it is done, so re-ingesting the same file
+#   or retrying after a crash only extracts the pages that are still missing
+# - pages without a usable text layer are flagged `needs_ocr`; pages whose
+#   extraction raised are flagged `error` instead (not sent to OCR, retried
+#   on the next ingest since they are not cached)
+#
+# This module is imported in worker processes, so keep module-level imports light.
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# Fewer extracted characters than this → treat the page as scanned
+MIN_TEXT_CHARS = 20
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_dir_for(file_hash: str, cache_root: str) -> str:
+    return os.path.join(cache_root, file_hash[:2], file_hash)
+
+
+def _page_path(file_dir: str, page_no: int) -> str:
+    return os.path.join(file_dir, f"{page_no:06d}.txt")
+
+
+def _write_page(file_dir: str, page_no: int, text: str) -> None:
+    # write-then-rename so a crash never leaves a half-written page behind
+    path = _page_path(file_dir, page_no)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _read_cached_pages(file_dir: str, num_pages: int) -> Dict[int, str]:
+    cached: Dict[int, str] = {}
+    if not os.path.isdir(file_dir):
+        return cached
+    for name in os.listdir(file_dir):
+        if not name.endswith(".txt"):
+            continue
+        page_no = int(name[:-4])
+        if page_no < num_pages:
+            with open(os.path.join(file_dir, name), "r", encoding="utf-8") as f:
+                cached[page_no] = f.read()
+    return cached
+
+
+def _extract_range(path: str, page_numbers: List[int], file_dir: str) -> List[Tuple[int, str]]:
+    """Worker task: extract the given pages and cache each one as it finishes."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    results = []
+    for page_no in page_numbers:
+        try:
+            text = reader.pages[page_no].extract_text() or ""
+        except Exception as e:
+            print(f"Error extracting PDF page {page_no} of {path}: {e}")
+            continue  # not cached → retried on the next ingest
+        _write_page(file_dir, page_no, text)
+        results.append((page_no, text))
+    return results
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """One long-lived pool per process, so uploads don't pay worker startup each time."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            import multiprocessing
+
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _ranges(pages: List[int], size: int) -> List[List[int]]:
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def extract_pdf_pages(
+    path: str,
+    workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    cache_root: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """
+    Extract every page of a PDF, using the page cache and a process pool.
+    Returns [{"page": n, "text": str, "needs_ocr": bool, "error": bool}, ...]
+    in page order; an `error` page has no text and is not flagged needs_ocr.
+    """
+    from pypdf import PdfReader
+
+    workers = settings.PDF_WORKERS if workers is None else workers
+    pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+    cache_root = cache_root or settings.PAGE_CACHE_DIR
+
+    file_dir = _cache_dir_for(file_sha256(path), cache_root)
+    os.makedirs(file_dir, exist_ok=True)
+
+    num_pages = len(PdfReader(path).pages)
+    texts = _read_cached_pages(file_dir, num_pages)
+    missing = [n for n in range(num_pages) if n not in texts]
+
+    if missing:
+        tasks = _ranges(missing, pages_per_task)
+        if workers <= 1 or len(tasks) == 1:
+            for task in tasks:
+                texts.update(_extract_range(path, task, file_dir))
+        else:
+            pool = _get_pool(workers)
+            futures = [pool.submit(_extract_range, path, task, file_dir) for task in tasks]
+            for future in futures:
+                texts.update(future.result())
+
+    pages = []
+    for page_no in range(num_pages):
+        failed = page_no not in texts  # extraction raised (see _extract_range)
+        text = texts.get(page_no, "")
+        pages.append({
+            "page": page_no,
+            "text": text,
+            "needs_ocr": not failed and len(text.strip()) < MIN_TEXT_CHARS,
+            "error": failed,
+        })
+    return pages
@@ -0,0 +1,613 @@
+# app/core/quantized_store.py
+#
+# Optional compressed storage for chunk embeddings (VECTOR_STORE_MODE=int8).
+# - the float32 vectors live only in one append-only file on disk
+#   (VECTOR_STORE_DIR/chunks.f32, unit vectors) next to a fixed-width record
+#   per row (chunks.rows: vector id, tenant, document, workspace, source,
+#   deleted flag); Chroma keeps the chunk texts and metadata in a separate
+#   collection with 1-dim placeholder vectors, so no float32 vector or
+#   full-size HNSW graph is ever loaded into RAM
+# - one index per uploader and one per workspace (documents shared into it):
+#   int8 codes (symmetric, one float32 scale per vector) in RAM, i.e. ~D
+#   bytes per chunk; a member's query searches their own index plus one per
+#   workspace, merged by vector id
+# - queries are a brute-force NumPy scan over the tenant's codes, block by
+#   block, with document/source scope applied as a row mask
+# - the top candidates are rescored exactly against the float32 vectors,
+#   read from the file row by row (pread), so only those rows are touched
+# - an index is built from the two files on its first query (no Chroma
+#   reads), then kept current by rag.upsert_chunks / rag.delete_vectors
+#   (deletes are tombstones until the next rebuild; a deleted chunk's row
+#   stays in the files, flagged, on disk only)
+# - `python -m app.core.quantized_store convert` copies an existing Chroma
+#   (float32) collection into this layout when switching modes
+#
+# Imported lazily by app.core.rag, only in int8 mode (numpy stays off the
+# import path otherwise).
+
+import argparse
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# Rows scored per matmul block (bounds the float32 temporary to BLOCK × D;
+# kept small so the allocator hands it back instead of keeping it resident)
+BLOCK_ROWS = 4096
+# Rebuild a tenant's index once this share of its rows are tombstones
+MAX_DEAD_RATIO = 0.25
+
+# uint8 code per chunk source, for the source filter mask ("" = unknown)
+_SOURCES = ["", "pdf", "excel", "csv", "word", "text", "image"]
+_SOURCE_CODE = {name: code for code, name in enumerate(_SOURCES)}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unit vectors → (int8 codes, per-vector scale) with v ≈ codes * scale."""
+    max_abs = np.abs(vectors).max(axis=1)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+# One fixed-width record per vector row (the filter columns an index needs),
+# so indexes are built without paging metadata out of Chroma
+ROW_DTYPE = np.dtype([
+    ("id", "S64"),
+    ("user_id", "<i8"),
+    ("document_id", "<i8"),
+    ("workspace_id", "<i8"),  # -1 = not shared
+    ("source", "u1"),
+    ("deleted", "u1"),
+])
+# Rows read per block when scanning the record / vector files
+SCAN_ROWS = 2048
+
+
+def source_code(source: Optional[str]) -> int:
+    return _SOURCE_CODE.get(source or "", 0)
+
+
+def row_record(vid: str, meta: Dict[str, Any]) -> Tuple[Any, ...]:
+    workspace_id = meta.get("workspace_id")
+    return (
+        vid.encode("utf-8"),
+        int(meta.get("user_id") or 0),
+        int(meta.get("document_id") or 0),
+        -1 if workspace_id is None else int(workspace_id),
+        source_code(meta.get("source")),
+        0,
+    )
+
+
+class VectorFile:
+    """
+    Append-only float32 unit vectors (chunks.f32) plus their row records
+    (chunks.rows). Rows are never rewritten except for the deleted flag.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "chunks.f32")
+        self.rows_path = os.path.join(directory, "chunks.rows")
+        self.info_path = os.path.join(directory, "chunks.json")
+        self.lock_path = os.path.join(directory, "chunks.lock")
+        self.dim: Optional[int] = None
+        if os.path.exists(self.info_path):
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                self.dim = int(json.load(f)["dim"])
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # Other processes (maintenance / snapshot CLIs) write here too
+        with self._lock, open(self.lock_path, "a") as lock:
+            try:
+                import fcntl
+            except ImportError:
+                yield
+                return
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _count(self) -> int:
+        """Complete rows on disk; drops the tail of a crashed partial append."""
+        if self.dim is None or not os.path.exists(self.rows_path):
+            return 0
+        row_bytes = 4 * self.dim
+        n = min(os.path.getsize(self.path) // row_bytes, os.path.getsize(self.rows_path) // ROW_DTYPE.itemsize)
+        for path, width in ((self.path, row_bytes), (self.rows_path, ROW_DTYPE.itemsize)):
+            if os.path.getsize(path) != n * width:
+                os.truncate(path, n * width)
+        return n
+
+    def append(self, ids: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]]) -> List[int]:
+        """Write unit vectors + row records, return their row numbers."""
+        vectors = normalize(np.atleast_2d(vectors))
+        if not ids:
+            return []
+        records = np.array([row_record(vid, meta) for vid, meta in zip(ids, metadatas)], dtype=ROW_DTYPE)
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.info_path, "w", encoding="utf-8") as info:
+                    json.dump({"dim": self.dim}, info)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding size {vectors.shape[1]} != vector store size {self.dim}")
+            start = self._count()
+            with open(self.path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+            with open(self.rows_path, "ab") as f:
+                f.write(records.tobytes())
+        return list(range(start, start + len(ids)))
+
+    def scan(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """(first_row, records) blocks over the whole record file."""
+        if self.dim is None or not os.path.exists(self.rows_path):
+            return
+        with open(self.rows_path, "rb") as f:
+            start = 0
+            while True:
+                records = np.fromfile(f, dtype=ROW_DTYPE, count=SCAN_ROWS)
+                if not len(records):
+                    break
+                yield start, records
+                start += len(records)
+
+    def read_block(self, start: int, count: int) -> np.ndarray:
+        """Vectors for rows [start, start + count), read without mapping the file."""
+        with open(self.path, "rb") as f:
+            f.seek(start * 4 * self.dim)
+            return np.fromfile(f, dtype="<f4", count=count * self.dim).reshape(-1, self.dim)
+
+    def read(self, rows: Iterable[int]) -> np.ndarray:
+        """
+        Vectors at the given rows, one pread each: only these rows are read
+        (a memory map would fault whole readahead windows into the process).
+        """
+        rows = [int(row) for row in rows]
+        if not rows:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._fd is None:
+            with self._lock:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDONLY)
+        row_bytes = 4 * self.dim
+        data = b"".join(os.pread(self._fd, row_bytes, row * row_bytes) for row in rows)
+        return np.frombuffer(data, dtype="<f4").reshape(len(rows), self.dim).astype(np.float32)
+
+    def _rewrite(self, update) -> int:
+        """Apply update(records) -> changed-row mask to every block in place."""
+        changed = 0
+        with self._locked():
+            if not os.path.exists(self.rows_path):
+                return 0
+            with open(self.rows_path, "r+b") as f:
+                start = 0
+                while True:
+                    f.seek(start * ROW_DTYPE.itemsize)
+                    records = np.fromfile(f, dtype=ROW_DTYPE, count=SCAN_ROWS)
+                    if not len(records):
+                        break
+                    hit = update(records)
+                    if hit.any():
+                        f.seek(start * ROW_DTYPE.itemsize)
+                        f.write(records.tobytes())
+                        changed += int(hit.sum())
+                    start += len(records)
+        return changed
+
+    def mark_deleted(self, ids: Iterable[str] = (), document_id: Optional[int] = None) -> int:
+        """Flag rows as deleted by vector id and/or document; returns rows flagged."""
+        wanted = np.array([vid.encode("utf-8") for vid in ids], dtype="S64")
+        if not len(wanted) and document_id is None:
+            return 0
+
+        def update(records: np.ndarray) -> np.ndarray:
+            match = np.zeros(len(records), dtype=bool)
+            if len(wanted):
+                match |= np.isin(records["id"], wanted)
+            if document_id is not None:
+                match |= records["document_id"] == document_id
+            hit = match & (records["deleted"] == 0)
+            records["deleted"][hit] = 1
+            return hit
+
+        return self._rewrite(update)
+
+    def set_workspaces(self, workspace_by_id: Dict[str, Optional[int]]) -> int:
+        """Restamp rows' workspace (None = not shared); returns rows changed."""
+        if not workspace_by_id:
+            return 0
+        wanted = np.array([vid.encode("utf-8") for vid in workspace_by_id], dtype="S64")
+        values = np.array([-1 if w is None else w for w in workspace_by_id.values()], dtype=np.int64)
+        order = np.argsort(wanted)
+        wanted, values = wanted[order], values[order]
+
+        def update(records: np.ndarray) -> np.ndarray:
+            rows = np.nonzero(np.isin(records["id"], wanted))[0]
+            new = values[np.searchsorted(wanted, records["id"][rows])]
+            changed = records["workspace_id"][rows] != new
+            records["workspace_id"][rows[changed]] = new[changed]
+            hit = np.zeros(len(records), dtype=bool)
+            hit[rows[changed]] = True
+            return hit
+
+        return self._rewrite(update)
+
+
+_vector_file: Optional[VectorFile] = None
+_vector_file_lock = threading.Lock()
+
+
+def get_vector_file() -> VectorFile:
+    global _vector_file
+    if _vector_file is None:
+        with _vector_file_lock:
+            if _vector_file is None:
+                _vector_file = VectorFile(settings.VECTOR_STORE_DIR)
+    return _vector_file
+
+
+def read_vectors(rows: Iterable[int]) -> np.ndarray:
+    return get_vector_file().read(rows)
+
+
+# ("user", user_id): the chunks a user uploaded; ("workspace", workspace_id):
+# the chunks shared into a workspace
+IndexKey = Tuple[str, int]
+_KEY_COLUMNS = {"user": "user_id", "workspace": "workspace_id"}
+
+
+class TenantIndex:
+    """int8 codes + filters in RAM; float32 originals read from the shared VectorFile."""
+
+    def __init__(self, key: IndexKey, dim: int, vectors: VectorFile, capacity: int = 1024):
+        self.key = key
+        self.dim = dim
+        self.vectors = vectors
+        self.n = 0
+        self.dead = 0
+        self.ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+
+        capacity = max(capacity, 1)
+        self.codes = np.zeros((capacity, dim), dtype=np.int8)
+        self.scales = np.zeros(capacity, dtype=np.float32)
+        self.vector_rows = np.zeros(capacity, dtype=np.int64)
+        self.document_ids = np.zeros(capacity, dtype=np.int64)
+        self.sources = np.zeros(capacity, dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        self._lock = threading.Lock()
+
+    # ---------- memory ----------
+
+    def nbytes(self) -> int:
+        """Resident bytes for the index (codes, scales, rows, filters), excluding the on-disk floats."""
+        return self.n * (self.dim + 4 + 8 + 8 + 1 + 1)
+
+    # ---------- writes ----------
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.scales)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("codes", "scales", "vector_rows", "document_ids", "sources", "alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.n] = old[: self.n]
+            setattr(self, name, new)
+
+    def add(
+        self,
+        ids: List[str],
+        vector_rows: Iterable[int],
+        embeddings: np.ndarray,
+        document_ids: Iterable[int],
+        sources: Iterable[int],
+    ) -> None:
+        """Append rows (sources as source_code values); an id already present is replaced."""
+        if not ids:
+            return
+        codes, scales = quantize(normalize(embeddings))
+
+        with self._lock:
+            start = self.n
+            end = start + len(ids)
+            self._grow(end)
+            self.codes[start:end] = codes
+            self.scales[start:end] = scales
+            self.vector_rows[start:end] = list(vector_rows)
+            self.document_ids[start:end] = list(document_ids)
+            self.sources[start:end] = list(sources)
+            self.alive[start:end] = True
+            for offset, vid in enumerate(ids):
+                old = self.row_of.get(vid)
+                if old is not None and self.alive[old]:
+                    self.alive[old] = False
+                    self.dead += 1
+                self.row_of[vid] = start + offset
+            self.ids.extend(ids)
+            self.n = end
+
+    def remove(self, ids: Iterable[str] = (), document_id: Optional[int] = None) -> int:
+        removed = 0
+        with self._lock:
+            for vid in ids:
+                row = self.row_of.pop(vid, None)
+                if row is not None and self.alive[row]:
+                    self.alive[row] = False
+                    removed += 1
+            if document_id is not None:
+                rows = np.nonzero(self.alive[: self.n] & (self.document_ids[: self.n] == document_id))[0]
+                self.alive[rows] = False
+                removed += len(rows)
+            self.dead += removed
+        return removed
+
+    def needs_rebuild(self) -> bool:
+        return self.n > 0 and self.dead / self.n > MAX_DEAD_RATIO
+
+    # ---------- reads ----------
+
+    def _mask(
+        self,
+        document_ids: Optional[List[int]],
+        sources: Optional[List[str]],
+    ) -> np.ndarray:
+        mask = self.alive[: self.n].copy()
+        if document_ids is not None:
+            mask &= np.isin(self.document_ids[: self.n], np.asarray(document_ids, dtype=np.int64))
+        if sources:
+            codes = [_SOURCE_CODE[s] for s in sources if s in _SOURCE_CODE]
+            mask &= np.isin(self.sources[: self.n], np.asarray(codes, dtype=np.uint8))
+        return mask
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        document_ids: Optional[List[int]] = None,
+        sources: Optional[List[str]] = None,
+        rescore_factor: Optional[int] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k per query as [(vector_id, cosine_distance), ...].
+        rescore_factor=0 returns the approximate int8 ranking as is.
+        """
+        rescore_factor = settings.VECTOR_RESCORE_FACTOR if rescore_factor is None else rescore_factor
+        queries = normalize(np.atleast_2d(queries))
+
+        with self._lock:
+            n = self.n
+            mask = self._mask(document_ids, sources)
+            valid = int(mask.sum())
+            if valid == 0:
+                return [[] for _ in range(len(queries))]
+
+            # Approximate scores for every row: (codes · q) * scale, in blocks
+            scores = np.empty((len(queries), n), dtype=np.float32)
+            for start in range(0, n, BLOCK_ROWS):
+                end = min(start + BLOCK_ROWS, n)
+                block = self.codes[start:end].astype(np.float32)
+                scores[:, start:end] = (queries @ block.T) * self.scales[start:end]
+            scores[:, ~mask] = -np.inf
+
+            n_candidates = min(valid, max(k, k * rescore_factor))
+            vector_rows = self.vector_rows[:n].copy() if rescore_factor else None
+            ids = self.ids
+
+        results: List[List[Tuple[str, float]]] = []
+        for qi, query in enumerate(queries):
+            row_scores = scores[qi]
+            candidates = np.argpartition(-row_scores, n_candidates - 1)[:n_candidates]
+            if vector_rows is not None:
+                # exact cosine on the float32 originals (rows are unit vectors)
+                candidates = np.sort(candidates)
+                candidate_scores = self.vectors.read(vector_rows[candidates]) @ query
+            else:
+                candidate_scores = row_scores[candidates]
+            order = np.argsort(-candidate_scores)[:k]
+            results.append([
+                (ids[candidates[i]], float(1.0 - candidate_scores[i]))
+                for i in order
+            ])
+        return results
+
+
+# ---------- per-tenant registry ----------
+
+_indexes: Dict[IndexKey, TenantIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def build_index(key: IndexKey) -> Optional[TenantIndex]:
+    """Build an uploader's or workspace's index from the live rows of the vector file."""
+    vectors = get_vector_file()
+    column = _KEY_COLUMNS[key[0]]
+
+    def live(records: np.ndarray) -> np.ndarray:
+        return np.nonzero((records[column] == key[1]) & (records["deleted"] == 0))[0]
+
+    # Count first so the arrays are allocated once, at their final size
+    total = sum(len(live(records)) for _, records in vectors.scan())
+    if not total:
+        return None
+    index = TenantIndex(key, vectors.dim, vectors, capacity=total)
+    for start, records in vectors.scan():
+        selected = live(records)
+        if not len(selected):
+            continue
+        block = vectors.read_block(start + int(selected[0]), int(selected[-1] - selected[0]) + 1)
+        index.add(
+            [vid.decode("utf-8") for vid in records["id"][selected]],
+            start + selected,
+            block[selected - selected[0]],
+            records["document_id"][selected],
+            records["source"][selected],
+        )
+    return index
+
+
+def get_index(key: IndexKey) -> Optional[TenantIndex]:
+    """The index for key, built on first use (None if it has no vectors)."""
+    index = _indexes.get(key)
+    if index is not None and not index.needs_rebuild():
+        return index
+    with _registry_lock:
+        index = _indexes.get(key)
+        if index is None or index.needs_rebuild():
+            index = build_index(key)
+            if index is None:
+                _indexes.pop(key, None)
+            else:
+                _indexes[key] = index
+    return index
+
+
+def search(
+    queries: np.ndarray,
+    k: int,
+    user_id: int,
+    workspace_ids: Optional[List[int]] = None,
+    document_ids: Optional[List[int]] = None,
+    sources: Optional[List[str]] = None,
+) -> List[List[Tuple[str, float]]]:
+    """
+    🔒 Top-k per query over the user's own chunks plus those shared into
+    workspace_ids (a shared chunk of the user's own is in both, kept once).
+    """
+    keys = [("user", user_id)] + [("workspace", w) for w in workspace_ids or []]
+    indexes = [index for index in (get_index(key) for key in keys) if index is not None]
+    merged: List[Dict[str, float]] = [{} for _ in range(len(np.atleast_2d(queries)))]
+    for index in indexes:
+        found = index.search(queries, k, document_ids, sources)
+        for best, hits in zip(merged, found):
+            for vid, dist in hits:
+                if dist < best.get(vid, np.inf):
+                    best[vid] = dist
+    return [sorted(best.items(), key=lambda hit: hit[1])[:k] for best in merged]
+
+
+def store(
+    ids: List[str],
+    embeddings: List[List[float]],
+    metadatas: List[Dict[str, Any]],
+    replace: bool = True,
+) -> List[int]:
+    """
+    Write chunk vectors (replace=True first retires rows already stored
+    under these ids) and feed already-loaded indexes. Returns the vector
+    rows, in order.
+    """
+    vectors = get_vector_file()
+    if replace:
+        vectors.mark_deleted(ids)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    rows = vectors.append(ids, embeddings, metadatas)
+
+    rows_by_key: Dict[IndexKey, List[int]] = {}
+    for i, meta in enumerate(metadatas):
+        for kind, column in _KEY_COLUMNS.items():
+            if meta.get(column) is not None:
+                rows_by_key.setdefault((kind, int(meta[column])), []).append(i)
+    for key, picked in rows_by_key.items():
+        index = _indexes.get(key)
+        if index is None:
+            continue  # unloaded indexes build from the file later
+        index.add(
+            [ids[i] for i in picked],
+            [rows[i] for i in picked],
+            embeddings[picked],
+            [int(metadatas[i].get("document_id") or 0) for i in picked],
+            [source_code(metadatas[i].get("source")) for i in picked],
+        )
+    return rows
+
+
+def set_workspaces(workspace_by_id: Dict[str, Optional[int]]) -> None:
+    """Restamp chunks' workspace; loaded indexes are dropped and rebuilt on use."""
+    if get_vector_file().set_workspaces(workspace_by_id):
+        reset()
+
+
+def on_delete(ids: Optional[List[str]] = None, document_id: Optional[int] = None) -> None:
+    get_vector_file().mark_deleted(ids or [], document_id)
+    for index in list(_indexes.values()):
+        index.remove(ids or [], document_id)
+
+
+def reset() -> None:
+    """Drop all loaded indexes (they are rebuilt from the vector file on next use)."""
+    with _registry_lock:
+        _indexes.clear()
+
+
+def convert(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Copy the float32 Chroma collection (VECTOR_STORE_MODE=chroma) into the
+    int8 layout: vectors into the vector file, texts and metadata into the
+    metadata collection. Chunks already there are skipped, so it can be re-run.
+    """
+    from app.core import rag
+
+    source = rag.get_client().get_or_create_collection(name=rag._COLLECTION_NAME)
+    target = rag.get_quantized_collection()
+    counts = {"copied": 0, "skipped": 0}
+    offset = 0
+    while True:
+        page = source.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        offset += len(page["ids"])
+        present = set(target.get(ids=list(page["ids"]), include=[])["ids"])
+        todo = [i for i, vid in enumerate(page["ids"]) if vid not in present]
+        counts["skipped"] += len(page["ids"]) - len(todo)
+        if not todo:
+            continue
+        ids = [page["ids"][i] for i in todo]
+        metadatas = [page["metadatas"][i] or {} for i in todo]
+        rows = store(ids, [page["embeddings"][i] for i in todo], metadatas)
+        target.add(
+            ids=ids,
+            documents=[page["documents"][i] for i in todo],
+            metadatas=[{**meta, "vector_row": row} for meta, row in zip(metadatas, rows)],
+            embeddings=rag.placeholder_embeddings(len(todo)),
+        )
+        counts["copied"] += len(todo)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="int8 vector store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("convert", help="copy the Chroma float32 collection into the int8 store")
+    parser.parse_args()
+    print(json.dumps(convert(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,76 +2,568 @@
 #
 # RAG helper module:
 # - uses a single persistent Chroma collection
-# - stores all chunks (with document_id + page + user_id in metadata)
-# - provides `add_chunks` and `search` helpers
+# - stores all chunks (with document_id + page + user_id in metadata, plus
+#   workspace_id for documents shared into a workspace)
+# - provides `add_chunks`, `delete_vectors`, `search` and batched `search_many` helpers
+# - a second collection holds document/section summaries for the two-stage
+#   `search_hierarchical` (summaries first, then chunks inside the top sections)
+#
+# chromadb (and its ONNX runtime) is imported lazily: the client is created
+# by the app's startup hook (or on first use), never at import time.
+#
+# With VECTOR_STORE_MODE=int8, chunk texts and metadata live in a separate
+# metadata-only collection (1-dim placeholder vectors, so Chroma's HNSW
+# index stays tiny) and per-tenant queries are answered from the compressed
+# store in app.core.quantized_store, which holds the real vectors.
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import os
+import threading
 import uuid
-
-import chromadb
-from chromadb.config import Settings
+from urllib.parse import urlparse
 
 # Directory where Chroma DB files are stored
 CHROMA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "chroma_db")
-CHROMA_DIR = os.path.abspath(CHROMA_DIR)
-os.makedirs(CHROMA_DIR, exist_ok=True)
+CHROMA_DIR = os.path.abspath(os.getenv("CHROMA_DIR", CHROMA_DIR))
 
-# Single persistent Chroma client
-_client = chromadb.PersistentClient(
-    path=CHROMA_DIR,
-    settings=Settings(anonymized_telemetry=False),
-)
+# Single persistent Chroma client, created on first use
+_client = None
+_client_lock = threading.Lock()
 
 _COLLECTION_NAME = "ops_docs"
+# int8 mode: chunk texts + metadata only (vectors in app.core.quantized_store)
+_QUANTIZED_COLLECTION_NAME = "ops_docs_int8"
+# Document / section summaries (app/core/summaries.py), first retrieval stage
+_SUMMARY_COLLECTION_NAME = "ops_summaries"
+
+_embedding_function = None
+
+
+def get_client():
+    """Shared Chroma client (also used by the ticket similarity index)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import chromadb
+                from chromadb.config import Settings
+
+                from app.config import settings
+
+                if settings.CHROMA_SERVER_URL:
+                    # Multi-worker: one Chroma server owns the directory; this is
+                    # a pooled HTTP client (see app/core/index_service.py)
+                    url = urlparse(settings.CHROMA_SERVER_URL)
+                    pool = settings.INDEX_SERVICE_POOL_SIZE
+                    _client = chromadb.HttpClient(
+                        host=url.hostname,
+                        port=url.port or (443 if url.scheme == "https" else 80),
+                        ssl=url.scheme == "https",
+                        settings=Settings(
+                            anonymized_telemetry=False,
+                            chroma_http_max_connections=pool,
+                            chroma_http_max_keepalive_connections=pool,
+                        ),
+                    )
+                else:
+                    os.makedirs(CHROMA_DIR, exist_ok=True)
+                    _client = chromadb.PersistentClient(
+                        path=CHROMA_DIR,
+                        settings=Settings(anonymized_telemetry=False),
+                    )
+    return _client
 
 
 def get_collection():
     """Get or create the single collection we use for all document chunks."""
-    return _client.get_or_create_collection(
+    if _quantized_mode():
+        return get_quantized_collection()
+    return get_client().get_or_create_collection(
         name=_COLLECTION_NAME,
         metadata={"hnsw:space": "cosine"},
+        embedding_function=get_embedding_function(),
+    )
+
+
+def get_quantized_collection():
+    """int8 mode's chunk collection: texts + metadata, placeholder vectors."""
+    return get_client().get_or_create_collection(
+        name=_QUANTIZED_COLLECTION_NAME,
+        metadata={"hnsw:space": "l2"},
+        embedding_function=None,
+    )
+
+
+def placeholder_embeddings(n: int) -> List[List[float]]:
+    return [[0.0] for _ in range(n)]
+
+
+def get_summary_collection():
+    return get_client().get_or_create_collection(
+        name=_SUMMARY_COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine"},
+        embedding_function=get_embedding_function(),
     )
 
 
-def add_chunks(texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+def get_embedding_function():
+    """
+    Chroma's default embedder (the one the collections use), shared.
+    With INDEX_SERVICE_URL the same model runs once in the index service.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        with _client_lock:
+            if _embedding_function is None:
+                from app.config import settings
+
+                if settings.INDEX_SERVICE_URL:
+                    from app.core.index_service import RemoteEmbeddingFunction
+
+                    _embedding_function = RemoteEmbeddingFunction()
+                else:
+                    from chromadb.utils import embedding_functions
+
+                    _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return _embedding_function
+
+
+def _quantized_mode() -> bool:
+    from app.config import settings
+
+    # The int8 index lives in one process; with a Chroma server other
+    # workers' writes would never reach it
+    return settings.VECTOR_STORE_MODE.lower() == "int8" and not settings.CHROMA_SERVER_URL
+
+
+def add_chunks(texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
     """
     Add text chunks to Chroma with metadata like:
       {"document_id": 3, "page": 1, "user_id": 5}
+    Returns the vector ids, in order (stored on the Chunk rows).
     """
     if not texts:
+        return []
+
+    ids = [str(uuid.uuid4()) for _ in texts]
+    upsert_chunks(ids, texts, metadatas, replace=False)
+    return ids
+
+
+def upsert_chunks(
+    ids: List[str],
+    texts: List[str],
+    metadatas: List[Dict[str, Any]],
+    embeddings: Optional[List[List[float]]] = None,
+    replace: bool = True,
+) -> None:
+    """
+    Write chunks under known vector ids (restores, repairs). Embeds the texts
+    unless embeddings are given; in int8 mode the vectors go to the
+    compressed store and Chroma only gets texts + metadata.
+    replace=False skips retiring earlier int8 rows (ids known to be new).
+    """
+    if not ids:
         return
 
-    if len(texts) != len(metadatas):
-        raise ValueError("texts and metadatas must have same length")
+    if not (len(ids) == len(texts) == len(metadatas)):
+        raise ValueError("ids, texts and metadatas must have same length")
 
     collection = get_collection()
 
+    if _quantized_mode():
+        from app.core import quantized_store
+
+        if embeddings is None:
+            embeddings = get_embedding_function()(texts)
+        rows = quantized_store.store(ids, embeddings, metadatas, replace=replace)
+        collection.upsert(
+            ids=ids,
+            documents=texts,
+            metadatas=[{**meta, "vector_row": row} for meta, row in zip(metadatas, rows)],
+            embeddings=placeholder_embeddings(len(ids)),
+        )
+        return
+
+    if embeddings is None:
+        collection.upsert(ids=ids, documents=texts, metadatas=metadatas)
+    else:
+        collection.upsert(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings)
+
+
+def get_chunk_embeddings(ids: List[str]) -> Dict[str, List[float]]:
+    """Stored vectors by id (snapshot export); ids without a vector are left out."""
+    if not ids:
+        return {}
+
+    collection = get_collection()
+
+    if _quantized_mode():
+        from app.core import quantized_store
+
+        stored = collection.get(ids=ids, include=["metadatas"])
+        pairs = [
+            (vid, int(meta["vector_row"]))
+            for vid, meta in zip(stored["ids"], stored["metadatas"])
+            if meta and meta.get("vector_row") is not None
+        ]
+        vectors = quantized_store.read_vectors([row for _, row in pairs])
+        return {vid: vector.tolist() for (vid, _), vector in zip(pairs, vectors)}
+
+    stored = collection.get(ids=ids, include=["embeddings"])
+    embeddings = stored.get("embeddings")
+    if embeddings is None:
+        return {}
+    return {vid: list(emb) for vid, emb in zip(stored["ids"], embeddings) if emb is not None}
+
+
+def delete_vectors(ids: Optional[List[str]] = None, document_id: Optional[int] = None) -> None:
+    """
+    Delete vectors by id and/or every vector of a document (the latter also
+    catches chunks ingested before vector ids were recorded).
+    """
+    collection = get_collection()
+    if ids:
+        collection.delete(ids=ids)
+    if document_id is not None:
+        collection.delete(where={"document_id": document_id})
+
+    if _quantized_mode():
+        from app.core import quantized_store
+
+        quantized_store.on_delete(ids, document_id)
+
+
+def update_chunk_metadata(ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """Rewrite stored chunk metadata (e.g. a restamped workspace_id)."""
+    if not ids:
+        return
+    get_collection().update(ids=ids, metadatas=metadatas)
+
+    if _quantized_mode():
+        from app.core import quantized_store
+
+        quantized_store.set_workspaces(
+            {vid: meta.get("workspace_id") for vid, meta in zip(ids, metadatas)}
+        )
+
+
+def add_summary_vectors(texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+    """Embed summaries into the summary collection; returns their vector ids."""
+    if not texts:
+        return []
     ids = [str(uuid.uuid4()) for _ in texts]
+    get_summary_collection().add(ids=ids, documents=texts, metadatas=metadatas)
+    return ids
+
+
+def delete_summary_vectors(ids: Optional[List[str]] = None, document_id: Optional[int] = None) -> None:
+    collection = get_summary_collection()
+    if ids:
+        collection.delete(ids=ids)
+    if document_id is not None:
+        collection.delete(where={"document_id": document_id})
+
+
+def iter_vectors(
+    batch_size: int = 1000,
+    collection=None,
+) -> Iterator[Tuple[List[str], List[Dict[str, Any]], List[str]]]:
+    """Page through the whole (chunk) collection: yields (ids, metadatas, documents)."""
+    collection = collection if collection is not None else get_collection()
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["metadatas", "documents"],
+            limit=batch_size,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        yield page["ids"], page["metadatas"], page["documents"]
+        offset += len(page["ids"])
+
+
+Section = Tuple[int, Optional[int], Optional[int]]
+
+
+def _section_clause(section: Section) -> Dict[str, Any]:
+    document_id, page_start, page_end = section
+    if page_start is None or page_end is None:
+        return {"document_id": document_id}
+    return {"$and": [
+        {"document_id": document_id},
+        {"page": {"$gte": page_start}},
+        {"page": {"$lte": page_end}},
+    ]}
+
+
+def build_where(
+    user_id: Optional[int] = None,
+    document_ids: Optional[List[int]] = None,
+    sources: Optional[List[str]] = None,
+    sections: Optional[List[Section]] = None,
+    workspace_ids: Optional[List[int]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Chroma `where` filter: user isolation (own vectors, plus those shared
+    into workspace_ids) plus an optional document/source scope, or (second
+    retrieval stage) specific (document_id, first page, last page) sections;
+    a None page range means the whole document.
+    """
+    clauses: List[Dict[str, Any]] = []
+    if user_id is not None and workspace_ids:
+        clauses.append({"$or": [
+            {"user_id": user_id},
+            {"workspace_id": {"$in": list(workspace_ids)}},
+        ]})
+    elif user_id is not None:
+        clauses.append({"user_id": user_id})
+    if document_ids is not None:
+        clauses.append({"document_id": {"$in": list(document_ids)}})
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    if sections:
+        section_clauses = [_section_clause(sec) for sec in sections]
+        clauses.append(section_clauses[0] if len(section_clauses) == 1 else {"$or": section_clauses})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def _empty_results() -> Dict[str, Any]:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]], "matched_queries": [[]]}
+
+
+def _query_quantized(
+    collection,
+    embeddings: List[Any],
+    user_id: Optional[int],
+    document_ids: Optional[List[int]],
+    sources: Optional[List[str]],
+    n_results: int,
+    workspace_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """🔒 int8 store path; returns the same per-query shape as collection.query."""
+    from app.core import quantized_store
+
+    groups: List[List[Tuple[str, float]]] = [[] for _ in embeddings]
+    if user_id is not None:
+        # 🔒 the user's own index plus one per workspace they belong to
+        groups = quantized_store.search(
+            embeddings, n_results, user_id, workspace_ids, document_ids, sources
+        )
 
-    collection.add(
-        ids=ids,
-        documents=texts,
-        metadatas=metadatas,
+    ids = list({vid for hits in groups for vid, _ in hits})
+    by_id: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    if ids:
+        stored = collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            vid: (doc, meta)
+            for vid, doc, meta in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+    groups = [[(vid, dist) for vid, dist in hits if vid in by_id] for hits in groups]
+    return {
+        "ids": [[vid for vid, _ in hits] for hits in groups],
+        "documents": [[by_id[vid][0] for vid, _ in hits] for hits in groups],
+        "metadatas": [[by_id[vid][1] for vid, _ in hits] for hits in groups],
+        "distances": [[dist for _, dist in hits] for hits in groups],
+    }
+
+
+def _merge_groups(raw: Dict[str, Any], limit: Optional[int]) -> Dict[str, Any]:
+    """
+    Merge per-query result groups into one, deduplicated by chunk (vector id):
+    each chunk keeps its best distance and the indexes of the queries that hit it.
+    """
+    best: Dict[str, Dict[str, Any]] = {}
+    for qi, (ids, docs, metas, dists) in enumerate(
+        zip(raw["ids"], raw["documents"], raw["metadatas"], raw["distances"])
+    ):
+        for vid, doc, meta, dist in zip(ids, docs, metas, dists):
+            hit = best.get(vid)
+            if hit is None:
+                best[vid] = {"document": doc, "metadata": meta, "distance": dist, "queries": [qi]}
+            else:
+                hit["distance"] = min(hit["distance"], dist)
+                hit["queries"].append(qi)
+
+    ranked = sorted(best.items(), key=lambda item: item[1]["distance"])
+    if limit is not None:
+        ranked = ranked[:limit]
+    return {
+        "ids": [[vid for vid, _ in ranked]],
+        "documents": [[hit["document"] for _, hit in ranked]],
+        "metadatas": [[hit["metadata"] for _, hit in ranked]],
+        "distances": [[hit["distance"] for _, hit in ranked]],
+        "matched_queries": [[hit["queries"] for _, hit in ranked]],
+    }
+
+
+def search_many(
+    queries: List[str],
+    user_id: Optional[int] = None,
+    document_ids: Optional[List[int]] = None,
+    sources: Optional[List[str]] = None,
+    n_results: int = 10,
+    limit: Optional[int] = None,
+    workspace_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    🔒 USER-SCOPED batched search for several query variants (rewrites,
+    sub-questions, eval sets): all queries are embedded in one pass and sent
+    as ONE collection query, then merged and deduplicated by chunk.
+
+    Returns the collection.query shape with a single merged group, best
+    distance first, plus "matched_queries" (which queries found each chunk).
+    n_results is per query; limit caps the merged list (default: no cap).
+    Scope and workspace arguments work as in `search`.
+    """
+    queries = [q for q in queries if q and q.strip()]
+    if not queries or (document_ids is not None and not document_ids):
+        return _empty_results()
+
+    embeddings = get_embedding_function()(queries)
+    return _search_embeddings(
+        embeddings, user_id, document_ids, sources, n_results, limit, workspace_ids=workspace_ids
     )
 
 
-def search(query: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+def _search_embeddings(
+    embeddings: List[Any],
+    user_id: Optional[int],
+    document_ids: Optional[List[int]],
+    sources: Optional[List[str]],
+    n_results: int,
+    limit: Optional[int],
+    sections: Optional[List[Section]] = None,
+    workspace_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    collection = get_collection()
+    if _quantized_mode():
+        # Only the int8 store holds real vectors (no tenant = no results)
+        if sections:
+            # The int8 index filters by document only
+            document_ids = sorted({doc_id for doc_id, _, _ in sections})
+        raw = _query_quantized(
+            collection, embeddings, user_id, document_ids, sources, n_results, workspace_ids
+        )
+    else:
+        # 🔒 Build where filter for user isolation (+ scope)
+        raw = collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,  # top chunks per query across the docs in scope
+            where=build_where(user_id, document_ids, sources, sections, workspace_ids),  # 🔒 USER ISOLATION
+            include=["documents", "metadatas", "distances"],
+        )
+    return _merge_groups(raw, limit)
+
+
+def search(
+    query: str,
+    user_id: Optional[int] = None,
+    document_ids: Optional[List[int]] = None,
+    sources: Optional[List[str]] = None,
+    n_results: int = 10,
+    workspace_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
     """
     🔒 USER-SCOPED vector search over document chunks.
     
-    If user_id is provided, only return chunks belonging to that user.
+    If user_id is provided, only return chunks belonging to that user, or
+    shared into one of workspace_ids (the caller checks membership).
+    document_ids / sources narrow the search further (see
+    app.core.chunks.scope_document_ids for the SQL prefilter); an empty
+    document_ids list means nothing is in scope.
+    Thin wrapper over `search_many` with one query.
     """
-    collection = get_collection()
+    return search_many(
+        [query],
+        user_id=user_id,
+        document_ids=document_ids,
+        sources=sources,
+        n_results=n_results,
+        workspace_ids=workspace_ids,
+    )
 
-    # 🔒 Build where filter for user isolation
-    where_filter = None
-    if user_id is not None:
-        where_filter = {"user_id": user_id}
 
-    results = collection.query(
-        query_texts=[query],
-        n_results=10,  # top 10 chunks across all docs
-        where=where_filter  # 🔒 USER ISOLATION
+def search_hierarchical(
+    query: str,
+    user_id: Optional[int] = None,
+    document_ids: Optional[List[int]] = None,
+    sources: Optional[List[str]] = None,
+    n_sections: int = 4,
+    n_results: int = 6,
+    workspace_ids: Optional[List[int]] = None,
+    unsummarized_document_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    🔒 USER-SCOPED two-stage search:
+      1. the query is matched against document/section summaries
+      2. chunks are searched only inside the top sections (a document-level
+         hit opens the whole document)
+    unsummarized_document_ids are the documents in scope without summaries
+    (summaries.unsummarized_document_ids, from SQL): when there are any they
+    are searched flat alongside stage 2, and the two result sets are merged
+    by distance, so they stay retrievable.
+    Returns the `search` shape plus "summaries" (the stage-1 hits, best
+    first) and "sections". Falls back to flat search when nothing in scope
+    has summaries yet.
+    """
+    if not query or not query.strip() or (document_ids is not None and not document_ids):
+        return {**_empty_results(), "summaries": [], "sections": []}
+
+    embeddings = get_embedding_function()([query])
+    summary_collection = get_summary_collection()
+    stage1 = summary_collection.query(
+        query_embeddings=embeddings,
+        n_results=n_sections,
+        where=build_where(user_id, document_ids, sources, workspace_ids=workspace_ids),  # 🔒 USER ISOLATION
+        include=["documents", "metadatas", "distances"],
+    )
+
+    summaries: List[Dict[str, Any]] = []
+    seen: set = set()
+    whole_documents: set = set()
+    ranges: List[Section] = []
+    for vid, text, meta, dist in zip(
+        stage1["ids"][0], stage1["documents"][0], stage1["metadatas"][0], stage1["distances"][0]
+    ):
+        doc_id = int(meta["document_id"])
+        # Single-section documents built before the dedupe in build_summaries
+        # have identical document and section summaries: keep one
+        if (doc_id, text) in seen:
+            continue
+        seen.add((doc_id, text))
+        summaries.append({"id": vid, "content": text, "metadata": meta, "distance": dist})
+        if meta.get("level") == "document" or meta.get("page_start") is None:
+            whole_documents.add(doc_id)
+        else:
+            ranges.append((doc_id, int(meta["page_start"]), int(meta["page_end"])))
+
+    if not summaries:
+        results = _search_embeddings(
+            embeddings, user_id, document_ids, sources, 10, None, workspace_ids=workspace_ids
+        )
+        return {**results, "summaries": [], "sections": []}
+
+    sections: List[Section] = [(doc_id, None, None) for doc_id in sorted(whole_documents)]
+    sections += [sec for sec in ranges if sec[0] not in whole_documents]
+    results = _search_embeddings(
+        embeddings, user_id, document_ids, sources, n_results, None, sections, workspace_ids
     )
-    return results
\ No newline at end of file
+
+    if unsummarized_document_ids:
+        unsummarized = _search_embeddings(
+            embeddings, user_id, unsummarized_document_ids, sources, n_results, None,
+            workspace_ids=workspace_ids,
+        )
+        raw = {
+            key: [results[key][0] + unsummarized[key][0]]
+            for key in ("ids", "documents", "metadatas", "distances")
+        }
+        results = _merge_groups(raw, n_results)
+    return {**results, "summaries": summaries, "sections": sections}
@@ -0,0 +1,150 @@
+# app/core/rate_limit.py
+#
+# Per-user token-bucket rate limiting.
+# - One bucket per (budget, user_id); budgets: "chat" (requests), "upload"
+#   (requests) and "ocr" (images / scanned pages), each with its own
+#   refill rate and burst size from settings
+# - In-process by default; set RATE_LIMIT_REDIS_URL to share buckets between
+#   workers (atomic Lua script, needs the `redis` package). If Redis is not
+#   importable or reachable the limiter falls back to in-process buckets
+# - Over budget → HTTP 429 with Retry-After (seconds until enough tokens)
+
+import math
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from app.config import settings
+from app.core.security import get_current_user
+from app.models.user import User
+
+# budget → (tokens per second, burst)
+BUDGETS: Dict[str, Tuple[float, float]] = {
+    "chat": (settings.RATE_LIMIT_CHAT_PER_MINUTE / 60, settings.RATE_LIMIT_CHAT_BURST),
+    "upload": (settings.RATE_LIMIT_UPLOAD_PER_MINUTE / 60, settings.RATE_LIMIT_UPLOAD_BURST),
+    "ocr": (settings.RATE_LIMIT_OCR_PER_MINUTE / 60, settings.RATE_LIMIT_OCR_BURST),
+}
+
+_REDIS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry)
+"""
+
+
+def _refill_seconds(budget: str) -> float:
+    rate, burst = BUDGETS[budget]
+    return burst / rate if rate > 0 else 0.0
+
+
+class LocalBuckets:
+    """Buckets in this process: {(budget, user_id): (tokens, updated_at)}."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, int], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, budget: str, user_id: int, rate: float, burst: float, cost: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get((budget, user_id), (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / rate
+            self._buckets[(budget, user_id)] = (tokens, now)
+            if len(self._buckets) > 10000:
+                # Drop buckets idle long enough to have refilled; they equal a fresh one
+                self._buckets = {
+                    key: (t, u) for key, (t, u) in self._buckets.items()
+                    if now - u < _refill_seconds(key[0])
+                }
+        return retry_after
+
+
+class RedisBuckets:
+    """Buckets in Redis, shared by every worker pointing at the same URL."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+        self._script = self._client.register_script(_REDIS_SCRIPT)
+
+    def take(self, budget: str, user_id: int, rate: float, burst: float, cost: float) -> float:
+        retry = self._script(
+            keys=[f"opscopilot:ratelimit:{budget}:{user_id}"],
+            args=[rate, burst, time.time(), cost],
+        )
+        return float(retry)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.RATE_LIMIT_REDIS_URL:
+                    try:
+                        _store = RedisBuckets(settings.RATE_LIMIT_REDIS_URL)
+                        print(f"✅ Rate limits shared via Redis ({settings.RATE_LIMIT_REDIS_URL})")
+                    except Exception as e:
+                        print(f"⚠️ Redis rate-limit store unavailable ({e}); using in-process buckets")
+                if _store is None:
+                    _store = LocalBuckets()
+    return _store
+
+
+def check(budget: str, user_id: int, cost: float = 1) -> float:
+    """Take `cost` tokens; returns 0 when allowed, else seconds until it would be."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    rate, burst = BUDGETS[budget]
+    if rate <= 0:
+        return 0.0
+    # A single request larger than the burst can still go through on a full bucket
+    return get_store().take(budget, user_id, rate, burst, min(cost, burst))
+
+
+def enforce(budget: str, user_id: int, cost: float = 1) -> None:
+    """🔒 Per-user budget; raises 429 with Retry-After when it is exhausted."""
+    retry_after = check(budget, user_id, cost)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded for {budget}; retry in {math.ceil(retry_after)}s",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def rate_limited(budget: str):
+    """Dependency: the authenticated user, after taking one token from `budget`."""
+
+    def dependency(current_user: User = Depends(get_current_user)) -> User:
+        enforce(budget, current_user.id)
+        return current_user
+
+    return dependency
@@ -0,0 +1,503 @@
+# app/core/snapshot.py
+#
+# Per-tenant snapshots: one file with a user's documents, chunk rows, vector
+# ids and embeddings, so another node can bulk-load the index without
+# re-extracting or re-embedding anything.
+#
+# File layout (little-endian, footer-indexed so it can be written in one pass):
+#
+#   MAGIC
+#   [embeddings]   float32 (n_vectors × dim), 64-byte aligned → np.memmap-able
+#   [chunks]       zlib-compressed JSON lines, one chunk row each
+#   [documents]    zlib-compressed JSON lines, one document row each
+#   [workspaces]   zlib-compressed JSON lines: the workspaces those documents
+#                  are shared into, with their members (by email)   (v2+)
+#   [header]       JSON: version, user_id, dim, counts, section offsets,
+#                  sha256 of everything between MAGIC and the header
+#   header length  uint64
+#   MAGIC
+#
+# On import, a workspace is reused when this node has one with the same id
+# and name (a restore), otherwise it is recreated; members whose email exists
+# here get their role back. A shared document whose file is already in the
+# target workspace (same content_hash) is skipped, as on upload.
+#
+# Usage (from backend/):
+#   python -m app.core.snapshot export --user-id 5 --out tenant5.snap
+#   python -m app.core.snapshot import --in tenant5.snap [--user-id 7] [--replace]
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.chunks import chunk_vector_metadata
+from app.core.rag import get_chunk_embeddings, get_collection, upsert_chunks
+from app.core.workspaces import find_shared_copy
+from app.models.db_models import Chunk, Document, Workspace, WorkspaceMember
+from app.models.user import User
+
+MAGIC = b"OPSSNAP1"
+VERSION = 2
+# Versions import_snapshot reads (v1: no workspaces, no content hashes)
+READABLE_VERSIONS = (1, 2)
+ALIGN = 64
+_BATCH = 1000
+
+# Chunk columns carried in the snapshot (ids are reassigned on import)
+_CHUNK_FIELDS = [
+    "document_id", "content", "page", "source", "char_start", "char_end",
+    "token_count", "content_hash", "vector_id", "meta_json", "workspace_id",
+]
+
+
+class SnapshotError(Exception):
+    """Corrupt, truncated or incompatible snapshot file."""
+
+
+def _pad(f: BinaryIO, digest) -> None:
+    pad = (-f.tell()) % ALIGN
+    if pad:
+        f.write(b"\0" * pad)
+        digest.update(b"\0" * pad)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _iter_user_chunks(db: Session, user_id: int) -> Iterator[List[Chunk]]:
+    last_id = 0
+    while True:
+        batch = (
+            db.query(Chunk)
+            .filter(Chunk.user_id == user_id, Chunk.id > last_id)  # 🔒 USER ISOLATION
+            .order_by(Chunk.id)
+            .limit(_BATCH)
+            .all()
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+        yield batch
+
+
+# ==================== EXPORT ====================
+
+def export_snapshot(db: Session, user_id: int, path: str) -> Dict[str, Any]:
+    """🔒 Write one user's documents, chunks and embeddings to `path`."""
+    import numpy as np
+
+    digest = hashlib.sha256()
+    dim: Optional[int] = None
+    n_vectors = 0
+    n_chunks = 0
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f, tempfile.TemporaryFile() as chunk_buf:
+        f.write(MAGIC)
+        _pad(f, digest)
+        embeddings_offset = f.tell()
+
+        # Embeddings go straight to the file; chunk rows are compressed into a
+        # side buffer and appended after the (aligned) embedding block.
+        compressor = zlib.compressobj(6)
+        for batch in _iter_user_chunks(db, user_id):
+            vectors = get_chunk_embeddings([c.vector_id for c in batch if c.vector_id])
+
+            lines = []
+            for c in batch:
+                record = {field: getattr(c, field) for field in _CHUNK_FIELDS}
+                embedding = vectors.get(c.vector_id) if c.vector_id else None
+                if embedding is not None:
+                    row = np.asarray(embedding, dtype="<f4")
+                    if dim is None:
+                        dim = int(row.shape[0])
+                    elif row.shape[0] != dim:
+                        raise SnapshotError(f"Mixed embedding sizes ({dim} vs {row.shape[0]})")
+                    data = row.tobytes()
+                    f.write(data)
+                    digest.update(data)
+                    record["row"] = n_vectors
+                    n_vectors += 1
+                else:
+                    # no stored vector (legacy chunk): re-embedded on import
+                    record["row"] = None
+                lines.append(json.dumps(record, separators=(",", ":")))
+            chunk_buf.write(compressor.compress(("\n".join(lines) + "\n").encode("utf-8")))
+            n_chunks += len(batch)
+        chunk_buf.write(compressor.flush())
+        embeddings_length = f.tell() - embeddings_offset
+
+        # Chunk rows
+        chunks_offset = f.tell()
+        chunk_buf.seek(0)
+        for block in iter(lambda: chunk_buf.read(1024 * 1024), b""):
+            f.write(block)
+            digest.update(block)
+        chunks_length = f.tell() - chunks_offset
+
+        # Documents
+        documents = (
+            db.query(Document)
+            .filter(Document.user_id == user_id)  # 🔒 USER ISOLATION
+            .order_by(Document.id)
+            .all()
+        )
+        doc_lines = "\n".join(
+            json.dumps(
+                {
+                    "id": d.id, "name": d.name, "path": d.path, "uploaded_at": _iso(d.uploaded_at),
+                    "content_hash": d.content_hash, "workspace_id": d.workspace_id,
+                },
+                separators=(",", ":"),
+            )
+            for d in documents
+        )
+        data = zlib.compress(doc_lines.encode("utf-8"), 6)
+        documents_offset = f.tell()
+        f.write(data)
+        digest.update(data)
+        documents_length = len(data)
+
+        # Workspaces the documents are shared into
+        workspaces = _workspace_records(db, {d.workspace_id for d in documents if d.workspace_id is not None})
+        data = zlib.compress("\n".join(json.dumps(w, separators=(",", ":")) for w in workspaces).encode("utf-8"), 6)
+        workspaces_offset = f.tell()
+        f.write(data)
+        digest.update(data)
+
+        header = {
+            "version": VERSION,
+            "user_id": user_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "dim": dim or 0,
+            "counts": {
+                "documents": len(documents), "chunks": n_chunks, "vectors": n_vectors,
+                "workspaces": len(workspaces),
+            },
+            "sections": {
+                "embeddings": {"offset": embeddings_offset, "length": embeddings_length, "dtype": "<f4"},
+                "chunks": {"offset": chunks_offset, "length": chunks_length, "encoding": "zlib+jsonl"},
+                "documents": {"offset": documents_offset, "length": documents_length, "encoding": "zlib+jsonl"},
+                "workspaces": {"offset": workspaces_offset, "length": len(data), "encoding": "zlib+jsonl"},
+            },
+            "sha256": digest.hexdigest(),
+        }
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        f.write(header_bytes)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(MAGIC)
+
+    os.replace(tmp_path, path)
+    return {"path": path, "bytes": os.path.getsize(path), **header["counts"]}
+
+
+def _workspace_records(db: Session, workspace_ids) -> List[Dict[str, Any]]:
+    if not workspace_ids:
+        return []
+    members: Dict[int, List[Dict[str, Any]]] = {}
+    for workspace_id, user_id, email, role in (
+        db.query(WorkspaceMember.workspace_id, User.id, User.email, WorkspaceMember.role)
+        .join(User, User.id == WorkspaceMember.user_id)
+        .filter(WorkspaceMember.workspace_id.in_(workspace_ids))
+        .order_by(WorkspaceMember.id)
+    ):
+        members.setdefault(workspace_id, []).append({"user_id": user_id, "email": email, "role": role})
+    return [
+        {"id": w.id, "name": w.name, "created_at": _iso(w.created_at), "members": members.get(w.id, [])}
+        for w in db.query(Workspace).filter(Workspace.id.in_(workspace_ids)).order_by(Workspace.id)
+    ]
+
+
+# ==================== READ ====================
+
+def read_header(path: str, verify: bool = True) -> Dict[str, Any]:
+    """Parse (and by default checksum) a snapshot; raises SnapshotError."""
+    size = os.path.getsize(path)
+    footer = len(MAGIC) + 8
+    if size < len(MAGIC) + footer:
+        raise SnapshotError("File too small to be a snapshot")
+
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError("Not a snapshot file (bad magic)")
+        f.seek(size - footer)
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError("Truncated snapshot (bad trailer)")
+        header_start = size - footer - header_len
+        if header_start < len(MAGIC):
+            raise SnapshotError("Corrupt snapshot header length")
+        f.seek(header_start)
+        try:
+            header = json.loads(f.read(header_len))
+        except ValueError as e:
+            raise SnapshotError(f"Corrupt snapshot header: {e}") from e
+
+        if header.get("version") not in READABLE_VERSIONS:
+            raise SnapshotError(f"Unsupported snapshot version {header.get('version')}")
+
+        if verify:
+            digest = hashlib.sha256()
+            f.seek(len(MAGIC))
+            remaining = header_start - len(MAGIC)
+            while remaining:
+                block = f.read(min(remaining, 1024 * 1024))
+                if not block:
+                    raise SnapshotError("Truncated snapshot")
+                digest.update(block)
+                remaining -= len(block)
+            if digest.hexdigest() != header["sha256"]:
+                raise SnapshotError("Checksum mismatch: snapshot is corrupt")
+    return header
+
+
+def open_embeddings(path: str, header: Dict[str, Any]):
+    """Memory-map the embedding block (n_vectors × dim float32), no copy."""
+    import numpy as np
+
+    n, dim = header["counts"]["vectors"], header["dim"]
+    if not n:
+        return np.zeros((0, dim), dtype="<f4")
+    section = header["sections"]["embeddings"]
+    return np.memmap(path, dtype=section["dtype"], mode="r", offset=section["offset"], shape=(n, dim))
+
+
+def _read_section(path: str, section: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Stream JSON records out of a compressed section."""
+    decompressor = zlib.decompressobj()
+    remaining = section["length"]
+    pending = b""
+    with open(path, "rb") as f:
+        f.seek(section["offset"])
+        while remaining:
+            block = f.read(min(remaining, 1024 * 1024))
+            if not block:
+                raise SnapshotError("Truncated snapshot section")
+            remaining -= len(block)
+            pending += decompressor.decompress(block)
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+    pending += decompressor.flush()
+    for line in pending.split(b"\n"):
+        if line:
+            yield json.loads(line)
+
+
+# ==================== IMPORT ====================
+
+def import_snapshot(
+    db: Session,
+    path: str,
+    user_id: Optional[int] = None,
+    replace: bool = False,
+) -> Dict[str, Any]:
+    """
+    Bulk-load a snapshot into SQL + Chroma using the stored embeddings.
+    user_id defaults to the snapshot's owner; replace=True first deletes the
+    target user's existing documents.
+    """
+    header = read_header(path)
+    user_id = header["user_id"] if user_id is None else user_id
+    embeddings = open_embeddings(path, header)
+    collection = get_collection()
+
+    if replace:
+        from app.core.maintenance import delete_document
+
+        for doc in db.query(Document).filter(Document.user_id == user_id).all():
+            delete_document(db, doc)
+
+    workspace_map = _import_workspaces(db, path, header, user_id)
+
+    # Documents get new ids on this node
+    doc_map: Dict[int, Document] = {}
+    skipped_docs = set()
+    for record in _read_section(path, header["sections"]["documents"]):
+        workspace_id = workspace_map.get(record.get("workspace_id"))
+        content_hash = record.get("content_hash")
+        if workspace_id is not None and content_hash and find_shared_copy(db, workspace_id, content_hash):
+            skipped_docs.add(record["id"])  # already in the workspace, as on upload
+            continue
+        doc = Document(
+            name=record["name"],
+            path=record["path"],
+            user_id=user_id,
+            workspace_id=workspace_id,
+            content_hash=content_hash,
+            uploaded_at=datetime.fromisoformat(record["uploaded_at"]) if record.get("uploaded_at") else None,
+        )
+        db.add(doc)
+        db.flush()  # later records in this snapshot can dedupe against it
+        doc_map[record["id"]] = doc
+    db.commit()
+
+    loaded = 0
+    reembedded = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        nonlocal loaded, reembedded
+        if not batch:
+            return
+        batch[:] = [record for record in batch if record["document_id"] not in skipped_docs]
+        rows = []
+        for record in batch:
+            doc = doc_map[record["document_id"]]
+            row = {field: record.get(field) for field in _CHUNK_FIELDS}
+            row["document_id"] = doc.id
+            row["user_id"] = user_id
+            row["workspace_id"] = doc.workspace_id  # 🔒 the document's (mapped) workspace
+            if record.get("row") is None:
+                row["vector_id"] = None  # re-embedded below, under a fresh id
+            rows.append(row)
+
+        # Keep the snapshot's vector ids unless this node already uses them
+        # (e.g. loading a copy into another user on the same node).
+        candidate_ids = [r["vector_id"] for r in rows if r["vector_id"]]
+        taken = set(collection.get(ids=candidate_ids, include=[])["ids"]) if candidate_ids else set()
+        needs_embedding = []
+        for row, record in zip(rows, batch):
+            if row["vector_id"] is None or row["vector_id"] in taken:
+                if row["vector_id"] is None:
+                    needs_embedding.append(row)
+                row["vector_id"] = str(uuid.uuid4())
+
+        db.execute(insert(Chunk), rows)
+        db.commit()
+
+        stored = [(r, rec["row"]) for r, rec in zip(rows, batch) if rec.get("row") is not None]
+        if stored:
+            upsert_chunks(
+                [r["vector_id"] for r, _ in stored],
+                [r["content"] for r, _ in stored],
+                [_row_metadata(r, doc_names) for r, _ in stored],
+                embeddings=embeddings[[row_no for _, row_no in stored]].tolist(),
+                replace=False,
+            )
+            loaded += len(stored)
+        if needs_embedding:
+            # No stored vector (legacy chunk): embedded here
+            upsert_chunks(
+                [r["vector_id"] for r in needs_embedding],
+                [r["content"] for r in needs_embedding],
+                [_row_metadata(r, doc_names) for r in needs_embedding],
+                replace=False,
+            )
+            reembedded += len(needs_embedding)
+        batch.clear()
+
+    doc_names = {doc.id: doc.name for doc in doc_map.values()}
+    start = time.perf_counter()
+    for record in _read_section(path, header["sections"]["chunks"]):
+        batch.append(record)
+        if len(batch) >= _BATCH:
+            flush()
+    flush()
+
+    return {
+        "user_id": user_id,
+        "documents": len(doc_map),
+        "documents_deduplicated": len(skipped_docs),
+        "workspaces": len(workspace_map),
+        "chunks": header["counts"]["chunks"],
+        "vectors_loaded": loaded,
+        "vectors_reembedded": reembedded,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _import_workspaces(db: Session, path: str, header: Dict[str, Any], user_id: int) -> Dict[int, int]:
+    """Snapshot workspace id → workspace id on this node, with memberships restored."""
+    section = header["sections"].get("workspaces")
+    if not section:
+        return {}
+
+    workspace_map: Dict[int, int] = {}
+    for record in _read_section(path, section):
+        workspace = db.query(Workspace).filter(Workspace.id == record["id"]).first()
+        created = workspace is None or workspace.name != record["name"]
+        if created:
+            workspace = Workspace(
+                name=record["name"],
+                created_by=user_id,
+                created_at=datetime.fromisoformat(record["created_at"]) if record.get("created_at") else datetime.utcnow(),
+            )
+            db.add(workspace)
+            db.flush()
+        workspace_map[record["id"]] = workspace.id
+
+        # Members by email; the snapshot's owner maps to the importing user
+        emails = [m["email"] for m in record["members"]]
+        user_ids = dict(db.query(User.email, User.id).filter(User.email.in_(emails))) if emails else {}
+        roles: Dict[int, str] = {}
+        for member in record["members"]:
+            if member["user_id"] == header["user_id"]:
+                roles[user_id] = member["role"]
+            elif member["email"] in user_ids:
+                roles.setdefault(user_ids[member["email"]], member["role"])
+        if created and "owner" not in roles.values():
+            roles[user_id] = "owner"  # a recreated workspace needs someone to manage it
+        existing = {
+            uid for (uid,) in db.query(WorkspaceMember.user_id).filter(WorkspaceMember.workspace_id == workspace.id)
+        }
+        db.add_all(
+            WorkspaceMember(workspace_id=workspace.id, user_id=uid, role=role)
+            for uid, role in roles.items()
+            if uid not in existing
+        )
+    db.commit()
+    return workspace_map
+
+
+def _row_metadata(row: Dict[str, Any], doc_names: Dict[int, str]) -> Dict[str, Any]:
+    return chunk_vector_metadata(Chunk(**row), doc_names.get(row["document_id"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export / import a tenant snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write one user's index to a snapshot file")
+    exp.add_argument("--user-id", type=int, required=True)
+    exp.add_argument("--out", required=True)
+    imp = sub.add_parser("import", help="bulk-load a snapshot file")
+    imp.add_argument("--in", dest="path", required=True)
+    imp.add_argument("--user-id", type=int, default=None, help="load into this user (default: the snapshot's)")
+    imp.add_argument("--replace", action="store_true", help="delete the user's existing documents first")
+    ver = sub.add_parser("verify", help="check a snapshot's checksum and print its header")
+    ver.add_argument("--in", dest="path", required=True)
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        print(json.dumps(read_header(args.path), indent=2))
+        return
+
+    from app.core.db import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "export":
+            result = export_snapshot(db, args.user_id, args.out)
+        else:
+            result = import_snapshot(db, args.path, args.user_id, args.replace)
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# app/core/spreadsheet_extraction.py
+#
+# Streaming, memory-bounded extraction for spreadsheets and CSV files.
+#
+# The workbook is parsed ONCE in openpyxl read-only mode and rows are read
+# lazily; rows are grouped into chunks of at most ROWS_PER_CHUNK rows /
+# MAX_CHUNK_CHARS characters, and every chunk repeats the sheet's header
+# row so it still makes sense on its own when retrieved by RAG.
+# Memory stays proportional to one row group, not to the whole file.
+
+import csv
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROWS_PER_CHUNK = 200
+MAX_CHUNK_CHARS = 8000
+
+# (chunk_text, metadata) — metadata: {"sheet"?, "row_start", "row_end"}
+SheetChunk = Tuple[str, Dict[str, Any]]
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value != value:  # NaN from the pandas .xls path
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value).replace("\n", " ").strip()
+
+
+def _row_line(cells: List[str]) -> str:
+    # drop trailing empty cells (read-only mode pads rows to the sheet width)
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+def _render(sheet_name: Optional[str], header: str, lines: List[str], row_start: int, row_end: int) -> str:
+    title = f"Sheet: {sheet_name} " if sheet_name else ""
+    parts = [f"{title}(rows {row_start}-{row_end})".strip()]
+    if header:
+        parts.append(f"Columns: {header}")
+    parts.extend(lines)
+    return "\n".join(parts)
+
+
+def _row_groups(
+    sheet_name: Optional[str],
+    rows: Iterable[Iterable[Any]],
+    rows_per_chunk: int = ROWS_PER_CHUNK,
+    max_chars: int = MAX_CHUNK_CHARS,
+) -> Iterator[SheetChunk]:
+    """Group a row stream into chunks; the first non-empty row is the header."""
+    header: Optional[str] = None
+    lines: List[str] = []
+    chars = 0
+    row_start = row_end = 0
+
+    def make_chunk() -> SheetChunk:
+        meta: Dict[str, Any] = {"row_start": row_start, "row_end": row_end}
+        if sheet_name:
+            meta["sheet"] = sheet_name
+        return _render(sheet_name, header or "", lines, row_start, row_end), meta
+
+    for row_number, row in enumerate(rows, start=1):
+        line = _row_line([_cell_text(v) for v in row])
+        if not line.replace("|", "").strip():
+            continue
+
+        if header is None:
+            header = line
+            continue
+
+        if not lines:
+            row_start = row_number
+        lines.append(line)
+        chars += len(line) + 1
+        row_end = row_number
+
+        if len(lines) >= rows_per_chunk or chars >= max_chars:
+            yield make_chunk()
+            lines, chars = [], 0
+
+    if lines:
+        yield make_chunk()
+    elif header is not None and row_end == 0:
+        # header-only sheet: still worth indexing the column names
+        row_start = row_end = 1
+        yield make_chunk()
+
+
+def iter_excel_chunks(path: str, rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[SheetChunk]:
+    """Stream row-group chunks from an .xlsx workbook (parsed once, read-only)."""
+    ext = os.path.splitext(path.lower())[1]
+    if ext == ".xls":
+        # Legacy binary format: openpyxl can't read it, fall back to pandas
+        # (still parses the file once and streams rows per sheet).
+        yield from _iter_xls_chunks(path, rows_per_chunk)
+        return
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield from _row_groups(
+                worksheet.title,
+                worksheet.iter_rows(values_only=True),
+                rows_per_chunk,
+            )
+    finally:
+        # read-only workbooks keep the zip file open until closed
+        workbook.close()
+
+
+def _iter_xls_chunks(path: str, rows_per_chunk: int) -> Iterator[SheetChunk]:
+    import pandas as pd
+
+    with pd.ExcelFile(path) as xl_file:
+        for sheet_name in xl_file.sheet_names:
+            df = xl_file.parse(sheet_name, header=None, dtype=object)
+            yield from _row_groups(
+                str(sheet_name),
+                df.itertuples(index=False, name=None),
+                rows_per_chunk,
+            )
+            del df
+
+
+def iter_csv_chunks(path: str, rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[SheetChunk]:
+    """Stream row-group chunks from a CSV file without reading it all into memory."""
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        yield from _row_groups(None, csv.reader(f, dialect), rows_per_chunk)
@@ -0,0 +1,282 @@
+# app/core/summaries.py
+#
+# Document / section summaries, built once per document after ingestion.
+# - `plan_sections` groups a document's chunks (in page order) into sections
+#   of about SUMMARY_SECTION_TOKENS; each section gets a summary of at most
+#   SUMMARY_MAX_TOKENS, and the document gets one built from those
+# - summaries are rows in `document_summaries` + vectors in the
+#   `ops_summaries` Chroma collection (same metadata keys as chunks, plus
+#   level / page_start / page_end), searched by rag.search_hierarchical
+# - SUMMARY_MODE="llm" uses the summarizer prompt; the calls run at "ingest"
+#   priority in the LLM queue, so chat overtakes them. "extractive" (and any
+#   LLM failure) keeps the leading sentences instead
+# - uploads schedule the build on a single background thread; deleting
+#   chunks schedules a rebuild, deleting the document deletes its summaries
+#
+# Run by hand from backend/:
+#   python -m app.core.summaries backfill [--user-id N]
+#   python -m app.core.summaries rebuild --document-id N
+
+import argparse
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.chunks import estimate_tokens
+from app.core.llm_scheduler import llm_flow
+from app.core.prompts import get_template
+from app.core.rag import add_summary_vectors, delete_summary_vectors
+from app.core.workspaces import visible_to
+from app.models.db_models import Chunk, Document, DocumentSummary
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# One background builder: summaries are a bulk, low-priority job
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summaries")
+
+
+# ==================== BUILDING ====================
+
+def plan_sections(chunks: List[Chunk]) -> List[List[Chunk]]:
+    """Consecutive chunks (page order) grouped up to SUMMARY_SECTION_TOKENS each."""
+    ordered = sorted(chunks, key=lambda c: (c.page if c.page is not None else -1, c.char_start or 0))
+    sections: List[List[Chunk]] = []
+    current: List[Chunk] = []
+    tokens = 0
+    for chunk in ordered:
+        size = chunk.token_count or estimate_tokens(chunk.content)
+        if current and tokens + size > settings.SUMMARY_SECTION_TOKENS:
+            sections.append(current)
+            current, tokens = [], 0
+        current.append(chunk)
+        tokens += size
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _extractive(text: str, max_tokens: int) -> str:
+    """Leading sentences up to max_tokens."""
+    out: List[str] = []
+    used = 0
+    for sentence in _SENTENCE_RE.split(" ".join(text.split())):
+        size = estimate_tokens(sentence)
+        if out and used + size > max_tokens:
+            break
+        out.append(sentence)
+        used += size
+    return " ".join(out)[: max_tokens * 4]
+
+
+def summarize(text: str) -> str:
+    """SUMMARY_MAX_TOKENS summary of text (LLM, or extractive as configured / on failure)."""
+    max_tokens = settings.SUMMARY_MAX_TOKENS
+    if settings.SUMMARY_MODE == "llm":
+        from app.agents.graph import get_llm_client
+
+        words = max(20, int(max_tokens * 0.75))
+        try:
+            summary = get_llm_client().chat([
+                {"role": "system", "content": get_template("summarizer").text},
+                {"role": "user", "content": f"Summarize in at most {words} words.\n\n{text}"},
+            ]).strip()
+            if summary:
+                return summary[: max_tokens * 4]
+        except Exception as e:
+            print(f"⚠️ LLM summary failed, using extractive summary: {e}")
+    return _extractive(text, max_tokens)
+
+
+def delete_summaries(db: Session, document_id: int) -> int:
+    """Delete a document's summary rows and vectors. Returns rows deleted."""
+    deleted = (
+        db.query(DocumentSummary)
+        .filter(DocumentSummary.document_id == document_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    try:
+        delete_summary_vectors(document_id=document_id)
+    except Exception as e:
+        print(f"⚠️ Summary vector delete for document {document_id} failed: {e}")
+    return deleted
+
+
+def build_summaries(db: Session, document_id: int) -> Dict[str, Any]:
+    """
+    🔒 (Re)build the summaries of one document, owned by the document's user.
+    Returns counts plus the tokens summarized vs. the tokens of the summaries.
+    """
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if doc is None:
+        return {"document_id": document_id, "sections": 0, "skipped": "document not found"}
+
+    delete_summaries(db, document_id)
+    chunks = db.query(Chunk).filter(Chunk.document_id == document_id).all()
+    if not chunks:
+        return {"document_id": document_id, "sections": 0}
+
+    source = chunks[0].source
+    rows: List[DocumentSummary] = []
+    for section in plan_sections(chunks):
+        pages = [c.page for c in section if c.page is not None]
+        text = "\n\n".join(c.content for c in section)
+        rows.append(DocumentSummary(
+            document_id=document_id,
+            user_id=doc.user_id,  # 🔒 same owner (and workspace) as the chunks
+            workspace_id=doc.workspace_id,
+            level="section",
+            page_start=min(pages) if pages else None,
+            page_end=max(pages) if pages else None,
+            content=summarize(text),
+            source_tokens=sum(c.token_count or estimate_tokens(c.content) for c in section),
+        ))
+
+    # Document level: a summary of the section summaries. A one-section
+    # document keeps only this row (its section summary would be identical
+    # and show up twice in the context)
+    sections = len(rows)
+    if sections == 1:
+        rows[0].level = "document"
+    else:
+        rows.insert(0, DocumentSummary(
+            document_id=document_id,
+            user_id=doc.user_id,
+            workspace_id=doc.workspace_id,
+            level="document",
+            content=summarize("\n\n".join(r.content for r in rows)),
+            source_tokens=sum(r.source_tokens for r in rows),
+        ))
+
+    metadatas = []
+    for row in rows:
+        row.token_count = estimate_tokens(row.content)
+        meta = {
+            "document_id": document_id,
+            "user_id": doc.user_id,  # 🔒 USER ISOLATION
+            "filename": doc.name,
+            "level": row.level,
+        }
+        if doc.workspace_id is not None:
+            meta["workspace_id"] = doc.workspace_id
+        if source:
+            meta["source"] = source
+        if row.page_start is not None:
+            meta["page_start"] = row.page_start
+            meta["page_end"] = row.page_end
+        metadatas.append(meta)
+
+    vector_ids = add_summary_vectors([r.content for r in rows], metadatas)
+    for row, vector_id in zip(rows, vector_ids):
+        row.vector_id = vector_id
+        db.add(row)
+    db.commit()
+
+    return {
+        "document_id": document_id,
+        "sections": sections,
+        "source_tokens": rows[0].source_tokens,
+        "summary_tokens": sum(r.token_count for r in rows),
+    }
+
+
+def _build_in_background(document_id: int, user_id: Optional[int]) -> None:
+    from app.core.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with llm_flow("ingest", user_id):
+            result = build_summaries(db, document_id)
+        print(f"✅ Summaries for document {document_id}: {result.get('sections', 0)} sections")
+    except Exception as e:
+        print(f"⚠️ Summaries for document {document_id} failed: {e}")
+    finally:
+        db.close()
+
+
+def schedule_summaries(document_id: int, user_id: Optional[int] = None) -> None:
+    """Build a document's summaries in the background (no-op when disabled)."""
+    if settings.SUMMARIES_ENABLED:
+        _executor.submit(_build_in_background, document_id, user_id)
+
+
+def unsummarized_document_ids(
+    db: Session,
+    user_id: int,
+    document_ids: Optional[List[int]] = None,
+    sources: Optional[List[str]] = None,
+    workspace_ids: Optional[List[int]] = None,
+) -> List[int]:
+    """
+    🔒 Documents in scope that have chunks but no document-level summary yet
+    (not backfilled, still queued, being rebuilt). Hierarchical search
+    searches these flat, since stage 1 cannot reach them.
+    """
+    if document_ids is not None and not document_ids:
+        return []
+
+    has_chunks = exists().where(
+        Chunk.document_id == Document.id,
+        Chunk.user_id == Document.user_id,  # ix_chunks_user_document
+    )
+    if sources:
+        has_chunks = has_chunks.where(Chunk.source.in_(sources))
+    summarized = db.query(DocumentSummary.document_id).filter(DocumentSummary.level == "document")
+
+    query = db.query(Document.id).filter(
+        visible_to(Document.user_id, Document.workspace_id, user_id, workspace_ids or []),  # 🔒 USER ISOLATION
+        has_chunks,
+        ~Document.id.in_(summarized),
+    )
+    if document_ids is not None:
+        query = query.filter(Document.id.in_(document_ids))
+    return [did for (did,) in query.order_by(Document.id)]
+
+
+def backfill(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """Build summaries for documents that have chunks but no summaries yet."""
+    summarized = db.query(DocumentSummary.document_id).distinct()
+    query = db.query(Document).filter(~Document.id.in_(summarized))
+    if user_id is not None:
+        query = query.filter(Document.user_id == user_id)
+
+    built = 0
+    for doc in query.all():
+        with llm_flow("ingest", doc.user_id):
+            result = build_summaries(db, doc.id)
+        if result.get("sections"):
+            built += 1
+            print(f"✅ {doc.name}: {result['sections']} sections")
+    return {"documents_summarized": built}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Document / section summaries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("backfill", help="summarize documents that have no summaries")
+    fill.add_argument("--user-id", type=int)
+    rebuild = sub.add_parser("rebuild", help="rebuild one document's summaries")
+    rebuild.add_argument("--document-id", type=int, required=True)
+    args = parser.parse_args()
+
+    from app.core.db import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            result = backfill(db, user_id=args.user_id)
+        else:
+            result = build_summaries(db, args.document_id)
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
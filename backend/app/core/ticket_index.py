@@ -0,0 +1,208 @@
+# app/core/ticket_index.py
+#
+# Ticket similarity index used for duplicate detection at creation time.
+# - one Chroma collection PER USER ("ops_tickets_u{user_id}"), so a lookup
+#   only walks that tenant's HNSW graph and stays fast as other tenants grow
+# - maintained incrementally: upsert on create and when a description changes
+#   (duplicate reports merged into a ticket), metadata update on status /
+#   severity change
+# - `sync_user_index` reconciles a user's index with SQL: indexes missing
+#   tickets (e.g. created before this index existed, or a failed update),
+#   re-embeds entries whose text changed (text_hash metadata), fixes
+#   status/severity and removes tickets that no longer exist. It runs for
+#   every user on each compaction run (app/core/maintenance.py), never inside
+#   a lookup, so ticket creation only pays for the query itself
+
+import hashlib
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.rag import get_client, get_embedding_function
+from app.models.db_models import Ticket
+from app.models.user import User
+
+# Only the start of long descriptions matters for "is this the same issue?"
+_MAX_DESCRIPTION_CHARS = 1000
+
+
+def _collection_name(user_id: int) -> str:
+    return f"ops_tickets_u{user_id}"
+
+
+def get_ticket_collection(user_id: int):
+    """🔒 Per-user ticket collection."""
+    return get_client().get_or_create_collection(
+        name=_collection_name(user_id),
+        metadata={"hnsw:space": "cosine"},
+        embedding_function=get_embedding_function(),
+    )
+
+
+def ticket_text(title: str, description: str) -> str:
+    return f"{title}\n{(description or '')[:_MAX_DESCRIPTION_CHARS]}"
+
+
+def _text_hash(ticket: Ticket) -> str:
+    return hashlib.sha1(ticket_text(ticket.title, ticket.description).encode("utf-8")).hexdigest()
+
+
+def _metadata(ticket: Ticket) -> Dict[str, Any]:
+    return {
+        "ticket_id": ticket.id,
+        "status": ticket.status,
+        "severity": ticket.severity,
+        "text_hash": _text_hash(ticket),
+    }
+
+
+def index_tickets(tickets: Iterable[Ticket]) -> None:
+    """Upsert tickets (any number of users) into their per-user indexes."""
+    by_user: Dict[int, List[Ticket]] = {}
+    for t in tickets:
+        by_user.setdefault(t.user_id, []).append(t)
+
+    for user_id, user_tickets in by_user.items():
+        get_ticket_collection(user_id).upsert(
+            ids=[str(t.id) for t in user_tickets],
+            documents=[ticket_text(t.title, t.description) for t in user_tickets],
+            metadatas=[_metadata(t) for t in user_tickets],
+        )
+
+
+def update_ticket_metadata(tickets: Iterable[Ticket]) -> None:
+    """Status/severity changed: update metadata only, no re-embedding (missing entries are indexed)."""
+    by_user: Dict[int, List[Ticket]] = {}
+    for t in tickets:
+        by_user.setdefault(t.user_id, []).append(t)
+
+    for user_id, user_tickets in by_user.items():
+        collection = get_ticket_collection(user_id)
+        known = set(collection.get(ids=[str(t.id) for t in user_tickets], include=[])["ids"])
+        present = [t for t in user_tickets if str(t.id) in known]
+        missing = [t for t in user_tickets if str(t.id) not in known]
+        if present:
+            collection.update(
+                ids=[str(t.id) for t in present],
+                metadatas=[_metadata(t) for t in present],
+            )
+        if missing:
+            index_tickets(missing)
+
+
+def sync_user_index(db: Session, user_id: int, batch_size: int = 500) -> Dict[str, int]:
+    """
+    🔒 Reconcile the user's index with their tickets in SQL: index missing
+    tickets, re-embed changed texts, update stale status/severity and remove
+    entries whose ticket is gone. Returns counts per action.
+    """
+    collection = get_ticket_collection(user_id)
+    counts = {"added": 0, "reembedded": 0, "metadata_updated": 0, "removed": 0}
+    in_sql: Set[str] = set()
+    last_id = 0
+
+    while True:
+        batch = (
+            db.query(Ticket)
+            .filter(Ticket.user_id == user_id, Ticket.id > last_id)  # 🔒 USER ISOLATION
+            .order_by(Ticket.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        in_sql.update(str(t.id) for t in batch)
+
+        stored = collection.get(ids=[str(t.id) for t in batch], include=["metadatas"])
+        known = dict(zip(stored["ids"], stored["metadatas"]))
+        reindex: List[Ticket] = []
+        relabel: List[Ticket] = []
+        for t in batch:
+            meta = known.get(str(t.id))
+            if meta is None:
+                counts["added"] += 1
+                reindex.append(t)
+            elif meta.get("text_hash") != _text_hash(t):
+                counts["reembedded"] += 1
+                reindex.append(t)
+            elif (meta.get("status"), meta.get("severity")) != (t.status, t.severity):
+                relabel.append(t)
+        if reindex:
+            index_tickets(reindex)
+        if relabel:
+            collection.update(ids=[str(t.id) for t in relabel], metadatas=[_metadata(t) for t in relabel])
+            counts["metadata_updated"] += len(relabel)
+
+    offset = 0
+    while True:
+        ids = collection.get(include=[], limit=batch_size, offset=offset)["ids"]
+        if not ids:
+            break
+        gone = [vid for vid in ids if vid not in in_sql]
+        if gone:
+            collection.delete(ids=gone)
+            counts["removed"] += len(gone)
+        offset += len(ids) - len(gone)
+
+    return counts
+
+
+def sync_all_indexes(db: Session) -> Dict[str, int]:
+    """sync_user_index for every user (compaction)."""
+    totals = {"added": 0, "reembedded": 0, "metadata_updated": 0, "removed": 0}
+    for (user_id,) in db.query(User.id).order_by(User.id):
+        for key, value in sync_user_index(db, user_id).items():
+            totals[key] += value
+    return totals
+
+
+def find_similar_tickets(
+    user_id: int,
+    title: str,
+    description: str,
+    k: Optional[int] = None,
+    max_distance: Optional[float] = None,
+    only_open: bool = True,
+) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    🔒 Nearest-neighbour lookup over the user's own tickets.
+    Returns (matches, elapsed_ms); matches are sorted by distance and look like
+    {"ticket_id", "status", "severity", "distance"}.
+    """
+    k = k or settings.TICKET_SIMILAR_TOP_K
+    max_distance = settings.TICKET_SIMILAR_MAX_DISTANCE if max_distance is None else max_distance
+
+    start = time.perf_counter()
+    collection = get_ticket_collection(user_id)
+
+    count = collection.count()
+    if count == 0:
+        return [], (time.perf_counter() - start) * 1000
+
+    results = collection.query(
+        query_texts=[ticket_text(title, description)],
+        n_results=min(k, count),
+        where={"status": {"$ne": "closed"}} if only_open else None,
+        include=["metadatas", "distances"],
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    matches: List[Dict[str, Any]] = []
+    for meta, distance in zip(results["metadatas"][0], results["distances"][0]):
+        if distance > max_distance:
+            continue
+        matches.append({
+            "ticket_id": int(meta["ticket_id"]),
+            "status": meta.get("status"),
+            "severity": meta.get("severity"),
+            "distance": round(float(distance), 4),
+        })
+
+    return matches, elapsed_ms
+
+
+def within_budget(elapsed_ms: float) -> bool:
+    return elapsed_ms <= settings.TICKET_DEDUP_BUDGET_MS
@@ -0,0 +1,303 @@
+# app/core/tickets.py
+#
+# Shared ticket query path used by both the REST API (app/api/tickets.py)
+# and the chat graph (app/agents/graph.py), so filters behave the same
+# everywhere and always run in SQL.
+#
+# Listing uses keyset (cursor) pagination on (created_at DESC, id DESC),
+# which is served by the (user_id, status, created_at) / (user_id, created_at)
+# indexes on the tickets table instead of OFFSET scans.
+
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, Query
+
+from app.core import ticket_index
+from app.models.db_models import Ticket
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+TICKET_STATUSES = ("open", "in_progress", "closed")
+TICKET_SEVERITIES = ("low", "medium", "high", "critical")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def normalize_status(value: Optional[str]) -> Optional[str]:
+    """'In Progress' / 'in-progress' → 'in_progress'; empty → None."""
+    if not value:
+        return None
+    return value.strip().lower().replace("-", "_").replace(" ", "_") or None
+
+
+def normalize_severity(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return value.strip().lower() or None
+
+
+def encode_cursor(ticket: Ticket) -> str:
+    raw = f"{ticket.created_at.isoformat()}|{ticket.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, ticket_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def filtered_tickets(
+    db: Session,
+    user_id: int,
+    status: Optional[List[str]] = None,
+    severity: Optional[List[str]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> Query:
+    """🔒 Base USER-SCOPED ticket query with optional server-side filters."""
+    query = db.query(Ticket).filter(Ticket.user_id == user_id)  # 🔒 USER ISOLATION
+
+    statuses = [s for s in (normalize_status(v) for v in status or []) if s]
+    if statuses:
+        query = query.filter(Ticket.status.in_(statuses))
+
+    severities = [s for s in (normalize_severity(v) for v in severity or []) if s]
+    if severities:
+        query = query.filter(Ticket.severity.in_(severities))
+
+    if created_after is not None:
+        query = query.filter(Ticket.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(Ticket.created_at < created_before)
+
+    return query
+
+
+def list_tickets_page(
+    db: Session,
+    user_id: int,
+    status: Optional[List[str]] = None,
+    severity: Optional[List[str]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[List[Ticket], Optional[str]]:
+    """
+    Return one page of tickets (newest first) and the cursor for the next page.
+    next_cursor is None when there are no more results.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = filtered_tickets(
+        db, user_id, status, severity, created_after, created_before
+    )
+
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                Ticket.created_at < cursor_created_at,
+                and_(Ticket.created_at == cursor_created_at, Ticket.id < cursor_id),
+            )
+        )
+
+    # Fetch one extra row to know whether another page exists
+    rows = (
+        query.order_by(Ticket.created_at.desc(), Ticket.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+
+    return rows, next_cursor
+
+
+def count_tickets(
+    db: Session,
+    user_id: int,
+    status: Optional[List[str]] = None,
+    severity: Optional[List[str]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> int:
+    return (
+        filtered_tickets(db, user_id, status, severity, created_after, created_before)
+        .order_by(None)
+        .count()
+    )
+
+
+# ---------- SIMILARITY INDEX MAINTENANCE ----------
+
+
+def sync_ticket_index(tickets: List[Ticket], created: bool) -> None:
+    """
+    Keep the per-user ticket similarity index in step with SQL.
+    created=True (re)embeds the tickets: new tickets and changed descriptions;
+    otherwise only status/severity metadata is updated.
+    Best effort: the SQL write already succeeded, so an index failure is
+    logged and repaired by ticket_index.sync_user_index (next compaction).
+    """
+    if not tickets:
+        return
+    try:
+        if created:
+            ticket_index.index_tickets(tickets)
+        else:
+            ticket_index.update_ticket_metadata(tickets)
+    except Exception as e:
+        print(f"Ticket index update failed: {e}")
+
+
+# ---------- BULK OPERATIONS ----------
+
+MAX_BULK_ITEMS = 1000
+
+
+def _validate_fields(status: Optional[str], severity: Optional[str]) -> Optional[str]:
+    """Return an error message for an unknown status/severity, else None."""
+    if status is not None and status not in TICKET_STATUSES:
+        return f"Unknown status {status!r}; expected one of {', '.join(TICKET_STATUSES)}"
+    if severity is not None and severity not in TICKET_SEVERITIES:
+        return f"Unknown severity {severity!r}; expected one of {', '.join(TICKET_SEVERITIES)}"
+    return None
+
+
+def _reload(db: Session, ids: List[int]) -> None:
+    """Refresh committed (expired) tickets with one IN query instead of N refreshes."""
+    for start in range(0, len(ids), 500):
+        db.query(Ticket).filter(Ticket.id.in_(ids[start:start + 500])).all()
+
+
+def create_tickets(db: Session, user_id: int, items: List[dict]) -> List[dict]:
+    """
+    🔒 Create many tickets for one user in a single transaction.
+    items: [{"title", "description", "severity"}]
+    Returns one result per item, in order: {"index", "id", "ok", "ticket" | "error"}.
+    """
+    results: List[dict] = []
+    created: List[Tuple[int, Ticket]] = []
+
+    for idx, item in enumerate(items):
+        severity = normalize_severity(item.get("severity")) or "medium"
+        error = _validate_fields(None, severity)
+        if error:
+            results.append({"index": idx, "ok": False, "error": error})
+            continue
+
+        ticket = Ticket(
+            title=item["title"],
+            description=item["description"],
+            severity=severity,
+            status="open",
+            user_id=user_id,  # 🔒 USER ISOLATION
+        )
+        db.add(ticket)
+        created.append((idx, ticket))
+        results.append({"index": idx, "ok": True, "ticket": ticket})
+
+    if created:
+        db.flush()  # assigns ids
+        created_ids = [ticket.id for _, ticket in created]
+        db.commit()
+        _reload(db, created_ids)
+        for idx, ticket in created:
+            results[idx]["id"] = ticket.id
+        sync_ticket_index([ticket for _, ticket in created], created=True)
+
+    return results
+
+
+def update_tickets(
+    db: Session,
+    user_id: int,
+    updates: List[dict],
+    all_or_nothing: bool = False,
+) -> List[dict]:
+    """
+    🔒 Apply many status/severity updates for one user in a single transaction.
+    updates: [{"id", "status", "severity"}] (status/severity optional)
+
+    All targeted tickets are loaded with one IN query and written with one commit.
+    Returns one result per item, in order: {"index", "id", "ok", "ticket" | "error"}.
+    With all_or_nothing=True, any failed item rolls back the whole batch.
+    """
+    ids = {int(u["id"]) for u in updates}
+    tickets = {}
+    if ids:
+        tickets = {
+            t.id: t
+            for t in db.query(Ticket)
+            .filter(Ticket.user_id == user_id, Ticket.id.in_(ids))  # 🔒 USER ISOLATION
+            .all()
+        }
+
+    results: List[dict] = []
+    changed: List[Ticket] = []
+
+    for idx, update in enumerate(updates):
+        ticket_id = int(update["id"])
+        status = normalize_status(update.get("status"))
+        severity = normalize_severity(update.get("severity"))
+
+        ticket = tickets.get(ticket_id)
+        if ticket is None:
+            results.append({
+                "index": idx,
+                "id": ticket_id,
+                "ok": False,
+                "not_found": True,
+                "error": f"Ticket #{ticket_id} was not found or does not belong to you.",
+            })
+            continue
+
+        error = _validate_fields(status, severity)
+        if error is None and not (status or severity):
+            error = "No new status or severity provided."
+        if error:
+            results.append({"index": idx, "id": ticket_id, "ok": False, "error": error})
+            continue
+
+        if status:
+            ticket.status = status
+        if severity:
+            ticket.severity = severity
+        changed.append(ticket)
+        results.append({"index": idx, "id": ticket_id, "ok": True, "ticket": ticket})
+
+    failed = any(not r["ok"] for r in results)
+    if all_or_nothing and failed:
+        db.rollback()
+        for r in results:
+            if r["ok"]:
+                r.update(ok=False, error="Rolled back: another item in the batch failed.")
+                r.pop("ticket", None)
+        return results
+
+    if changed:
+        changed_ids = [ticket.id for ticket in changed]
+        db.commit()
+        _reload(db, changed_ids)
+        sync_ticket_index(changed, created=False)
+
+    return results
+
+
+def close_tickets(db: Session, user_id: int, ticket_ids: List[int]) -> List[dict]:
+    """🔒 Close many tickets in one transaction (shortcut for update_tickets)."""
+    return update_tickets(db, user_id, [{"id": tid, "status": "closed"} for tid in ticket_ids])
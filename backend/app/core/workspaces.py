@@ -0,0 +1,87 @@
+# app/core/workspaces.py
+#
+# Workspaces: documents shared by a team, embedded once.
+# - a document with workspace_id set is visible to its uploader AND to every
+#   member of that workspace; its chunk rows and vectors carry the
+#   workspace_id, so retrieval filters on
+#   `user_id = me OR workspace_id IN (my workspaces)` in SQL and in Chroma
+# - membership is read from `workspace_members` on every request, so removing
+#   a member revokes access immediately (nothing is cached in tokens)
+# - an upload whose file hash already exists in the workspace is not
+#   re-ingested; the existing document is returned instead
+
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models.db_models import Document, WorkspaceMember
+
+ROLES = ("owner", "member")
+
+
+def member_workspace_ids(db: Session, user_id: int) -> List[int]:
+    """🔒 Workspaces the user belongs to."""
+    return [
+        wid for (wid,) in db.query(WorkspaceMember.workspace_id)
+        .filter(WorkspaceMember.user_id == user_id)
+        .order_by(WorkspaceMember.workspace_id)
+    ]
+
+
+def get_membership(db: Session, workspace_id: int, user_id: int) -> Optional[WorkspaceMember]:
+    return (
+        db.query(WorkspaceMember)
+        .filter(WorkspaceMember.workspace_id == workspace_id, WorkspaceMember.user_id == user_id)
+        .first()
+    )
+
+
+def require_member(db: Session, workspace_id: int, user_id: int, role: Optional[str] = None) -> WorkspaceMember:
+    """
+    🔒 The user's membership of a workspace, or 404 (not a member: the
+    workspace's existence is not revealed) / 403 (member without the role).
+    """
+    membership = get_membership(db, workspace_id, user_id)
+    if membership is None:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    if role is not None and membership.role != role:
+        raise HTTPException(status_code=403, detail=f"Requires workspace role '{role}'")
+    return membership
+
+
+def visible_to(column_user_id, column_workspace_id, user_id: int, workspace_ids: List[int]):
+    """🔒 SQL filter: rows the user owns or that are shared into one of their workspaces."""
+    if not workspace_ids:
+        return column_user_id == user_id
+    return or_(column_user_id == user_id, column_workspace_id.in_(workspace_ids))
+
+
+def visible_documents(db: Session, user_id: int, workspace_ids: Optional[List[int]] = None):
+    """🔒 Query over the documents the user can read."""
+    if workspace_ids is None:
+        workspace_ids = member_workspace_ids(db, user_id)
+    return db.query(Document).filter(
+        visible_to(Document.user_id, Document.workspace_id, user_id, workspace_ids)
+    )
+
+
+def can_modify(db: Session, doc: Document, user_id: int) -> bool:
+    """Uploader, or an owner of the workspace the document is shared into."""
+    if doc.user_id == user_id:
+        return True
+    if doc.workspace_id is None:
+        return False
+    membership = get_membership(db, doc.workspace_id, user_id)
+    return membership is not None and membership.role == "owner"
+
+
+def find_shared_copy(db: Session, workspace_id: int, content_hash: str) -> Optional[Document]:
+    """An already-ingested document in the workspace with the same file hash."""
+    return (
+        db.query(Document)
+        .filter(Document.workspace_id == workspace_id, Document.content_hash == content_hash)
+        .order_by(Document.id)
+        .first()
+    )
@@ -1,4 +1,2 @@
-from sqlalchemy.orm import declarative_base
-
-Base = declarative_base()
- 
+# Kept for backwards compatibility: all models share the Base from app.core.db.
+from app.core.db import Base  # noqa: F401
@@ -1,23 +1,2 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-DATABASE_URL = "sqlite:///./opscopilot.db"
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
-
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-  
+# Kept for backwards compatibility: the app uses ONE engine, defined in app.core.db.
+from app.core.db import DATABASE_URL, engine, SessionLocal, get_db  # noqa: F401
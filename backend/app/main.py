@@ -6,6 +6,7 @@ from app.api import chat
 from app.api import documents
 from app.api import tickets
 from app.api import auth
+from app.api import workspaces
 
 app = FastAPI(title="OpsCopilot Backend", version="0.1.0")
 
@@ -27,10 +28,42 @@ def startup_event():
     init_db()
     print("✅ Database initialized!")
 
+    # Heavy clients are built here, once per worker, instead of at import time
+    # (so `import app.main` and test collection stay fast).
+    from app.core.rag import get_client
+    from app.agents.graph import get_compiled_graph, get_llm_client
+
+    get_client()
+    get_llm_client()
+    get_compiled_graph()
+    print("✅ Vector store, LLM client and agent graph ready!")
+
+    from app.config import settings
+
+    if settings.INDEX_SERVICE_URL:
+        # Compaction runs once, in the index service
+        print(f"✅ Using index service at {settings.INDEX_SERVICE_URL}")
+    else:
+        from app.core.maintenance import start_compaction
+
+        start_compaction()
+    if settings.CHROMA_SERVER_URL and settings.VECTOR_STORE_MODE.lower() == "int8":
+        print("⚠️ VECTOR_STORE_MODE=int8 is per process; ignored with CHROMA_SERVER_URL")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    from app.core.maintenance import stop_compaction
+    from app.core.pdf_extraction import shutdown_pool
+
+    stop_compaction()
+    shutdown_pool()
+
 # Routers
 app.include_router(chat.router, prefix="/api")
 app.include_router(documents.router, prefix="/api")
 app.include_router(tickets.router, prefix="/api")
+app.include_router(workspaces.router, prefix="/api")
 app.include_router(auth.router)
 
 
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, UniqueConstraint, text
 from sqlalchemy.sql import func
+from datetime import datetime
 from app.core.db import Base
 
 
@@ -13,6 +14,42 @@ class Document(Base):
 
     # 🔐 multi-tenant ownership
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Shared with every member of this workspace (NULL = private to user_id)
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True)
+    # sha256 of the uploaded file; a workspace keeps one copy per hash
+    content_hash = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index("ix_documents_workspace_hash", "workspace_id", "content_hash"),
+    )
+
+
+class Workspace(Base):
+    """A team's shared knowledge: its documents are embedded once, for all members."""
+    __tablename__ = "workspaces"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    # NULL for workspaces created by the duplicate-folding migration
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class WorkspaceMember(Base):
+    __tablename__ = "workspace_members"
+
+    id = Column(Integer, primary_key=True, index=True)
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # owner (manages members, deletes any shared document) | member
+    role = Column(String, nullable=False, default="member")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "user_id", name="uq_workspace_members_workspace_user"),
+        # Membership lookup on every retrieval: WHERE user_id = ?
+        Index("ix_workspace_members_user", "user_id"),
+    )
 
 
 class Chunk(Base):
@@ -21,10 +58,70 @@ class Chunk(Base):
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     content = Column(Text, nullable=False)
+    page = Column(Integer, nullable=True)
+    # pdf | excel | csv | word | text | image
+    source = Column(String, nullable=True)
+    # Offsets of this chunk within the document's extracted text
+    char_start = Column(Integer, nullable=True)
+    char_end = Column(Integer, nullable=True)
+    token_count = Column(Integer, nullable=True)
+    # sha256 of content
+    content_hash = Column(String(64), nullable=True, index=True)
+    # Chroma id of this chunk's vector (NULL for chunks ingested before ids were recorded)
+    vector_id = Column(String, nullable=True, index=True)
+    # Source-specific extras only (sheet, row range, ocr flag), as JSON
     meta_json = Column(Text, nullable=True)
 
     # 🔐 multi-tenant ownership (IMPORTANT for RAG)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Copied from the document, so prefilters stay single-table
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True)
+
+    __table_args__ = (
+        # Retrieval prefilters: WHERE user_id = ? AND source IN (...) / document_id IN (...)
+        Index("ix_chunks_user_source", "user_id", "source"),
+        Index("ix_chunks_user_document", "user_id", "document_id"),
+        # ... OR workspace_id IN (...)
+        Index("ix_chunks_workspace_document", "workspace_id", "document_id"),
+        # Native full-text index on Postgres; skipped on SQLite.
+        Index(
+            "ix_chunks_content_fts",
+            text("to_tsvector('english', content)"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class DocumentSummary(Base):
+    """
+    Summary layer over a document's chunks, built once after ingestion
+    (app/core/summaries.py): one "document" row plus one "section" row per run
+    of consecutive pages (a one-section document only has the "document" row). Embedded in the `ops_summaries` Chroma collection
+    for the first stage of hierarchical retrieval.
+    """
+    __tablename__ = "document_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    # document | section
+    level = Column(String, nullable=False)
+    # Pages covered (inclusive); section retrieval narrows chunks to this range
+    page_start = Column(Integer, nullable=True)
+    page_end = Column(Integer, nullable=True)
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=True)
+    # Tokens of the chunks this summarizes (what reading them instead would cost)
+    source_tokens = Column(Integer, nullable=True)
+    vector_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 🔐 multi-tenant ownership
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_document_summaries_user_document", "user_id", "document_id"),
+    )
 
 
 class Ticket(Base):
@@ -35,7 +132,15 @@ class Ticket(Base):
     description = Column(Text, nullable=False)
     status = Column(String, nullable=False, default="open")
     severity = Column(String, nullable=False, default="medium")
-    created_at = Column(DateTime, default=func.now())
+    # Python-side default so SQLite stores full-precision timestamps that compare
+    # correctly against bound datetimes (keyset pagination relies on this).
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     # 🔐 ticket belongs to a user
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        # Listing: WHERE user_id = ? [AND status IN (...)] ORDER BY created_at DESC
+        Index("ix_tickets_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_tickets_user_created", "user_id", "created_at"),
+    )
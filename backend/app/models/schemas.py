@@ -1,7 +1,7 @@
 # app/models/schemas.py
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 class TicketCreate(BaseModel):
@@ -22,11 +22,107 @@ class TicketOut(BaseModel):
         from_attributes = True  # pydantic v2 equivalent of orm_mode = True
 
 
+# One page of a keyset-paginated ticket listing
+class TicketPage(BaseModel):
+    items: List[TicketOut]
+    # Pass back as ?cursor=... to get the next page; None means last page
+    next_cursor: Optional[str] = None
+
+
+class TicketCount(BaseModel):
+    count: int
+
+
+# ---------- Ticket updates / bulk operations ----------
+
+class TicketUpdate(BaseModel):
+    status: Optional[str] = None
+    severity: Optional[str] = None
+
+
+class TicketBulkUpdateItem(TicketUpdate):
+    id: int
+
+
+class TicketBulkCreate(BaseModel):
+    items: List[TicketCreate]
+
+
+class TicketBulkUpdate(BaseModel):
+    items: List[TicketBulkUpdateItem]
+    # If True, any failed item rolls back the whole batch
+    all_or_nothing: bool = False
+
+
+class TicketBulkClose(BaseModel):
+    ids: List[int]
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+    ticket: Optional[TicketOut] = None
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+# ---------- Workspaces ----------
+
+class WorkspaceCreate(BaseModel):
+    name: str
+
+
+class WorkspaceMemberAdd(BaseModel):
+    email: str
+    role: str = "member"  # owner | member
+
+
+# Optional retrieval scope for /api/chat
+class ChatScope(BaseModel):
+    document_ids: List[int] | None = None
+    # pdf | excel | csv | word | text | image ("spreadsheet" = excel + csv)
+    sources: List[str] | None = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+
 # NEW: TraceStep model for frontend
 class TraceStep(BaseModel):
     node: str
     description: str
     doc_ids: List[int] | None = None
+    # Retrieved / reused passages (chunks.id)
+    chunk_ids: List[int] | None = None
+    similar_tickets: List[Dict[str, Any]] | None = None
+    scope: Dict[str, Any] | None = None
+    context_tokens: int | None = None
+    # Hierarchical retrieval: sections the chunk search was narrowed to
+    sections: int | None = None
+    # LLM calls: prompt size and the part served from the provider's cache
+    prompt_tokens: int | None = None
+    cached_tokens: int | None = None
+
+
+# One numbered passage given to the answer. Send an answer's citations back
+# as ChatRequest.citations so a follow-up question can reuse them.
+class Citation(BaseModel):
+    marker: int  # [n] in the prompt / answer
+    cited: bool = False  # the answer references [n]
+    id: str  # vector id
+    kind: str = "chunk"  # chunk | summary
+    chunk_id: Optional[int] = None
+    document_id: Optional[int] = None
+    page: Optional[int] = None
+    page_end: Optional[int] = None  # summaries: last page covered
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+    distance: Optional[float] = None  # retrieval score, lower = closer
 
 
 # Existing model for conversation messages (assuming it was missing but required by ChatResponse)
@@ -42,4 +138,5 @@ class ChatResponse(BaseModel):
     # Assuming this should use MessageSchema for strong typing,
     # but based on current usage (List[Dict[str, str]]), we'll use that for consistency
     conversation: List[Dict[str, str]]  # Updated conversation
-    trace: List[TraceStep] | None = None
\ No newline at end of file
+    trace: List[TraceStep] | None = None
+    citations: List[Citation] = []
\ No newline at end of file
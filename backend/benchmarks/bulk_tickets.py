@@ -0,0 +1,78 @@
+# benchmarks/bulk_tickets.py
+#
+# 500 ticket updates: one PATCH /api/tickets/{id} per ticket vs ONE
+# PATCH /api/tickets/bulk call. Runs the real FastAPI app in-process
+# (TestClient) against a throwaway SQLite database.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bulk_tickets --tickets 500
+
+import argparse
+import os
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+# Must be set before the app (and its engine) is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Single vs bulk ticket update benchmark")
+    parser.add_argument("--tickets", type=int, default=500)
+    args = parser.parse_args()
+    n = args.tickets
+
+    with TestClient(app) as client:
+        res = client.post(
+            "/auth/register",
+            json={"email": "bench@example.com", "password": "bench-password"},
+        )
+        res.raise_for_status()
+        headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+        # Seed with one bulk create
+        res = client.post(
+            "/api/tickets/bulk",
+            json={"items": [
+                {"title": f"ticket {i}", "description": "seeded", "severity": "low"}
+                for i in range(n)
+            ]},
+            headers=headers,
+        )
+        res.raise_for_status()
+        ids = [r["id"] for r in res.json()["results"]]
+
+        # 1) one request per ticket
+        start = time.perf_counter()
+        for tid in ids:
+            client.patch(
+                f"/api/tickets/{tid}",
+                json={"status": "in_progress"},
+                headers=headers,
+            ).raise_for_status()
+        single_s = time.perf_counter() - start
+
+        # 2) one bulk request
+        start = time.perf_counter()
+        res = client.patch(
+            "/api/tickets/bulk",
+            json={"items": [{"id": tid, "status": "closed"} for tid in ids]},
+            headers=headers,
+        )
+        res.raise_for_status()
+        bulk_s = time.perf_counter() - start
+        assert res.json()["succeeded"] == n, res.json()
+
+    print(f"{n} updates, single calls: {single_s:8.3f}s ({n / single_s:8.1f} updates/s)")
+    print(f"{n} updates, one bulk call: {bulk_s:8.3f}s ({n / bulk_s:8.1f} updates/s)")
+    print(f"speedup: {single_s / bulk_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
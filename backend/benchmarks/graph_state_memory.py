@@ -0,0 +1,130 @@
+# benchmarks/graph_state_memory.py
+#
+# Memory profile of one long chat session through the graph.
+#
+# Ingests the rag_eval synthetic corpus into a throwaway SQLite DB and Chroma
+# directory, then plays a --turns session (default 100) through run_ops_graph
+# with the deterministic fake LLM, feeding each turn's conversation back in
+# like the frontend does. Per turn it records:
+#   - peak Python allocations during the graph run (tracemalloc, above the
+#     level before the turn) and wall time
+#   - the size of the final state (JSON bytes) and of the retrieved context
+#     held in it, vs. the context texts kept out of it in the ContextStore
+# and reports percentiles plus checkpoints at turns 1 / 10 / 25 / 50 / 100.
+# Results are written as JSON so runs can be diffed across commits.
+#
+# Usage (from backend/):
+#   python -m benchmarks.graph_state_memory --turns 100 --out graph_state_memory.json
+
+import argparse
+import inspect
+import json
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+# Sets up the throwaway DB / Chroma dir before the app is imported
+from benchmarks.rag_eval import (
+    _git_commit,
+    _percentiles,
+    graph,
+    ingest_corpus,
+    synthetic_corpus,
+)
+from app.agents.context import ContextStore
+from app.core.db import SessionLocal, init_db
+from app.core.llm_backends import FakeLLMClient
+from app.models.user import User
+
+CHECKPOINTS = (1, 10, 25, 50, 100)
+
+
+def _json_bytes(value: Any) -> int:
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def run_session(user_id: int, questions: List[str], turns: int) -> List[Dict[str, Any]]:
+    # Older graphs took no context store; keep the script runnable on them for diffs
+    takes_store = "context" in inspect.signature(graph.run_ops_graph).parameters
+    conversation: List[Dict[str, str]] = []
+    rows: List[Dict[str, Any]] = []
+
+    tracemalloc.start()
+    try:
+        for turn in range(1, turns + 1):
+            store = ContextStore()
+            kwargs = {"context": store} if takes_store else {}
+            state = {
+                "user_message": questions[(turn - 1) % len(questions)],
+                "conversation": conversation,
+                "user_id": user_id,
+            }
+
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            final_state = graph.run_ops_graph(state, **kwargs)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+
+            conversation = final_state.get("conversation", [])
+            in_state = final_state.get("context_refs", final_state.get("context_blocks")) or []
+            rows.append({
+                "turn": turn,
+                "ms": round(elapsed_ms, 2),
+                "peak_alloc_kb": round((peak - baseline) / 1024, 1),
+                "state_kb": round(_json_bytes(final_state) / 1024, 1),
+                "context_in_state_bytes": _json_bytes(in_state),
+                "context_in_store_bytes": store.nbytes() if takes_store else 0,
+                "conversation_messages": len(conversation),
+                "trace_steps": len(final_state.get("trace", [])),
+            })
+    finally:
+        tracemalloc.stop()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Graph state memory over a long chat session")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="graph_state_memory.json")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.turns, args.seed)
+    init_db()
+    graph._llm_client = FakeLLMClient(latency_ms=0, jitter_ms=0)
+
+    db = SessionLocal()
+    try:
+        user = User(email="memory@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        ingest_corpus(db, user.id, corpus)
+        user_id = user.id
+    finally:
+        db.close()
+
+    rows = run_session(user_id, [q["question"] for q in corpus["questions"]], args.turns)
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "turns": args.turns,
+        "peak_alloc_kb": _percentiles([r["peak_alloc_kb"] for r in rows]),
+        "turn_ms": _percentiles([r["ms"] for r in rows]),
+        "context_in_state_bytes": _percentiles([r["context_in_state_bytes"] for r in rows]),
+        "context_in_store_bytes": _percentiles([r["context_in_store_bytes"] for r in rows]),
+        # Should stay flat: the trace is per turn, not per session
+        "max_trace_steps": max((r["trace_steps"] for r in rows), default=0),
+        "checkpoints": [r for r in rows if r["turn"] in CHECKPOINTS or r["turn"] == args.turns],
+    }
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/import_time.py
+#
+# Cold-start import regression check for `import app.main`.
+#
+# Runs a fresh interpreter with `-X importtime`, reports the slowest
+# imports, and fails (exit 1) if:
+#   - total import time is over the budget, or
+#   - any heavy dependency that must load lazily got imported eagerly.
+#
+# Usage (from backend/):
+#   python -m benchmarks.import_time --budget-ms 1500
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Must NOT be imported by `import app.main`; they load on first use / at startup
+LAZY_MODULES = [
+    "chromadb",
+    "onnxruntime",
+    "langgraph",
+    "google.genai",
+    "pandas",
+    "openpyxl",
+    "docx",
+    "pypdf",
+    "numpy",
+]
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _run_importtime(module: str) -> tuple[list[tuple[int, int, str]], list[str]]:
+    probe = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"`import {module}` failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    eager = [m for m in proc.stdout.strip().split(",") if m]
+    return rows, eager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start import time budget check")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="take the best of N cold runs")
+    args = parser.parse_args()
+
+    best_total_ms = None
+    best_rows: list = []
+    eager: list = []
+    for _ in range(args.runs):
+        rows, eager = _run_importtime(args.module)
+        # top-level imports (no leading indentation in the name column) sum to the total
+        total_ms = sum(c for _, c, name in rows if not name.startswith("  ")) / 1000
+        if best_total_ms is None or total_ms < best_total_ms:
+            best_total_ms, best_rows = total_ms, rows
+
+    print(f"`import {args.module}`: {best_total_ms:.0f}ms (budget {args.budget_ms:.0f}ms)\n")
+    print(f"Slowest {args.top} imports by cumulative time:")
+    for _, cumulative_us, name in sorted(best_rows, key=lambda r: -r[1])[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name.strip()}")
+
+    failed = False
+    if best_total_ms > args.budget_ms:
+        print(f"\nFAIL: import time over budget by {best_total_ms - args.budget_ms:.0f}ms")
+        failed = True
+    if eager:
+        print(f"\nFAIL: heavy modules imported eagerly: {', '.join(eager)}")
+        failed = True
+    if not failed:
+        print("\nOK")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# benchmarks/load_test.py
+#
+# Open-loop asyncio load generator for a running server.
+# Requests arrive at a fixed target rate (Poisson arrivals, so a slow server
+# builds a queue instead of silently lowering the load) and are spread over a
+# weighted mix of endpoints:
+#   chat           POST /api/chat
+#   upload         POST /api/documents/upload   (small generated .txt)
+#   ticket_create  POST /api/tickets
+#   ticket_list    GET  /api/tickets
+# Reports per-endpoint throughput, errors, latency percentiles and a latency
+# histogram; --out writes the same numbers as JSON.
+#
+# Start the server with a fake or replayed LLM so no API calls are made:
+#   LLM_BACKEND=fake LLM_FAKE_LATENCY_MS=400 LLM_FAKE_JITTER_MS=150 uvicorn app.main:app
+#
+# Usage (from backend/):
+#   python -m benchmarks.load_test --rps 20 --duration 60
+#   python -m benchmarks.load_test --rps 50 --mix chat=1 ticket_list=1 --users 8 --out load.json
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+DEFAULT_MIX = {"chat": 6, "ticket_list": 2, "ticket_create": 1, "upload": 1}
+
+QUESTIONS = [
+    "What is the refund policy for annual plans?",
+    "How do I reset my VPN token?",
+    "Who approves production deployments?",
+    "What is the retention period for backups?",
+    "Show my open tickets",
+    "The payroll portal is down for the whole finance team",
+    "Email sync is not working on my laptop",
+    "hello",
+]
+TOPICS = ["VPN", "payroll", "email", "CRM", "printer", "SSO", "billing", "backup"]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.sent: Dict[str, int] = defaultdict(int)
+        self.dropped = 0
+
+    def record(self, endpoint: str, elapsed_ms: float, error: Optional[str]) -> None:
+        self.latencies[endpoint].append(elapsed_ms)
+        if error:
+            self.errors[endpoint][error] += 1
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _histogram(values: List[float]) -> Dict[str, int]:
+    counts = {f"<={b}ms": 0 for b in BUCKETS_MS}
+    counts[f">{BUCKETS_MS[-1]}ms"] = 0
+    for v in values:
+        for b in BUCKETS_MS:
+            if v <= b:
+                counts[f"<={b}ms"] += 1
+                break
+        else:
+            counts[f">{BUCKETS_MS[-1]}ms"] += 1
+    return counts
+
+
+def summarize(stats: Stats, wall_s: float) -> Dict[str, Dict]:
+    report = {}
+    for endpoint, values in sorted(stats.latencies.items()):
+        ordered = sorted(values)
+        errors = sum(stats.errors[endpoint].values())
+        report[endpoint] = {
+            "requests": len(values),
+            "errors": errors,
+            "error_kinds": dict(stats.errors[endpoint]),
+            "rps": round(len(values) / wall_s, 2) if wall_s else None,
+            "p50_ms": round(_percentile(ordered, 50), 1),
+            "p90_ms": round(_percentile(ordered, 90), 1),
+            "p99_ms": round(_percentile(ordered, 99), 1),
+            "max_ms": round(ordered[-1], 1),
+            "mean_ms": round(statistics.fmean(values), 1),
+            "histogram": _histogram(values),
+        }
+    return report
+
+
+# ---------- auth ----------
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    """Register the load-test user (or log in if it already exists); returns a bearer token."""
+    res = await client.post("/auth/register", json={"email": email, "password": password})
+    if res.status_code != 200:
+        res = await client.post("/auth/login", data={"username": email, "password": password})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+
+# ---------- requests ----------
+
+async def _chat(client, headers, rng: random.Random) -> httpx.Response:
+    return await client.post("/api/chat", headers=headers, json={"message": rng.choice(QUESTIONS), "conversation": []})
+
+
+async def _ticket_list(client, headers, rng: random.Random) -> httpx.Response:
+    return await client.get("/api/tickets", headers=headers, params={"status": "open", "limit": 20})
+
+
+async def _ticket_create(client, headers, rng: random.Random) -> httpx.Response:
+    topic = rng.choice(TOPICS)
+    return await client.post("/api/tickets", headers=headers, json={
+        "title": f"{topic} issue {uuid.uuid4().hex[:6]}",
+        "description": f"Load test ticket about {topic}.",
+        "severity": rng.choice(["low", "medium", "high"]),
+    })
+
+
+async def _upload(client, headers, rng: random.Random) -> httpx.Response:
+    topic = rng.choice(TOPICS)
+    body = "\n\n".join(
+        f"{topic} procedure step {i}: follow the runbook, record the change and notify the owner."
+        for i in range(rng.randint(5, 40))
+    )
+    files = {"file": (f"{topic.lower()}_{uuid.uuid4().hex[:8]}.txt", body.encode(), "text/plain")}
+    return await client.post("/api/documents/upload", headers=headers, files=files)
+
+
+REQUESTS = {
+    "chat": _chat,
+    "ticket_list": _ticket_list,
+    "ticket_create": _ticket_create,
+    "upload": _upload,
+}
+
+
+async def _one(client, headers, endpoint: str, rng: random.Random, stats: Stats) -> None:
+    start = time.perf_counter()
+    error = None
+    try:
+        res = await REQUESTS[endpoint](client, headers, rng)
+        if res.status_code >= 400:
+            error = f"http_{res.status_code}"
+    except httpx.TimeoutException:
+        error = "timeout"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    stats.record(endpoint, (time.perf_counter() - start) * 1000, error)
+
+
+# ---------- driver ----------
+
+async def run(
+    base_url: str,
+    rps: float,
+    duration: float,
+    mix: Dict[str, float],
+    users: int,
+    timeout: float,
+    max_in_flight: int,
+    seed: int,
+) -> Tuple[Stats, float]:
+    rng = random.Random(seed)
+    stats = Stats()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        run_id = uuid.uuid4().hex[:8]
+        tokens = await asyncio.gather(*(
+            _login(client, f"load-{run_id}-{i}@example.com", "load-test-password") for i in range(users)
+        ))
+        headers = [{"Authorization": f"Bearer {t}"} for t in tokens]
+
+        endpoints, weights = zip(*mix.items())
+        in_flight: set = set()
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                # Open loop: never wait for the server, but count what we had to drop
+                stats.dropped += 1
+            else:
+                endpoint = rng.choices(endpoints, weights)[0]
+                stats.sent[endpoint] += 1
+                task = asyncio.create_task(
+                    _one(client, rng.choice(headers), endpoint, random.Random(rng.random()), stats)
+                )
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            next_at += rng.expovariate(rps)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        wall_s = time.perf_counter() - start
+    return stats, wall_s
+
+
+def _parse_mix(items: Optional[List[str]]) -> Dict[str, float]:
+    if not items:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in REQUESTS:
+            raise SystemExit(f"Unknown endpoint {name!r}; choose from {', '.join(REQUESTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Open-loop load generator for chat / upload / ticket endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=10.0, help="target arrival rate (requests/second)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--mix", nargs="+", help="endpoint=weight, e.g. chat=6 ticket_list=2 upload=1")
+    parser.add_argument("--users", type=int, default=4, help="distinct users to spread requests over")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    mix = _parse_mix(args.mix)
+    stats, wall_s = asyncio.run(run(
+        args.base_url, args.rps, args.duration, mix, args.users, args.timeout, args.max_in_flight, args.seed,
+    ))
+    report = summarize(stats, wall_s)
+
+    total = sum(r["requests"] for r in report.values())
+    print(f"\n{total} requests in {wall_s:.1f}s ({total / wall_s:.1f} rps, target {args.rps}); "
+          f"{stats.dropped} arrivals dropped at --max-in-flight")
+    print(f"{'endpoint':<14} {'n':>6} {'err':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, r in report.items():
+        print(f"{endpoint:<14} {r['requests']:>6} {r['errors']:>5} {r['p50_ms']:>8.1f} "
+              f"{r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    for endpoint, r in report.items():
+        peak = max(r["histogram"].values()) or 1
+        print(f"\n{endpoint}")
+        for bucket, count in r["histogram"].items():
+            print(f"  {bucket:>9} {count:>6} {'#' * round(40 * count / peak)}")
+        if r["error_kinds"]:
+            print(f"  errors: {r['error_kinds']}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "base_url": args.base_url,
+                "target_rps": args.rps,
+                "duration_s": args.duration,
+                "wall_s": round(wall_s, 2),
+                "mix": mix,
+                "dropped": stats.dropped,
+                "endpoints": report,
+            }, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# benchmarks/rag_eval.py
+#
+# Offline RAG evaluation + latency harness.
+#
+# Ingests a corpus (synthetic by default, or --corpus FILE) into a throwaway
+# SQLite DB and Chroma directory through the normal ingestion path, then runs
+# every labelled question through run_ops_graph with a deterministic fake LLM
+# (no network, no API key) and reports:
+#   - retrieval recall@k and MRR (a hit = the labelled document + page)
+#   - context tokens per query, LLM prompt tokens and the share served from cache
+#   - per-node latency percentiles
+#   - ingestion throughput (and summary build time in hierarchical mode)
+# Results are written as JSON so runs can be diffed across commits.
+#
+# Corpus file format:
+#   {"documents": [{"name": "vpn_runbook.txt", "pages": ["...", "..."]}],
+#    "questions": [{"question": "...", "document": "vpn_runbook.txt", "page": 1}]}
+#
+# Usage (from backend/):
+#   python -m benchmarks.rag_eval --out rag_eval.json
+#   python -m benchmarks.rag_eval --corpus my_corpus.json --k 1 3 5 10
+#   python -m benchmarks.rag_eval --retrieval flat --out rag_eval_flat.json
+#   python -m benchmarks.rag_eval --write-corpus corpus.json   # dump the synthetic set
+
+import argparse
+import inspect
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+_tmp = tempfile.TemporaryDirectory()
+# Must be set before the app (and its engine) is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'eval.db')}"
+
+from app.core import rag  # noqa: E402
+
+rag.CHROMA_DIR = os.path.join(_tmp.name, "chroma")
+
+from app.agents import graph  # noqa: E402
+from app.api.documents import ingest_chunks  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.core.llm_backends import FakeLLMClient  # noqa: E402
+from app.core.db import SessionLocal, init_db  # noqa: E402
+from app.core.summaries import build_summaries  # noqa: E402
+from app.models.db_models import Document  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+SYSTEMS = [
+    "VPN", "payroll", "email", "CRM", "wifi", "printer", "SSO", "billing", "deploy pipeline",
+    "database", "backup", "laptop", "expense", "travel", "HR portal", "ticketing", "firewall", "DNS",
+]
+ATTRIBUTES = {
+    "owner": ["the platform team", "IT operations", "the finance team", "the security team", "facilities"],
+    "escalation contact": ["the on-call lead", "the duty manager", "the service desk", "the vendor hotline"],
+    "maintenance window": ["Sunday 02:00-04:00", "Saturday 22:00-23:30", "the first Monday of each month"],
+    "support hours": ["24/7", "weekdays 08:00-18:00", "business hours in each region"],
+    "approval requirement": ["manager approval", "two-person review", "a change ticket", "no approval"],
+    "retention period": ["30 days", "90 days", "one year", "seven years"],
+}
+FILLER = (
+    "This section is part of the internal operations handbook. Follow the standard "
+    "procedure, record every change in the ticketing system and notify affected teams. "
+).split()
+
+
+# ---------- corpus ----------
+
+def synthetic_corpus(questions: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    documents, facts = [], []
+    for system in SYSTEMS:
+        name = f"{system.replace(' ', '_').lower()}_runbook.txt"
+        pages = []
+        for page_no, (attribute, values) in enumerate(ATTRIBUTES.items()):
+            value = rng.choice(values)
+            filler = " ".join(rng.choice(FILLER) for _ in range(80))
+            pages.append(
+                f"{system} runbook, section {page_no + 1}: {attribute}.\n"
+                f"The {attribute} for the {system} service is {value}. {filler}"
+            )
+            facts.append({"system": system, "attribute": attribute, "document": name, "page": page_no})
+        documents.append({"name": name, "pages": pages})
+
+    templates = [
+        "What is the {attribute} for {system}?",
+        "Who or what is the {attribute} of the {system} service?",
+        "Tell me the {system} {attribute}.",
+    ]
+    sample = rng.sample(facts, min(questions, len(facts)))
+    return {
+        "documents": documents,
+        "questions": [
+            {
+                "question": rng.choice(templates).format(**f),
+                "document": f["document"],
+                "page": f["page"],
+            }
+            for f in sample
+        ],
+    }
+
+
+def ingest_corpus(db, user_id: int, corpus: Dict[str, Any]) -> Dict[str, Any]:
+    doc_ids: Dict[str, int] = {}
+    chunks = chars = 0
+    start = time.perf_counter()
+    for spec in corpus["documents"]:
+        doc = Document(name=spec["name"], path=f"/eval/{spec['name']}", user_id=user_id)
+        db.add(doc)
+        db.commit()
+        db.refresh(doc)
+        doc_ids[spec["name"]] = doc.id
+        chunks += ingest_chunks(
+            db, doc, user_id, "text", spec["name"],
+            ((text, {"page": page_no}) for page_no, text in enumerate(spec["pages"])),
+        )
+        chars += sum(len(p) for p in spec["pages"])
+    elapsed = time.perf_counter() - start
+
+    stats: Dict[str, Any] = {
+        "documents": len(doc_ids),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(chunks / elapsed, 1) if elapsed else None,
+        "chars_per_s": round(chars / elapsed, 1) if elapsed else None,
+    }
+    if settings.RETRIEVAL_MODE == "hierarchical":
+        # Synchronously here (uploads build them in the background)
+        start = time.perf_counter()
+        built = [build_summaries(db, doc_id) for doc_id in doc_ids.values()]
+        stats["summaries"] = {
+            "sections": sum(b.get("sections", 0) for b in built),
+            "seconds": round(time.perf_counter() - start, 3),
+            "summary_tokens": sum(b.get("summary_tokens", 0) for b in built),
+            "source_tokens": sum(b.get("source_tokens", 0) for b in built),
+        }
+    return {"doc_ids": doc_ids, "stats": stats}
+
+
+# ---------- instrumentation ----------
+
+NODE_NAMES = ["planner_node", "rag_node", "answer_node", "ticket_node"]
+
+
+def instrument(node_timings: Dict[str, List[float]], retrievals: List[Dict[str, Any]]) -> None:
+    """Wrap graph nodes (timing) and graph.search / search_hierarchical (retrieved ids) before the graph is compiled."""
+    for name in NODE_NAMES:
+        original = getattr(graph, name)
+
+        def timed(
+            state,
+            config=None,
+            _original=original,
+            _name=name.replace("_node", ""),
+            _with_config="config" in inspect.signature(original).parameters,
+        ):
+            start = time.perf_counter()
+            try:
+                return _original(state, config) if _with_config else _original(state)
+            finally:
+                node_timings[_name].append((time.perf_counter() - start) * 1000)
+
+        setattr(graph, name, timed)
+
+    for name in ("search", "search_hierarchical"):
+        original_search = getattr(graph, name)
+
+        def recorded_search(*args, _original=original_search, **kwargs):
+            results = _original(*args, **kwargs)
+            retrievals.append(results)
+            return results
+
+        setattr(graph, name, recorded_search)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "p50": round(pct(50), 2),
+        "p90": round(pct(90), 2),
+        "p99": round(pct(99), 2),
+        "mean": round(statistics.fmean(values), 2),
+        "n": len(values),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+# ---------- main ----------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline RAG recall/MRR + latency harness")
+    parser.add_argument("--corpus", help="corpus JSON (default: synthetic)")
+    parser.add_argument("--write-corpus", help="write the synthetic corpus to this file and exit")
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--retrieval", choices=["hierarchical", "flat"], default=settings.RETRIEVAL_MODE)
+    parser.add_argument("--out", default="rag_eval.json")
+    args = parser.parse_args()
+    settings.RETRIEVAL_MODE = args.retrieval
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+    else:
+        corpus = synthetic_corpus(args.questions, args.seed)
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, indent=2)
+        print(f"Wrote {len(corpus['documents'])} documents / {len(corpus['questions'])} questions")
+        return
+
+    init_db()
+    graph._llm_client = FakeLLMClient(latency_ms=0, jitter_ms=0)
+    node_timings: Dict[str, List[float]] = defaultdict(list)
+    retrievals: List[Dict[str, Any]] = []
+    instrument(node_timings, retrievals)
+
+    db = SessionLocal()
+    try:
+        user = User(email="eval@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        ingested = ingest_corpus(db, user.id, corpus)
+        user_id = user.id  # read before close: ingest's commits expired the instance
+    finally:
+        db.close()
+    doc_ids = ingested["doc_ids"]
+
+    ranks: List[int | None] = []
+    context_tokens: List[float] = []
+    prompt_tokens: List[float] = []
+    cached_tokens: List[float] = []
+    end_to_end: List[float] = []
+    for q in corpus["questions"]:
+        retrievals.clear()
+        start = time.perf_counter()
+        final_state = graph.run_ops_graph({
+            "user_message": q["question"],
+            "conversation": [],
+            "user_id": user_id,
+        })
+        end_to_end.append((time.perf_counter() - start) * 1000)
+
+        for step in final_state.get("trace", []):
+            if step.get("node") == "rag" and step.get("context_tokens") is not None:
+                context_tokens.append(step["context_tokens"])
+            if step.get("prompt_tokens") is not None:
+                prompt_tokens.append(step["prompt_tokens"])
+                cached_tokens.append(step.get("cached_tokens") or 0)
+
+        target = (doc_ids[q["document"]], q["page"])
+        rank = None
+        if retrievals:
+            metas = retrievals[-1]["metadatas"][0]
+            for i, meta in enumerate(metas, start=1):
+                if (int(meta.get("document_id", -1)), int(meta.get("page", -1))) == target:
+                    rank = i
+                    break
+        ranks.append(rank)
+
+    n = len(ranks)
+    retrieval = {
+        f"recall@{k}": round(sum(1 for r in ranks if r is not None and r <= k) / n, 4) if n else None
+        for k in sorted(args.k)
+    }
+    retrieval["mrr"] = round(sum(1 / r for r in ranks if r) / n, 4) if n else None
+    retrieval["questions"] = n
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corpus": args.corpus or f"synthetic(seed={args.seed})",
+        "retrieval_mode": args.retrieval,
+        "ingestion": ingested["stats"],
+        "retrieval": retrieval,
+        "context_tokens": _percentiles(context_tokens),
+        "llm_prompt_tokens": {
+            **_percentiles(prompt_tokens),
+            "cached_share": round(sum(cached_tokens) / sum(prompt_tokens), 4) if sum(prompt_tokens) else None,
+        },
+        "latency_ms": {
+            "end_to_end": _percentiles(end_to_end),
+            **{node: _percentiles(values) for node, values in node_timings.items()},
+        },
+    }
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
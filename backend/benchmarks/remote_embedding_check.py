@@ -0,0 +1,124 @@
+# benchmarks/remote_embedding_check.py
+#
+# Regression check: with INDEX_SERVICE_URL set, an API worker must never load
+# the ONNX embedding model itself.
+#
+# Serves a stand-in /embed endpoint (deterministic vectors, no model) on a
+# local port, points the app at it, and runs every path that hands Chroma
+# raw text (add_chunks, add_summary_vectors, search, search_hierarchical,
+# the ticket index add / query, an upsert with documents= like the
+# consistency repair and snapshot restore do) against an embedded Chroma in
+# a temp directory. Fails (exit 1) if Chroma's ONNX model class was
+# instantiated, or if any text skipped the index service.
+#
+# Usage (from backend/):
+#   python -m benchmarks.remote_embedding_check
+
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import List
+
+DIM = 384
+_embedded = {"texts": 0}
+
+
+def _vector(text: str) -> List[float]:
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(seed[i % len(seed)] - 128) / 128 for i in range(DIM)]
+
+
+class _EmbedHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["texts"]
+        _embedded["texts"] += len(texts)
+        body = json.dumps({"embeddings": [_vector(t) for t in texts]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main() -> None:
+    port = _free_port()
+    server = ThreadingHTTPServer(("127.0.0.1", port), _EmbedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    tmp = tempfile.TemporaryDirectory()
+    # Must be set before the app (settings, engine) is imported
+    os.environ["INDEX_SERVICE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.pop("CHROMA_SERVER_URL", None)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'check.db')}"
+
+    from chromadb.utils.embedding_functions import onnx_mini_lm_l6_v2
+
+    loaded = []
+
+    def _refuse(self, *args, **kwargs):
+        loaded.append(True)
+        raise RuntimeError("ONNX embedding model instantiated inside the API worker")
+
+    onnx_mini_lm_l6_v2.ONNXMiniLM_L6_V2.__init__ = _refuse
+
+    from app.core import rag
+
+    rag.CHROMA_DIR = os.path.join(tmp.name, "chroma")
+
+    from app.core import ticket_index
+
+    errors = []
+    meta = {"user_id": 1, "document_id": 1, "page": 0, "filename": "check.txt", "source": "text"}
+    checks = [
+        ("add_chunks", lambda: rag.add_chunks(["VPN tokens reset weekly.", "Payroll runs monthly."], [meta, meta])),
+        ("add_summary_vectors", lambda: rag.add_summary_vectors(
+            ["Covers VPN and payroll."], [{**meta, "level": "document"}]
+        )),
+        ("search", lambda: rag.search("reset VPN token", user_id=1)),
+        ("search_hierarchical", lambda: rag.search_hierarchical("reset VPN token", user_id=1)),
+        ("upsert documents=", lambda: rag.get_collection().upsert(
+            ids=["check-upsert"], documents=["Re-embedded legacy chunk."], metadatas=[meta]
+        )),
+        ("ticket index add", lambda: ticket_index.index_tickets([SimpleNamespace(
+            id=1, user_id=1, title="VPN down", description="Cannot connect", status="open", severity="high",
+        )])),
+        ("ticket index query", lambda: ticket_index.find_similar_tickets(1, "VPN down", "again")),
+    ]
+    for name, run in checks:
+        before = _embedded["texts"]
+        try:
+            run()
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        embedded = _embedded["texts"] - before
+        print(f"{name:<22} {embedded} texts via /embed")
+        if embedded == 0:
+            errors.append(f"{name}: nothing went through the index service")
+
+    server.shutdown()
+    if loaded:
+        errors.append("ONNXMiniLM_L6_V2 was instantiated")
+    if errors:
+        print("\nFAILED:\n  " + "\n  ".join(errors))
+        sys.exit(1)
+    print("\nOK: no local embedding model in the worker")
+
+
+if __name__ == "__main__":
+    main()
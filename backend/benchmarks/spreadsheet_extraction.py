@@ -0,0 +1,116 @@
+# benchmarks/spreadsheet_extraction.py
+#
+# Old vs streaming spreadsheet extraction on a synthetic large workbook.
+#
+#   old:    pd.ExcelFile + pd.read_excel per sheet + df.to_string() (previous code)
+#   stream: app.core.spreadsheet_extraction.iter_excel_chunks (openpyxl read-only)
+#
+# Each method runs in its own child process so peak RSS is measured cleanly.
+#
+# Usage (from backend/):
+#   python -m benchmarks.spreadsheet_extraction --sheets 50 --rows 4000 --cols 8
+#   (50 × 4000 = 200k rows total)
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _generate_workbook(path: str, sheets: int, rows: int, cols: int) -> None:
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(title=f"Sheet{s + 1}")
+        ws.append([f"column_{c}" for c in range(cols)])
+        for r in range(rows):
+            ws.append([f"r{r}c{c}" if c % 2 == 0 else r * c for c in range(cols)])
+    wb.save(path)
+
+
+def _extract_old(path: str) -> tuple[int, int]:
+    import pandas as pd
+
+    xl_file = pd.ExcelFile(path)
+    chunks = 0
+    total_chars = 0
+    for sheet_name in xl_file.sheet_names:
+        df = pd.read_excel(path, sheet_name=sheet_name)
+        text = "\n".join([f"Sheet: {sheet_name}\n", df.to_string(index=False)])
+        chunks += 1
+        total_chars += len(text)
+    return chunks, total_chars
+
+
+def _extract_stream(path: str) -> tuple[int, int]:
+    from app.core.spreadsheet_extraction import iter_excel_chunks
+
+    chunks = 0
+    total_chars = 0
+    for text, _meta in iter_excel_chunks(path):
+        chunks += 1
+        total_chars += len(text)
+    return chunks, total_chars
+
+
+def _child(method: str, path: str) -> None:
+    start = time.perf_counter()
+    chunks, chars = (_extract_old if method == "old" else _extract_stream)(path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "method": method,
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(peak_mb, 1),
+        "chunks": chunks,
+        "chars": chars,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Spreadsheet extraction benchmark")
+    parser.add_argument("--sheets", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=4000, help="rows per sheet")
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--methods", nargs="+", default=["stream", "old"])
+    parser.add_argument("--child", nargs=2, metavar=("METHOD", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "large.xlsx")
+        start = time.perf_counter()
+        _generate_workbook(path, args.sheets, args.rows, args.cols)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(
+            f"Workbook: {args.sheets} sheets × {args.rows} rows × {args.cols} cols "
+            f"({size_mb:.1f} MB, generated in {time.perf_counter() - start:.1f}s)\n"
+        )
+
+        for method in args.methods:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.spreadsheet_extraction", "--child", method, path],
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{method:>7}: FAILED\n{proc.stderr}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{r['method']:>7}: {r['seconds']:>8.2f}s  peak RSS {r['peak_rss_mb']:>8.1f} MB  "
+                f"{r['chunks']:>6} chunks  {r['chars'] / 1e6:.1f}M chars"
+            )
+
+
+if __name__ == "__main__":
+    main()
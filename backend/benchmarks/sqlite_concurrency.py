@@ -0,0 +1,139 @@
+# benchmarks/sqlite_concurrency.py
+#
+# Mixed read/write concurrency benchmark for the SQLite engine.
+#
+# Runs the same workload twice on a fresh database file:
+#   - "default": the old engine (rollback journal, no pragmas)
+#   - "tuned":   app.core.db.create_db_engine (WAL + pragmas + sized pool)
+# and reports throughput plus how many "database is locked" errors were hit.
+#
+# Usage (from backend/):
+#   python -m benchmarks.sqlite_concurrency --writers 8 --readers 16 --seconds 10
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, create_db_engine
+import app.models.user  # noqa: F401  (register tables)
+import app.models.db_models  # noqa: F401
+from app.models.db_models import Ticket, Chunk
+
+
+def _run_workload(engine, writers: int, readers: int, seconds: float) -> dict:
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"writes": 0, "reads": 0, "locked_errors": 0, "other_errors": 0}
+
+    def bump(key: str) -> None:
+        with lock:
+            stats[key] += 1
+
+    def writer(worker_id: int) -> None:
+        i = 0
+        while not stop.is_set():
+            db = Session()
+            try:
+                # Same shape as ticket_node + upload_document: one ticket,
+                # then a small batch of chunk rows in one transaction.
+                db.add(Ticket(
+                    title=f"bench {worker_id}-{i}",
+                    description="x" * 200,
+                    status="open",
+                    severity="medium",
+                    user_id=1,
+                ))
+                for page in range(5):
+                    db.add(Chunk(
+                        document_id=1,
+                        content="lorem ipsum " * 50,
+                        meta_json=f'{{"page": {page}}}',
+                        user_id=1,
+                    ))
+                db.commit()
+                bump("writes")
+            except OperationalError as e:
+                db.rollback()
+                bump("locked_errors" if "locked" in str(e) else "other_errors")
+            finally:
+                db.close()
+            i += 1
+
+    def reader() -> None:
+        while not stop.is_set():
+            db = Session()
+            try:
+                (
+                    db.query(Ticket)
+                    .filter(Ticket.user_id == 1)
+                    .order_by(Ticket.created_at.desc())
+                    .limit(20)
+                    .all()
+                )
+                db.query(Chunk).filter(Chunk.user_id == 1).count()
+                bump("reads")
+            except OperationalError as e:
+                bump("locked_errors" if "locked" in str(e) else "other_errors")
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    engine.dispose()
+
+    stats["writes_per_sec"] = round(stats["writes"] / elapsed, 1)
+    stats["reads_per_sec"] = round(stats["reads"] / elapsed, 1)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite mixed read/write concurrency benchmark")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    # sqlite3's built-in lock wait for the old engine (its default is 5s)
+    parser.add_argument("--default-timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        default_url = f"sqlite:///{os.path.join(tmp, 'default.db')}"
+        tuned_url = f"sqlite:///{os.path.join(tmp, 'tuned.db')}"
+
+        default_engine = create_engine(
+            default_url,
+            connect_args={"check_same_thread": False, "timeout": args.default_timeout},
+        )
+        tuned_engine = create_db_engine(tuned_url)
+
+        print(f"Workload: {args.writers} writers, {args.readers} readers, {args.seconds}s\n")
+        for label, eng in (("default", default_engine), ("tuned", tuned_engine)):
+            result = _run_workload(eng, args.writers, args.readers, args.seconds)
+            print(
+                f"{label:>8}: writes/s={result['writes_per_sec']:>8} "
+                f"reads/s={result['reads_per_sec']:>8} "
+                f"locked_errors={result['locked_errors']} "
+                f"other_errors={result['other_errors']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
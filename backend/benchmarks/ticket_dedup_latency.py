@@ -0,0 +1,98 @@
+# benchmarks/ticket_dedup_latency.py
+#
+# Latency budget check for ticket duplicate detection.
+# Grows one synthetic user's ticket index step by step and measures the
+# nearest-neighbour lookup done before every ticket insert. Exits non-zero
+# if p95 goes over TICKET_DEDUP_BUDGET_MS at any size.
+#
+# Usage (from backend/):
+#   python -m benchmarks.ticket_dedup_latency --sizes 100 1000 5000 20000
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+from app.config import settings
+from app.core import ticket_index
+from app.core.rag import get_client
+
+BENCH_USER_ID = 999_999_001
+
+SYSTEMS = ["VPN", "email", "payroll", "CRM", "wifi", "printer", "SSO", "billing", "deploy", "database"]
+SYMPTOMS = ["is down", "is slow", "returns 500 errors", "rejects logins", "times out", "shows stale data"]
+PLACES = ["for the Berlin office", "for remote staff", "since this morning", "after the update", "for all users"]
+
+
+def _fake_ticket(ticket_id: int, rng: random.Random) -> SimpleNamespace:
+    title = f"{rng.choice(SYSTEMS)} {rng.choice(SYMPTOMS)} {rng.choice(PLACES)}"
+    return SimpleNamespace(
+        id=ticket_id,
+        user_id=BENCH_USER_ID,
+        title=title,
+        description=f"Reported issue: {title}. Ticket number {ticket_id}.",
+        status=rng.choice(["open", "open", "in_progress", "closed"]),
+        severity=rng.choice(["low", "medium", "high", "critical"]),
+    )
+
+
+def _percentile(values, pct: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ticket similarity lookup latency vs index size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--budget-ms", type=float, default=settings.TICKET_DEDUP_BUDGET_MS)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    client = get_client()
+    name = f"ops_tickets_u{BENCH_USER_ID}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+
+    failed = False
+    indexed = 0
+    try:
+        for size in sorted(args.sizes):
+            # Incremental growth, same path as ticket creation
+            batch = [_fake_ticket(i, rng) for i in range(indexed + 1, size + 1)]
+            start = time.perf_counter()
+            for offset in range(0, len(batch), 500):
+                ticket_index.index_tickets(batch[offset:offset + 500])
+            insert_s = time.perf_counter() - start
+            indexed = size
+
+            timings = []
+            for _ in range(args.queries):
+                probe = _fake_ticket(0, rng)
+                _, elapsed_ms = ticket_index.find_similar_tickets(
+                    BENCH_USER_ID, probe.title, probe.description
+                )
+                timings.append(elapsed_ms)
+
+            p50 = statistics.median(timings)
+            p95 = _percentile(timings, 95)
+            ok = p95 <= args.budget_ms
+            failed |= not ok
+            print(
+                f"size={size:>7}  index {len(batch) / max(insert_s, 1e-9):8.0f} tickets/s  "
+                f"lookup p50={p50:6.1f}ms p95={p95:6.1f}ms  "
+                f"{'OK' if ok else 'OVER BUDGET'} (budget {args.budget_ms:.0f}ms)"
+            )
+    finally:
+        client.delete_collection(name)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/vector_quantization.py
+#
+# VECTOR_STORE_MODE=int8 vs the default Chroma (float32 HNSW) mode, through
+# the app's own write and search paths, on synthetic clustered embeddings
+# for one tenant:
+#   - process memory (VmRSS / peak VmHWM) of a freshly started process
+#     serving queries, minus the same process before it touched the store
+#   - recall@10 against exact float32 brute force
+#   - query latency (p50 / p95)
+#
+# Each mode ingests in one subprocess, then queries in a second one, so the
+# numbers are what a restarted worker holds, not what the ingest left behind.
+#
+# Usage (from backend/):
+#   python -m benchmarks.vector_quantization --chunks 100000 --dim 384
+#   python -m benchmarks.vector_quantization --chunks 100000 --modes int8
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def _clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.6
+    return _normalize(centers[labels] + noise).astype(np.float32)
+
+
+def _percentile(values, pct: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def _recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def _ground_truth(data: np.ndarray, queries: np.ndarray, k: int):
+    truth = []
+    for q in queries:
+        scores = data @ q
+        top = np.argpartition(-scores, k - 1)[:k]
+        truth.append([str(i) for i in top[np.argsort(-scores[top])]])
+    return truth
+
+
+def _memory() -> dict:
+    """Current and peak resident set size of this process, in bytes."""
+    status = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                status[key] = int(value.split()[0]) * 1024
+    return status
+
+
+# ---------- subprocess side ----------
+
+def _ingest(workdir: str) -> dict:
+    from app.core import rag
+
+    data = np.load(os.path.join(workdir, "data.npy"), mmap_mode="r")
+    start = time.perf_counter()
+    for offset in range(0, len(data), 5000):
+        batch = np.asarray(data[offset:offset + 5000])
+        ids = [str(i) for i in range(offset, offset + len(batch))]
+        rag.upsert_chunks(
+            ids,
+            [f"chunk {i}" for i in ids],
+            [{"user_id": 0, "document_id": int(i) // 50, "page": 1, "source": "pdf"} for i in ids],
+            embeddings=batch.tolist(),
+        )
+    return {"build_s": time.perf_counter() - start}
+
+
+def _query(workdir: str, k: int) -> dict:
+    from app.core import rag
+
+    queries = np.load(os.path.join(workdir, "queries.npy"))
+    rag.get_client()
+    before = _memory()
+
+    found, timings = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = rag._search_embeddings([q.tolist()], 0, None, None, k, k)
+        timings.append((time.perf_counter() - t0) * 1000)
+        found.append(res["ids"][0])
+
+    after = _memory()
+    return {
+        "rss_before": before["VmRSS"],
+        "rss_after": after["VmRSS"],
+        "hwm_after": after["VmHWM"],
+        "found": found,
+        "timings": timings,
+    }
+
+
+def _run_phase(phase: str, mode: str, workdir: str, k: int) -> dict:
+    env = dict(
+        os.environ,
+        VECTOR_STORE_MODE=mode,
+        VECTOR_STORE_DIR=os.path.join(workdir, f"{mode}_vectors"),
+        CHROMA_DIR=os.path.join(workdir, f"{mode}_chroma"),
+        CHROMA_SERVER_URL="",
+    )
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.vector_quantization",
+         "--phase", phase, "--workdir", workdir, "--k", str(k)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="int8 vector store vs Chroma: process memory, recall@10, latency")
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["chroma", "int8"], choices=["chroma", "int8"])
+    parser.add_argument("--phase", choices=["ingest", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        result = _ingest(args.workdir) if args.phase == "ingest" else _query(args.workdir, args.k)
+        print(json.dumps(result))
+        return
+
+    rng = np.random.default_rng(42)
+    data = _clustered_vectors(args.chunks, args.dim, args.clusters, rng)
+    queries = _clustered_vectors(args.queries, args.dim, args.clusters, np.random.default_rng(7))
+    truth = _ground_truth(data, queries, args.k)
+
+    workdir = tempfile.mkdtemp(prefix="vq_bench_")
+    rows = []
+    try:
+        np.save(os.path.join(workdir, "data.npy"), data)
+        np.save(os.path.join(workdir, "queries.npy"), queries)
+        del data
+        for mode in args.modes:
+            build = _run_phase("ingest", mode, workdir, args.k)
+            served = _run_phase("query", mode, workdir, args.k)
+            rows.append((mode, build, served, _recall(served["found"], truth)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{args.chunks} chunks × {args.dim} dims, {args.queries} queries, k={args.k}\n")
+    print(
+        f"{'VECTOR_STORE_MODE':<18} {'RSS +MB':>8} {'RSS MB':>8} {'peak MB':>8} "
+        f"{'build s':>8} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p95 ms':>8}"
+    )
+    for mode, build, served, recall in rows:
+        timings = served["timings"]
+        print(
+            f"{mode:<18} {(served['rss_after'] - served['rss_before']) / 1e6:>8.0f} "
+            f"{served['rss_after'] / 1e6:>8.0f} {served['hwm_after'] / 1e6:>8.0f} "
+            f"{build['build_s']:>8.1f} {recall:>10.3f} "
+            f"{_percentile(timings, 50):>8.2f} {_percentile(timings, 95):>8.2f}"
+        )
+    print(
+        "\nRSS +MB is what serving the queries added to a freshly started process "
+        "(Chroma loading its index / the int8 codes plus the paged-in float rows); "
+        "RSS MB and peak MB are the whole process."
+    )
+
+
+if __name__ == "__main__":
+    main()
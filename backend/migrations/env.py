@@ -0,0 +1,58 @@
+# migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.db import Base, DATABASE_URL, create_db_engine
+import app.models.user  # noqa: F401  (register tables on Base.metadata)
+import app.models.db_models  # noqa: F401
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def _database_url() -> str:
+    # init_db() passes the URL explicitly; the CLI falls back to settings.
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+    url = _database_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_db_engine(_database_url())
+
+    try:
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                # SQLite can't ALTER most things in place; batch mode rebuilds tables
+                render_as_batch=connection.dialect.name == "sqlite",
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,83 @@
+"""initial schema: users, documents, chunks, tickets
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Idempotent on purpose: databases created by the old `Base.metadata.create_all()`
+startup path already have these tables, so only missing ones are created.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("password_hash", sa.String(), nullable=False),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "documents" not in existing:
+        op.create_table(
+            "documents",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("path", sa.String(), nullable=False),
+            sa.Column("uploaded_at", sa.DateTime(), nullable=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_documents_id", "documents", ["id"])
+
+    if "chunks" not in existing:
+        op.create_table(
+            "chunks",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("meta_json", sa.Text(), nullable=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_chunks_id", "chunks", ["id"])
+
+    if "tickets" not in existing:
+        op.create_table(
+            "tickets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("severity", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_tickets_id", "tickets", ["id"])
+
+    # Postgres-only: native full-text index on chunk content
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_chunks_content_fts "
+            "ON chunks USING gin (to_tsvector('english', content))"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_chunks_content_fts")
+    op.drop_table("tickets")
+    op.drop_table("chunks")
+    op.drop_table("documents")
+    op.drop_table("users")
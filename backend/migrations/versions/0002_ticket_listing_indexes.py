@@ -0,0 +1,45 @@
+"""ticket listing indexes + normalized created_at
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Keyset pagination needs every ticket to have a created_at
+    op.execute("UPDATE tickets SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+    if bind.dialect.name == "sqlite":
+        # Rows written with func.now() are stored as 'YYYY-MM-DD HH:MM:SS', while
+        # SQLAlchemy binds datetimes as 'YYYY-MM-DD HH:MM:SS.ffffff'. Pad them so
+        # string comparison in cursor filters is exact.
+        op.execute(
+            "UPDATE tickets SET created_at = created_at || '.000000' "
+            "WHERE created_at IS NOT NULL AND instr(created_at, '.') = 0"
+        )
+
+    existing = {ix["name"] for ix in sa.inspect(bind).get_indexes("tickets")}
+    if "ix_tickets_user_status_created" not in existing:
+        op.create_index(
+            "ix_tickets_user_status_created",
+            "tickets",
+            ["user_id", "status", "created_at"],
+        )
+    if "ix_tickets_user_created" not in existing:
+        op.create_index("ix_tickets_user_created", "tickets", ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tickets_user_created", table_name="tickets")
+    op.drop_index("ix_tickets_user_status_created", table_name="tickets")
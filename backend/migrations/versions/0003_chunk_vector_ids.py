@@ -0,0 +1,37 @@
+"""record each chunk's Chroma vector id
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Existing chunks keep vector_id NULL; `python -m app.core.maintenance check --repair`
+matches them to their vectors by document + content.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c["name"] for c in inspector.get_columns("chunks")}
+    if "vector_id" not in columns:
+        with op.batch_alter_table("chunks") as batch:
+            batch.add_column(sa.Column("vector_id", sa.String(), nullable=True))
+
+    existing = {ix["name"] for ix in sa.inspect(bind).get_indexes("chunks")}
+    if "ix_chunks_vector_id" not in existing:
+        op.create_index("ix_chunks_vector_id", "chunks", ["vector_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chunks_vector_id", table_name="chunks")
+    with op.batch_alter_table("chunks") as batch:
+        batch.drop_column("vector_id")
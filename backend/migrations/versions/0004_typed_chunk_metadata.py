@@ -0,0 +1,151 @@
+"""typed chunk metadata columns
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Moves page/source out of the `str(dict)` meta_json into columns, fills in
+char offsets, token counts and content hashes, and rewrites meta_json as
+real JSON holding only the remaining extras (sheet, row range, ...).
+"""
+import ast
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+_NEW_COLUMNS = [
+    sa.Column("page", sa.Integer(), nullable=True),
+    sa.Column("source", sa.String(), nullable=True),
+    sa.Column("char_start", sa.Integer(), nullable=True),
+    sa.Column("char_end", sa.Integer(), nullable=True),
+    sa.Column("token_count", sa.Integer(), nullable=True),
+    sa.Column("content_hash", sa.String(length=64), nullable=True),
+]
+_INDEXES = {
+    "ix_chunks_user_source": ["user_id", "source"],
+    "ix_chunks_user_document": ["user_id", "document_id"],
+    "ix_chunks_content_hash": ["content_hash"],
+}
+# Stored in columns (or redundant with documents.name), not in meta_json
+_COLUMN_KEYS = {"page", "source", "document_id", "user_id", "filename"}
+_BATCH = 1000
+
+
+def _parse_legacy(meta_json):
+    if not meta_json:
+        return {}
+    try:
+        meta = json.loads(meta_json)
+    except ValueError:
+        try:
+            meta = ast.literal_eval(meta_json)
+        except (ValueError, SyntaxError):
+            return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def _convert_rows(bind) -> None:
+    chunks = sa.table(
+        "chunks",
+        sa.column("id", sa.Integer),
+        sa.column("document_id", sa.Integer),
+        sa.column("content", sa.Text),
+        sa.column("meta_json", sa.Text),
+        sa.column("page", sa.Integer),
+        sa.column("source", sa.String),
+        sa.column("char_start", sa.Integer),
+        sa.column("char_end", sa.Integer),
+        sa.column("token_count", sa.Integer),
+        sa.column("content_hash", sa.String),
+    )
+    update = (
+        chunks.update()
+        .where(chunks.c.id == sa.bindparam("chunk_id"))
+        .values(
+            page=sa.bindparam("page"),
+            source=sa.bindparam("source"),
+            char_start=sa.bindparam("char_start"),
+            char_end=sa.bindparam("char_end"),
+            token_count=sa.bindparam("token_count"),
+            content_hash=sa.bindparam("content_hash"),
+            meta_json=sa.bindparam("new_meta_json"),
+        )
+    )
+
+    # Char offsets are cumulative per document, in insertion (id) order
+    offsets = {}
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(chunks.c.id, chunks.c.document_id, chunks.c.content, chunks.c.meta_json)
+            .where(chunks.c.id > last_id, chunks.c.content_hash.is_(None))
+            .order_by(chunks.c.id)
+            .limit(_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = []
+        for row in rows:
+            meta = _parse_legacy(row.meta_json)
+            extras = {k: v for k, v in meta.items() if k not in _COLUMN_KEYS}
+            content = row.content or ""
+            start = offsets.get(row.document_id, 0)
+            offsets[row.document_id] = start + len(content)
+            page = meta.get("page")
+            params.append({
+                "chunk_id": row.id,
+                "page": int(page) if isinstance(page, (int, float)) else None,
+                "source": meta.get("source"),
+                "char_start": start,
+                "char_end": start + len(content),
+                "token_count": (len(content) + 3) // 4,
+                "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+                "new_meta_json": json.dumps(extras, separators=(",", ":")) if extras else None,
+            })
+        bind.execute(update, params)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    columns = {c["name"] for c in sa.inspect(bind).get_columns("chunks")}
+    missing = [c for c in _NEW_COLUMNS if c.name not in columns]
+    if missing:
+        with op.batch_alter_table("chunks") as batch:
+            for column in missing:
+                batch.add_column(column)
+
+    _convert_rows(bind)
+
+    existing = {ix["name"] for ix in sa.inspect(bind).get_indexes("chunks")}
+    for name, cols in _INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "chunks", cols)
+
+
+def downgrade() -> None:
+    for name in _INDEXES:
+        op.drop_index(name, table_name="chunks")
+    # meta_json keeps only the extras; page/source are folded back in
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, page, source, meta_json FROM chunks")).fetchall()
+    for row in rows:
+        meta = {"page": row.page, "source": row.source}
+        meta.update(_parse_legacy(row.meta_json))
+        bind.execute(
+            sa.text("UPDATE chunks SET meta_json = :m WHERE id = :i"),
+            {"m": str(meta), "i": row.id},
+        )
+    with op.batch_alter_table("chunks") as batch:
+        for column in reversed(_NEW_COLUMNS):
+            batch.drop_column(column.name)
@@ -0,0 +1,49 @@
+"""document and section summaries for hierarchical retrieval
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Existing documents have no summaries until
+`python -m app.core.summaries backfill` builds them; retrieval falls back to
+flat chunk search for them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "document_summaries" in set(sa.inspect(bind).get_table_names()):
+        return
+
+    op.create_table(
+        "document_summaries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+        sa.Column("level", sa.String(), nullable=False),
+        sa.Column("page_start", sa.Integer(), nullable=True),
+        sa.Column("page_end", sa.Integer(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("token_count", sa.Integer(), nullable=True),
+        sa.Column("source_tokens", sa.Integer(), nullable=True),
+        sa.Column("vector_id", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    )
+    op.create_index("ix_document_summaries_id", "document_summaries", ["id"])
+    op.create_index(
+        "ix_document_summaries_user_document", "document_summaries", ["user_id", "document_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_document_summaries_user_document", table_name="document_summaries")
+    op.drop_index("ix_document_summaries_id", table_name="document_summaries")
+    op.drop_table("document_summaries")
@@ -0,0 +1,232 @@
+"""workspaces: shared documents, folding identical per-user uploads
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+Adds workspaces / workspace_members and a nullable workspace_id on
+documents, chunks and document_summaries (plus documents.content_hash, the
+sha256 of the uploaded file).
+
+Then folds identical uploads: documents of different users whose chunks are
+identical (same content hashes, same order) are kept once. The oldest copy
+is moved into a workspace whose members are exactly the users who had a
+copy, so nobody gains access to anything new; the other copies' rows are
+deleted. Groups with the same set of users share one workspace. Every
+former uploader is an owner of it, so each can still delete the document
+and manage the members.
+
+The folded documents' summaries are deleted (kept and dropped copies alike)
+and not rebuilt here: summarizing needs the app's LLM and Chroma. Until the
+backfill below has run they are searched flat, also in hierarchical mode.
+Chroma is not touched here. Afterwards run, from backend/:
+    python -m app.core.maintenance check --repair   # workspace_id on the kept vectors, drop the copies' vectors
+    python -m app.core.summaries backfill           # rebuild the summaries of the folded documents
+Downgrade drops the new tables and columns; folded copies are not restored.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+_WORKSPACE_COLUMNS = {
+    "documents": [
+        sa.Column("workspace_id", sa.Integer(), nullable=True),
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+    ],
+    "chunks": [sa.Column("workspace_id", sa.Integer(), nullable=True)],
+    "document_summaries": [sa.Column("workspace_id", sa.Integer(), nullable=True)],
+}
+_INDEXES = {
+    "documents": {"ix_documents_workspace_hash": ["workspace_id", "content_hash"]},
+    "chunks": {"ix_chunks_workspace_document": ["workspace_id", "document_id"]},
+}
+_BATCH = 1000
+
+
+def _create_tables(bind) -> None:
+    tables = set(sa.inspect(bind).get_table_names())
+    if "workspaces" not in tables:
+        op.create_table(
+            "workspaces",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_workspaces_id", "workspaces", ["id"])
+    if "workspace_members" not in tables:
+        op.create_table(
+            "workspace_members",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("workspace_id", sa.Integer(), sa.ForeignKey("workspaces.id"), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("workspace_id", "user_id", name="uq_workspace_members_workspace_user"),
+        )
+        op.create_index("ix_workspace_members_id", "workspace_members", ["id"])
+        op.create_index("ix_workspace_members_user", "workspace_members", ["user_id"])
+
+
+def _add_columns(bind) -> None:
+    inspector = sa.inspect(bind)
+    for table, new_columns in _WORKSPACE_COLUMNS.items():
+        columns = {c["name"] for c in inspector.get_columns(table)}
+        missing = [c for c in new_columns if c.name not in columns]
+        if missing:
+            with op.batch_alter_table(table) as batch:
+                for column in missing:
+                    batch.add_column(column)
+    for table, indexes in _INDEXES.items():
+        existing = {ix["name"] for ix in sa.inspect(bind).get_indexes(table)}
+        for name, cols in indexes.items():
+            if name not in existing:
+                op.create_index(name, table, cols)
+
+
+def _fingerprints(bind):
+    """document_id → (user_id, sha256 over its chunks' content hashes in id order), private documents only."""
+    documents = sa.table(
+        "documents",
+        sa.column("id", sa.Integer),
+        sa.column("user_id", sa.Integer),
+        sa.column("workspace_id", sa.Integer),
+    )
+    chunks = sa.table(
+        "chunks",
+        sa.column("id", sa.Integer),
+        sa.column("document_id", sa.Integer),
+        sa.column("content_hash", sa.String),
+    )
+    owners = {
+        row.id: row.user_id
+        for row in bind.execute(
+            sa.select(documents.c.id, documents.c.user_id).where(documents.c.workspace_id.is_(None))
+        )
+    }
+
+    digests = {}
+    incomplete = set()  # legacy chunks without a hash can't be compared
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(chunks.c.id, chunks.c.document_id, chunks.c.content_hash)
+            .where(chunks.c.id > last_id)
+            .order_by(chunks.c.id)
+            .limit(_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            if row.document_id not in owners:
+                continue
+            if row.content_hash is None:
+                incomplete.add(row.document_id)
+                continue
+            digests.setdefault(row.document_id, hashlib.sha256()).update(row.content_hash.encode("ascii"))
+
+    return {
+        doc_id: (owners[doc_id], digest.hexdigest())
+        for doc_id, digest in digests.items()
+        if doc_id not in incomplete
+    }
+
+
+def _fold_duplicates(bind) -> None:
+    groups = defaultdict(list)
+    for doc_id, (user_id, fingerprint) in _fingerprints(bind).items():
+        groups[fingerprint].append((doc_id, user_id))
+
+    # A Table (not sa.table) so inserted_primary_key knows the key column
+    workspaces = sa.Table(
+        "workspaces",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("created_by", sa.Integer),
+        sa.Column("created_at", sa.DateTime),
+    )
+    members = sa.table(
+        "workspace_members",
+        sa.column("workspace_id", sa.Integer),
+        sa.column("user_id", sa.Integer),
+        sa.column("role", sa.String),
+        sa.column("created_at", sa.DateTime),
+    )
+
+    by_users = {}  # frozenset(user ids) → workspace id
+    folded = 0
+    for copies in groups.values():
+        users = frozenset(user_id for _, user_id in copies)
+        if len(users) < 2:
+            continue  # one user's repeated uploads stay as they are
+        copies.sort()
+        keep, keep_user = copies[0]
+        drop = [doc_id for doc_id, _ in copies[1:]]
+
+        workspace_id = by_users.get(users)
+        if workspace_id is None:
+            now = datetime.utcnow()
+            workspace_id = bind.execute(
+                workspaces.insert().values(
+                    name=f"Shared ({len(users)} members)", created_by=keep_user, created_at=now
+                )
+            ).inserted_primary_key[0]
+            # Every former uploader owned their copy: they all stay owners
+            bind.execute(members.insert(), [
+                {"workspace_id": workspace_id, "user_id": uid, "role": "owner", "created_at": now}
+                for uid in sorted(users)
+            ])
+            by_users[users] = workspace_id
+
+        params = {"ws": workspace_id, "keep": keep}
+        bind.execute(sa.text("UPDATE documents SET workspace_id = :ws WHERE id = :keep"), params)
+        bind.execute(sa.text("UPDATE chunks SET workspace_id = :ws WHERE document_id = :keep"), params)
+        # Rebuilt by `summaries backfill` with the workspace in their metadata
+        # (see the module docstring)
+        for doc_id in [keep] + drop:
+            bind.execute(sa.text("DELETE FROM document_summaries WHERE document_id = :d"), {"d": doc_id})
+        for doc_id in drop:
+            bind.execute(sa.text("DELETE FROM chunks WHERE document_id = :d"), {"d": doc_id})
+            bind.execute(sa.text("DELETE FROM documents WHERE id = :d"), {"d": doc_id})
+        folded += len(drop)
+
+    if folded:
+        print(f"0006: folded {folded} duplicate documents into {len(by_users)} workspaces")
+        print(
+            "⚠️ 0006: summaries of the folded documents were dropped; run "
+            "`python -m app.core.maintenance check --repair` and "
+            "`python -m app.core.summaries backfill` from backend/"
+        )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    _create_tables(bind)
+    _add_columns(bind)
+    _fold_duplicates(bind)
+
+
+def downgrade() -> None:
+    for table, indexes in _INDEXES.items():
+        for name in indexes:
+            op.drop_index(name, table_name=table)
+    for table, columns in _WORKSPACE_COLUMNS.items():
+        with op.batch_alter_table(table) as batch:
+            for column in reversed(columns):
+                batch.drop_column(column.name)
+    op.drop_index("ix_workspace_members_user", table_name="workspace_members")
+    op.drop_index("ix_workspace_members_id", table_name="workspace_members")
+    op.drop_table("workspace_members")
+    op.drop_index("ix_workspaces_id", table_name="workspaces")
+    op.drop_table("workspaces")
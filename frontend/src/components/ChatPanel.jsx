@@ -6,6 +6,8 @@ export default function ChatPanel() {
   const [input, setInput] = useState("");
   const [conversation, setConversation] = useState([]); // [{role, content}]
   const [trace, setTrace] = useState([]); // NEW: [{node, description, doc_ids}]
+  // Passages behind the last answer: [{marker, cited, chunk_id, document_id, page, ...}]
+  const [citations, setCitations] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
 
@@ -18,10 +20,12 @@ export default function ChatPanel() {
       const res = await api.post("/chat", {
         message: input,
         conversation,
+        citations, // lets a follow-up question reuse them instead of searching again
       });
 
       setConversation(res.data.conversation || []);
       setTrace(res.data.trace || []); // NEW: Store the trace from the API response
+      setCitations(res.data.citations || []);
       setInput("");
     } catch (e) {
       console.error(e);
@@ -80,12 +84,46 @@ export default function ChatPanel() {
                     docs: {step.doc_ids.join(", ")}
                   </span>
                 )}
+                {step.similar_tickets && step.similar_tickets.length > 0 && (
+                  <span className="trace-extra">
+                    similar:{" "}
+                    {step.similar_tickets
+                      .map((t) => `#${t.ticket_id} (${t.distance})`)
+                      .join(", ")}
+                  </span>
+                )}
               </li>
             ))}
           </ol>
         </div>
       )}
 
+      {citations.some((c) => c.cited) && (
+        <div className="trace-panel">
+          <div className="trace-title">Sources</div>
+          <ol className="trace-list">
+            {citations
+              .filter((c) => c.cited)
+              .map((c) => (
+                <li key={c.id} className="trace-item">
+                  <span className="trace-node">[{c.marker}]</span>
+                  <span className="trace-desc">
+                    Document {c.document_id}
+                    {c.page != null && `, page ${c.page}`}
+                    {c.kind === "summary" && " (summary)"}
+                  </span>
+                  {c.chunk_id != null && (
+                    <span className="trace-extra">
+                      chunk {c.chunk_id}
+                      {c.char_start != null && `, chars ${c.char_start}-${c.char_end}`}
+                    </span>
+                  )}
+                </li>
+              ))}
+          </ol>
+        </div>
+      )}
+
       {error && <div className="error-box">{error}</div>}
 
       <div className="chat-input-row">
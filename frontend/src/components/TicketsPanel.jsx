@@ -4,15 +4,21 @@ import api from "../api";
 
 export default function TicketsPanel() {
   const [tickets, setTickets] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
 
-  const fetchTickets = async () => {
+  // cursor=null → first page (replace list), otherwise append the next page
+  const fetchTickets = async (cursor = null) => {
     setLoading(true);
     setError("");
     try {
-      const res = await api.get("/tickets");
-      setTickets(res.data || []);
+      const res = await api.get("/tickets", {
+        params: cursor ? { cursor } : {},
+      });
+      const items = res.data?.items || [];
+      setTickets((prev) => (cursor ? [...prev, ...items] : items));
+      setNextCursor(res.data?.next_cursor || null);
     } catch (e) {
       console.error(e);
       setError("Failed to load tickets.");
@@ -29,7 +35,7 @@ export default function TicketsPanel() {
     <div className="panel">
       <div className="panel-header">
         <h2>Tickets</h2>
-        <button onClick={fetchTickets} disabled={loading}>
+        <button onClick={() => fetchTickets()} disabled={loading}>
           Refresh
         </button>
       </div>
@@ -59,6 +65,12 @@ export default function TicketsPanel() {
           </li>
         ))}
       </ul>
+
+      {nextCursor && (
+        <button onClick={() => fetchTickets(nextCursor)} disabled={loading}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }